@@ -0,0 +1,248 @@
+"""Closure notification planning and batched dispatch (User Story #11)."""
+from __future__ import annotations
+
+import logging
+import uuid
+from dataclasses import dataclass, field, replace
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import CharField, Count, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from boiler_park_backend.models import ClosureDelivery, LotEvent, NotificationLog, User, UserPark
+from .push_notifications import send_push_messages
+
+logger = logging.getLogger("closure_notifications")
+
+DEFAULT_HISTORY_DAYS = 60
+DEFAULT_MIN_VISITS = 2
+DEFAULT_BATCH_SIZE = 100
+
+# Favorites are stored as the client sent them; compare them uppercased,
+# like the lot codes they are matched against.
+UPPER_FAVORITE_LOTS = RawSQL(
+    "ARRAY(SELECT upper(code) FROM unnest(favorite_lots) AS code)", (),
+    output_field=ArrayField(CharField()))
+
+
+@dataclass
+class ClosureDigest:
+    """One push for one user, covering every lot they care about."""
+
+    user_id: int
+    email: str
+    token: str
+    events_by_lot: Dict[str, List[LotEvent]] = field(default_factory=dict)
+
+    @property
+    def events(self) -> List[LotEvent]:
+        return [event for events in self.events_by_lot.values() for event in events]
+
+    @property
+    def message(self) -> str:
+        if len(self.events_by_lot) == 1:
+            lot_code, events = next(iter(self.events_by_lot.items()))
+            if len(events) == 1:
+                event = events[0]
+                return f"Heads up: {lot_code} will be closed on {event.start_time:%b %d} - {event.title}"
+            return (
+                f"Heads up: {lot_code} has {len(events)} upcoming closures "
+                f"starting {events[0].start_time:%b %d}"
+            )
+        summaries = [
+            f"{lot_code} ({events[0].start_time:%b %d})"
+            for lot_code, events in self.events_by_lot.items()
+        ]
+        return f"Heads up: closures coming up at {', '.join(summaries)}"
+
+    @property
+    def extra(self) -> Dict[str, object]:
+        events = self.events
+        return {
+            "type": "lot_closure",
+            "lot_code": events[0].lot_code.upper(),
+            "event_id": events[0].id,
+            "lot_codes": list(self.events_by_lot),
+            "event_ids": [event.id for event in events],
+        }
+
+
+def plan_closure_digests(
+    hours_ahead: int = 24,
+    history_days: int = DEFAULT_HISTORY_DAYS,
+    min_visits: int = DEFAULT_MIN_VISITS,
+    lot_codes: Optional[Iterable[str]] = None,
+    dedupe: bool = True,
+    now=None,
+) -> List[ClosureDigest]:
+    """Work out which opted-in users care about which upcoming closures.
+
+    A user cares about a lot if it is in their `favorite_lots` or they parked
+    there at least `min_visits` times in the last `history_days` days. With
+    `dedupe`, events a user was already successfully told about are dropped,
+    so running the plan again is idempotent. The whole plan is at most four
+    queries: events, parking frequency, users, prior deliveries.
+    """
+    now = now or timezone.now()
+
+    events = LotEvent.objects.filter(
+        start_time__gte=now,
+        start_time__lte=now + timedelta(hours=hours_ahead),
+    )
+    if lot_codes is not None:
+        lot_filter = Q()
+        for code in lot_codes:
+            lot_filter |= Q(lot_code__iexact=code)
+        events = events.filter(lot_filter)
+    events = list(events.order_by('start_time', 'id'))
+    if not events:
+        return []
+
+    events_by_lot: Dict[str, List[LotEvent]] = {}
+    for event in events:
+        events_by_lot.setdefault(event.lot_code.upper(), []).append(event)
+    lot_codes = list(events_by_lot)
+    event_ids = [event.id for event in events]
+
+    frequent = (
+        UserPark.objects.filter(
+            lot_id__in=lot_codes,
+            timestamp__gte=now - timedelta(days=history_days),
+        )
+        .values('user_id', 'lot_id')
+        .annotate(visits=Count('id'))
+        .filter(visits__gte=min_visits)
+    )
+    frequent_lots: Dict[int, set] = {}
+    for row in frequent:
+        frequent_lots.setdefault(row['user_id'], set()).add(row['lot_id'].upper())
+
+    users = (
+        User.objects.filter(closure_notifications_enabled=True)
+        .exclude(notification_token__isnull=True)
+        .exclude(notification_token__exact="")
+        .alias(upper_favorite_lots=UPPER_FAVORITE_LOTS)
+        .filter(Q(upper_favorite_lots__overlap=lot_codes) | Q(id__in=list(frequent_lots)))
+        .values('id', 'email', 'notification_token', 'favorite_lots')
+    )
+
+    users = list(users)
+
+    delivered = set()
+    if dedupe and users:
+        # Digest rows list their events in event_ids; older rows have one event each
+        logged = NotificationLog.objects.filter(
+            Q(event_ids__overlap=event_ids) | Q(event_id__in=event_ids),
+            notification_type='lot_closure',
+            success=True,
+            user_id__in=[user['id'] for user in users],
+        ).values_list('user_id', 'event_id', 'event_ids')
+        for user_id, event_id, logged_ids in logged:
+            delivered.update((user_id, logged_id) for logged_id in logged_ids or [event_id])
+
+    digests = []
+    for user in users:
+        favorites = {code.upper() for code in (user['favorite_lots'] or [])}
+        interested = favorites | frequent_lots.get(user['id'], set())
+        # Keep lots in chronological order of their first closure
+        user_lots = {}
+        for lot_code, lot_events in events_by_lot.items():
+            if lot_code not in interested:
+                continue
+            pending = [e for e in lot_events if (user['id'], e.id) not in delivered]
+            if pending:
+                user_lots[lot_code] = pending
+        if not user_lots:
+            continue
+        digests.append(ClosureDigest(
+            user_id=user['id'],
+            email=user['email'],
+            token=user['notification_token'],
+            events_by_lot=user_lots,
+        ))
+    return digests
+
+
+def _claim(batch: List[ClosureDigest]) -> Tuple[str, List[ClosureDigest]]:
+    """Claim every (user, event) in the batch; returns the claim and the digests
+    trimmed to the events it won. Events another run claimed first are dropped."""
+    claim = uuid.uuid4().hex
+    ClosureDelivery.objects.bulk_create(
+        [ClosureDelivery(user_id=digest.user_id, event_id=event.id, claim=claim)
+         for digest in batch for event in digest.events],
+        ignore_conflicts=True,
+    )
+    won = set(ClosureDelivery.objects.filter(claim=claim).values_list('user_id', 'event_id'))
+
+    claimed = []
+    for digest in batch:
+        events_by_lot = {}
+        for lot_code, events in digest.events_by_lot.items():
+            mine = [event for event in events if (digest.user_id, event.id) in won]
+            if mine:
+                events_by_lot[lot_code] = mine
+        if events_by_lot:
+            claimed.append(replace(digest, events_by_lot=events_by_lot))
+    return claim, claimed
+
+
+def dispatch_closure_digests(
+    digests: Iterable[ClosureDigest],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    claim: bool = True,
+) -> Tuple[int, int]:
+    """Send digests in batches and log them. Returns (sent, failed) digests.
+
+    Before a batch is sent, each of its (user, event) pairs is claimed in
+    `ClosureDelivery`, and only claimed events are sent, so overlapping runs
+    never push the same closure twice; claims for failed pushes are released
+    for a later retry. `claim=False` skips this (for deliberate resends).
+
+    Each digest is logged as one row, like any other push: `lot_code` and
+    `event` are its first lot and event, and `event_ids` lists every event
+    it covered, which is what `plan_closure_digests` dedupes on.
+    """
+    digests = list(digests)
+    sent = 0
+    failed = 0
+
+    for start in range(0, len(digests), batch_size):
+        batch = digests[start:start + batch_size]
+        claim_id = None
+        if claim:
+            claim_id, batch = _claim(batch)
+            if not batch:
+                continue
+        errors = send_push_messages(
+            [(digest.token, digest.message, digest.extra) for digest in batch])
+
+        logs = []
+        released = Q()
+        for digest, error in zip(batch, errors):
+            if error:
+                logger.error("Failed to send closure digest to %s: %s", digest.email, error)
+                failed += 1
+                released |= Q(user_id=digest.user_id,
+                              event_id__in=[event.id for event in digest.events])
+            else:
+                sent += 1
+            events = digest.events
+            logs.append(NotificationLog(
+                user_id=digest.user_id,
+                notification_type='lot_closure',
+                message=digest.message,
+                success=error is None,
+                error_message=error,
+                lot_code=events[0].lot_code.upper(),
+                event_id=events[0].id,
+                event_ids=[event.id for event in events],
+            ))
+        # A concurrent run may have logged the same delivery already
+        NotificationLog.objects.bulk_create(logs, ignore_conflicts=True)
+        if claim_id is not None and released:
+            ClosureDelivery.objects.filter(released, claim=claim_id).delete()
+
+    return sent, failed
@@ -8,7 +8,8 @@ from typing import Dict, Optional
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 
-from boiler_park_backend.models import NotificationLog, ParkingLot, User
+from boiler_park_backend.models import NotificationLog, User
+from .lot_registry import registry
 from .push_notifications import send_push_message
 
 logger = logging.getLogger("favorite_alerts")
@@ -17,27 +18,14 @@ DEFAULT_THRESHOLD = 25
 DEFAULT_COOLDOWN_MINUTES = 30
 DEFAULT_CAPACITY_FALLBACK = 400
 
-# Known capacities for common garages (falls back to DEFAULT_CAPACITY_FALLBACK otherwise).
-LOT_CAPACITY_FALLBACKS: Dict[str, int] = {
-    "PGH": 480,
-    "PGG": 650,
-    "PGU": 820,
-    "PGNW": 500,
-}
-
-
 def _get_capacity(lot_code: str) -> Optional[int]:
-    lot = ParkingLot.objects.filter(code__iexact=lot_code).values("capacity").first()
-    if lot and lot.get("capacity"):
-        return int(lot["capacity"])
-    return LOT_CAPACITY_FALLBACKS.get(lot_code)
+    lot = registry.get(lot_code)
+    return lot.capacity if lot else None
 
 
 def _get_lot_name(lot_code: str) -> str:
-    lot = ParkingLot.objects.filter(code__iexact=lot_code).values("name").first()
-    if lot and lot.get("name"):
-        return lot["name"]
-    return lot_code
+    lot = registry.get(lot_code)
+    return lot.name if lot else lot_code
 
 
 def _parse_timestamp(value: Optional[str]):
@@ -0,0 +1,235 @@
+"""Address geocoding with a campus gazetteer and two cache tiers.
+
+Lookups are keyed by the normalized address and tried in order:
+
+1. the campus building gazetteer (`campus_gazetteer.json`), loaded once;
+2. an in-process TTL/LRU cache;
+3. the `GeocodeCacheEntry` table, shared by every worker, which expires
+   entries after GEOCODE_CACHE_TTL_DAYS and trims the least recently used
+   past GEOCODE_CACHE_MAX_ENTRIES;
+4. the Google Geocoding API, whose answer is written back to both caches.
+
+`stats()` reports where lookups were answered in this process.
+GOOGLE_GEOCODE_URL can point at a local stub server for testing.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import requests
+from cachetools import TTLCache
+from decouple import config
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger("geocoding")
+
+GEOCODE_URL = config(
+    "GOOGLE_GEOCODE_URL", default="https://maps.googleapis.com/maps/api/geocode/json")
+# West Lafayette, biases Google towards campus matches
+GEOCODE_BOUNDS = "40.39286,-86.954622|40.466874,-86.871755"
+CACHE_TTL_DAYS = config("GEOCODE_CACHE_TTL_DAYS", default=30, cast=int)
+CACHE_MAX_ENTRIES = config("GEOCODE_CACHE_MAX_ENTRIES", default=5000, cast=int)
+MEMORY_CACHE_SIZE = config("GEOCODE_MEMORY_CACHE_SIZE", default=512, cast=int)
+GAZETTEER_PATH = Path(__file__).with_name("campus_gazetteer.json")
+
+# Keys longer than the table's primary key are only cached in memory
+_MAX_KEY_LENGTH = 255
+_PURDUE_KEYWORDS = [
+    'purdue', 'memorial union', 'lawson', 'krannert',
+    'stewart center', 'pmucorr', 'recwell', 'corec'
+]
+
+
+class GeocodeResult(NamedTuple):
+    latitude: float
+    longitude: float
+    formatted_address: str
+    source: str
+
+
+class GeocodingNotConfigured(Exception):
+    """GOOGLE_MAPS_API_KEY is not set and the address isn't cached."""
+
+
+class GeocodeFailed(Exception):
+    """Google answered, but without a result (the status is the message)."""
+
+
+def normalize_address(address: str) -> str:
+    """Lowercase, punctuation to spaces, collapsed whitespace."""
+    return " ".join(re.sub(r"[^\w#]+", " ", address.lower()).split())
+
+
+def _strip_purdue(key: str) -> str:
+    return " ".join(word for word in key.split() if word not in ("purdue", "university"))
+
+
+def _load_gazetteer(path: Path = GAZETTEER_PATH) -> Dict[str, GeocodeResult]:
+    try:
+        buildings = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        logger.exception("Could not load the campus gazetteer from %s", path)
+        return {}
+    gazetteer = {}
+    for building in buildings:
+        result = GeocodeResult(building["latitude"], building["longitude"],
+                               f"{building['name']}, {building['address']}", "gazetteer")
+        for name in [building["name"], *building.get("aliases", [])]:
+            gazetteer[normalize_address(name)] = result
+            gazetteer.setdefault(_strip_purdue(normalize_address(name)), result)
+    return gazetteer
+
+
+_gazetteer: Optional[Dict[str, GeocodeResult]] = None
+_memory = TTLCache(maxsize=MEMORY_CACHE_SIZE, ttl=CACHE_TTL_DAYS * 24 * 3600)
+_lock = threading.Lock()
+_stats = {"gazetteer": 0, "memory": 0, "database": 0, "google": 0, "failed": 0}
+
+
+def gazetteer_lookup(key: str) -> Optional[GeocodeResult]:
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = _load_gazetteer()
+    return _gazetteer.get(key) or _gazetteer.get(_strip_purdue(key))
+
+
+def campus_buildings() -> List[GeocodeResult]:
+    """Every building in the gazetteer, once each."""
+    gazetteer_lookup("")
+    return list(dict.fromkeys(_gazetteer.values()))
+
+
+def _count(source: str) -> None:
+    with _lock:
+        _stats[source] += 1
+
+
+def stats() -> Dict[str, object]:
+    """Lookup counts by where they were answered, plus the local hit ratio."""
+    with _lock:
+        counts = dict(_stats)
+        cached_entries = len(_memory)
+    lookups = sum(counts.values())
+    hits = counts["gazetteer"] + counts["memory"] + counts["database"]
+    return {
+        **counts,
+        "lookups": lookups,
+        "hit_ratio": round(hits / lookups, 4) if lookups else None,
+        "memory_entries": cached_entries,
+    }
+
+
+def _search_address(address: str) -> str:
+    """Add West Lafayette context to addresses that have none."""
+    lower_address = address.lower()
+    has_city = ',' in address
+    has_state = bool(re.search(r'\b(in|indiana)\b', lower_address))
+    has_zip = bool(re.search(r'\b\d{5}\b', address))
+    if has_city or has_state or has_zip or 'lafayette' in lower_address:
+        return address
+    if any(keyword in lower_address for keyword in _PURDUE_KEYWORDS):
+        return f"{address}, Purdue University, West Lafayette, IN"
+    return f"{address}, West Lafayette, Indiana"
+
+
+def _database_lookup(key: str) -> Optional[GeocodeResult]:
+    from boiler_park_backend.models import GeocodeCacheEntry
+
+    if len(key) > _MAX_KEY_LENGTH:
+        return None
+    try:
+        entry = GeocodeCacheEntry.objects.filter(
+            key=key, fetched_at__gte=timezone.now() - timedelta(days=CACHE_TTL_DAYS)).first()
+        if entry is None:
+            return None
+        GeocodeCacheEntry.objects.filter(key=key).update(
+            last_used_at=timezone.now(), hits=F("hits") + 1)
+    except DatabaseError:
+        logger.exception("Geocode cache read failed for %r", key)
+        return None
+    return GeocodeResult(entry.latitude, entry.longitude, entry.formatted_address, "database")
+
+
+def _database_store(key: str, result: GeocodeResult) -> None:
+    from boiler_park_backend.models import GeocodeCacheEntry
+
+    if len(key) > _MAX_KEY_LENGTH:
+        return
+    now = timezone.now()
+    try:
+        GeocodeCacheEntry.objects.update_or_create(key=key, defaults={
+            "latitude": result.latitude,
+            "longitude": result.longitude,
+            "formatted_address": result.formatted_address[:255],
+            "fetched_at": now,
+            "last_used_at": now,
+        })
+        stale = (GeocodeCacheEntry.objects.order_by("-last_used_at")
+                 .values_list("key", flat=True)[CACHE_MAX_ENTRIES:])
+        stale = list(stale)
+        if stale:
+            GeocodeCacheEntry.objects.filter(key__in=stale).delete()
+    except DatabaseError:
+        logger.exception("Geocode cache write failed for %r", key)
+
+
+def _google_lookup(address: str) -> GeocodeResult:
+    api_key = config('GOOGLE_MAPS_API_KEY', default='')
+    if not api_key:
+        raise GeocodingNotConfigured()
+    search_address = _search_address(address)
+    logger.info(f"Geocoding: {search_address}")
+    response = requests.get(GEOCODE_URL, params={
+        'address': search_address,
+        'key': api_key,
+        'bounds': GEOCODE_BOUNDS,
+        'region': 'us'
+    }, timeout=5)
+    data = response.json()
+    if data.get('status') != 'OK' or not data.get('results'):
+        raise GeocodeFailed(data.get('status', 'UNKNOWN'))
+    first = data['results'][0]
+    location = first['geometry']['location']
+    return GeocodeResult(location['lat'], location['lng'], first['formatted_address'], "google")
+
+
+def geocode(address: str) -> GeocodeResult:
+    """
+    Coordinates for `address`, from the first tier that knows it.
+    Raises GeocodingNotConfigured, GeocodeFailed or requests exceptions
+    when the address has to go to Google and that fails.
+    """
+    key = normalize_address(address)
+    result = gazetteer_lookup(key)
+    if result is not None:
+        _count("gazetteer")
+        return result
+
+    with _lock:
+        result = _memory.get(key)
+    if result is not None:
+        _count("memory")
+        return result._replace(source="memory")
+
+    result = _database_lookup(key)
+    if result is None:
+        try:
+            result = _google_lookup(address)
+        except Exception:
+            _count("failed")
+            raise
+        _count("google")
+        _database_store(key, result)
+    else:
+        _count("database")
+    with _lock:
+        _memory[key] = result
+    return result
@@ -0,0 +1,110 @@
+"""Nearest-lot lookups over the lot registry's coordinates.
+
+Lot coordinates are packed into numpy arrays once and the index is rebuilt
+only when `registry.version` changes, i.e. after a `ParkingLot` save or
+delete (or the registry's periodic reload). Distances are great-circle
+(haversine) meters, computed for every lot at once; with a few dozen lots a
+vectorized scan over contiguous arrays answers faster than a tree would.
+Lots without coordinates are left out.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .lot_registry import LotInfo, registry
+
+EARTH_RADIUS_M = 6371000.0
+
+
+@dataclass(frozen=True)
+class Neighbor:
+    lot: LotInfo
+    distance_m: float
+
+
+class LotIndex:
+    def __init__(self, lots: Sequence[LotInfo]):
+        self.lots = [lot for lot in lots if lot.lat is not None and lot.lng is not None]
+        self.lat = np.radians([lot.lat for lot in self.lots])
+        self.lng = np.radians([lot.lng for lot in self.lots])
+        self.cos_lat = np.cos(self.lat)
+        self._passes = [frozenset(p.upper() for p in lot.parking_passes) for lot in self.lots]
+
+    def __len__(self) -> int:
+        return len(self.lots)
+
+    def distances_m(self, lats, lngs) -> np.ndarray:
+        """(M,) latitudes and longitudes in degrees -> (M, lots) distances in meters."""
+        lats = np.radians(np.asarray(lats, dtype=np.float64).reshape(-1, 1))
+        lngs = np.radians(np.asarray(lngs, dtype=np.float64).reshape(-1, 1))
+        a = (np.sin((self.lat - lats) / 2) ** 2
+             + np.cos(lats) * self.cos_lat * np.sin((self.lng - lngs) / 2) ** 2)
+        return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    def permit_mask(self, permits: Sequence[str]) -> np.ndarray:
+        """True for lots that accept any of `permits` (matched case-insensitively)."""
+        wanted = {permit.upper() for permit in permits}
+        return np.fromiter((bool(passes & wanted) for passes in self._passes),
+                           dtype=bool, count=len(self.lots))
+
+    def _neighbors(self, distances: np.ndarray, k: Optional[int],
+                   radius_m: Optional[float], allowed: Optional[np.ndarray] = None) -> List[Neighbor]:
+        keep = np.ones(len(distances), dtype=bool) if allowed is None else allowed.copy()
+        if radius_m is not None:
+            keep &= distances <= radius_m
+        candidates = np.flatnonzero(keep)
+        if k is not None and k < len(candidates):
+            nearest = np.argpartition(distances[candidates], k - 1)[:k]
+            candidates = candidates[nearest]
+        candidates = candidates[np.argsort(distances[candidates], kind="stable")]
+        return [Neighbor(self.lots[i], float(distances[i])) for i in candidates]
+
+    def nearest(self, lat: float, lng: float, k: int = 1,
+                radius_m: Optional[float] = None) -> List[Neighbor]:
+        """The `k` closest lots (optionally only those within `radius_m`), closest first."""
+        if not self.lots or k < 1:
+            return []
+        return self._neighbors(self.distances_m(lat, lng)[0], k, radius_m)
+
+    def within(self, lat: float, lng: float, radius_m: float) -> List[Neighbor]:
+        """Every lot within `radius_m`, closest first."""
+        if not self.lots:
+            return []
+        return self._neighbors(self.distances_m(lat, lng)[0], None, radius_m)
+
+    def nearest_many(self, points: Sequence[Tuple[float, float]], k: int = 1,
+                     radius_m: Optional[float] = None,
+                     permits: Optional[Sequence[str]] = None) -> List[List[Neighbor]]:
+        """
+        `nearest` for many (lat, lng) points, with one distance matrix for all
+        of them. With `permits`, only lots accepting one of them are ranked.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if not self.lots or k < 1:
+            return [[] for _ in range(len(points))]
+        allowed = self.permit_mask(permits) if permits else None
+        distances = self.distances_m(points[:, 0], points[:, 1])
+        return [self._neighbors(row, k, radius_m, allowed) for row in distances]
+
+
+_lock = threading.Lock()
+_index: Optional[LotIndex] = None
+_index_version = None
+
+
+def lot_index() -> LotIndex:
+    """The index for the registry's current lots, rebuilt when they change."""
+    global _index, _index_version
+    lots = registry.all()
+    version = registry.version
+    if _index is not None and _index_version == version:
+        return _index
+    with _lock:
+        if _index is None or _index_version != version:
+            _index = LotIndex(lots)
+            _index_version = version
+        return _index
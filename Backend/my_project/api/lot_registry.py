@@ -0,0 +1,178 @@
+"""Process-wide parking lot metadata, loaded once and refreshed on change.
+
+Static lot definitions (ids, codes, Redis keys, default capacities) live
+here and are overlaid with `ParkingLot` rows on first use. Lookups by code,
+id and Redis key are dictionary hits; the cache is dropped whenever a
+`ParkingLot` is saved or deleted (or goes stale) and rebuilt on the next
+lookup.
+
+Importing this module does not touch the database, so standalone scripts
+can use `STATIC_LOTS` without a configured Django project.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import List, Optional, Tuple
+
+from django.db.models.signals import post_delete, post_save
+
+logger = logging.getLogger("lot_registry")
+
+DEFAULT_CAPACITY = 240
+
+
+@dataclass(frozen=True)
+class LotInfo:
+    id: int
+    code: str
+    name: str
+    redis_key: str
+    capacity: int = DEFAULT_CAPACITY
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    paid: Optional[bool] = None
+    parking_passes: Tuple[str, ...] = ()
+    # Whether parking_availability_data has a column (named redis_key) for it
+    has_history: bool = True
+
+
+STATIC_LOTS: Tuple[LotInfo, ...] = (
+    LotInfo(1, "PGH", "Harrison Street Parking Garage", "PGH_availability", 240),
+    LotInfo(2, "PGG", "Grant Street Parking Garage", "PGG_availability", 240),
+    LotInfo(3, "PGU", "University Street Parking Garage", "PGU_availability", 240),
+    LotInfo(4, "PGNW", "Northwestern Avenue Parking Garage", "PGNW_availability", 240),
+    LotInfo(5, "PGMD", "McCutcheon Drive Parking Garage", "PGMD_availability", 240),
+    LotInfo(6, "PGW", "Wood Street Parking Garage", "PGW_availability", 240),
+    LotInfo(7, "PGGH", "Graduate House Parking Garage", "PGGH_availability", 240),
+    LotInfo(8, "PGM", "Marsteller Street Parking Garage", "PGM_availability", 240),
+    LotInfo(9, "LOT_R", "Lot R (North of Ross-Ade)", "LOT_R_availability", 120),
+    LotInfo(10, "LOT_H", "Lot H (North of Football Practice Field)", "LOT_H_availability", 80),
+    LotInfo(11, "LOT_FB", "Lot FB (East of Football Practice Field)", "LOT_FB_availability", 100),
+    LotInfo(12, "KFPC", "Kozuch Football Performance Complex Lot", "KFPC_availability", 100),
+    LotInfo(13, "LOT_A", "Lot A (North of Cary Quad)", "LOT_A_availability", 120),
+    LotInfo(14, "CREC", "Co-Rec Parking Lots", "CREC_availability", 150),
+    LotInfo(15, "LOT_O", "Lot O (East of Rankin Track)", "LOT_O_availability", 100),
+    LotInfo(16, "TARK_WILY", "Tarkington Wiley Parking Lots", "TARK_WILY_availability", 100),
+    LotInfo(17, "LOT_AA", "Lot AA (6th & Russell)", "LOT_AA_availability", 100),
+    LotInfo(18, "LOT_BB", "Lot BB (6th & Waldron)", "LOT_BB_availability", 80),
+    LotInfo(19, "WND_KRACH", "Windsor & Krach Shared Parking Lot", "WND_KRACH_availability", 100),
+    LotInfo(20, "SHRV_ERHT_MRDH", "Shreve, Earhart & Meredith Shared Lot", "SHRV_ERHT_MRDH_availability", 120),
+    LotInfo(21, "MCUT_HARR_HILL", "McCutcheon, Harrison & Hillenbrand Shared Lot", "MCUT_HARR_HILL_availability", 100),
+    LotInfo(22, "DUHM", "Duhme Hall Parking Lot", "DUHM_availability", 60),
+    LotInfo(23, "PIERCE_ST", "Pierce Street Parking Lot", "PIERCE_ST_availability", 100),
+    LotInfo(24, "SMTH_BCHM", "Smith & Biochemistry Lot", "SMTH_BCHM_availability", 120),
+    LotInfo(25, "DISC_A", "Discovery Lot (A Permit)", "DISC_A_availability", 100),
+    LotInfo(26, "DISC_AB", "Discovery Lot (AB Permit)", "DISC_AB_availability", 100),
+    LotInfo(27, "DISC_ABC", "Discovery Lot (ABC Permit)", "DISC_ABC_availability", 100),
+    LotInfo(28, "AIRPORT", "Airport Parking Lots", "AIRPORT_availability", 80),
+)
+
+# ParkingLot saves that only touch these fields don't change registry data
+_VOLATILE_FIELDS = frozenset({"rating", "num_of_ratings"})
+
+
+class _Snapshot:
+    def __init__(self, lots: List[LotInfo]):
+        self.lots = lots
+        self.by_code = {lot.code: lot for lot in lots}
+        self.by_id = {lot.id: lot for lot in lots}
+        self.by_redis_key = {lot.redis_key: lot for lot in lots}
+        self.loaded_at = time.monotonic()
+
+
+class LotRegistry:
+    def __init__(self, static_lots=STATIC_LOTS, max_age_seconds: float = 300):
+        # Signals only reach the process that saved the row, so other
+        # processes (the Redis bridge, schedulers) also reload on a timer.
+        self._static_lots = static_lots
+        self._max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+        self.version = 0
+
+    def _build(self) -> List[LotInfo]:
+        from django.db import DatabaseError
+        from boiler_park_backend.models import ParkingLot
+
+        by_code = {lot.code: lot for lot in self._static_lots}
+        next_id = max((lot.id for lot in self._static_lots), default=0) + 1
+
+        try:
+            # Lots only in the database get ids after the static ones, in
+            # code order, so every process and reload agrees on them
+            rows = list(ParkingLot.objects.order_by("code").values(
+                "code", "name", "capacity", "lat", "lng", "paid", "parking_passes"))
+        except DatabaseError:
+            logger.exception("Could not load ParkingLot rows; using static lot metadata")
+            return list(self._static_lots)
+
+        for row in rows:
+            code = row["code"].upper()
+            base = by_code.get(code)
+            if base is None:
+                base = LotInfo(next_id, code, row["name"] or code, f"{code}_availability",
+                               has_history=False)
+                next_id += 1
+            by_code[code] = replace(
+                base,
+                name=row["name"] or base.name,
+                capacity=row["capacity"] or base.capacity,
+                lat=row["lat"],
+                lng=row["lng"],
+                paid=row["paid"],
+                parking_passes=tuple(row["parking_passes"] or ()),
+            )
+        return sorted(by_code.values(), key=lambda lot: lot.id)
+
+    def _current(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < self._max_age_seconds:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or time.monotonic() - snapshot.loaded_at >= self._max_age_seconds:
+                snapshot = _Snapshot(self._build())
+                self._snapshot = snapshot
+                self.version += 1
+            return snapshot
+
+    def invalidate(self) -> None:
+        """Drop the cached lots; the next lookup reloads them."""
+        self._snapshot = None
+
+    def all(self) -> List[LotInfo]:
+        return self._current().lots
+
+    def get(self, code: Optional[str]) -> Optional[LotInfo]:
+        """Look up a lot by code, case-insensitively."""
+        if not code:
+            return None
+        return self._current().by_code.get(code.upper())
+
+    def by_id(self, lot_id) -> Optional[LotInfo]:
+        try:
+            return self._current().by_id.get(int(lot_id))
+        except (TypeError, ValueError):
+            return None
+
+    def by_redis_key(self, redis_key: str) -> Optional[LotInfo]:
+        return self._current().by_redis_key.get(redis_key)
+
+
+registry = LotRegistry()
+
+
+def _on_parking_lot_change(sender, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if update_fields and set(update_fields) <= _VOLATILE_FIELDS:
+        return
+    registry.invalidate()
+
+
+post_save.connect(_on_parking_lot_change, sender="boiler_park_backend.ParkingLot",
+                  dispatch_uid="lot_registry_post_save")
+post_delete.connect(_on_parking_lot_change, sender="boiler_park_backend.ParkingLot",
+                    dispatch_uid="lot_registry_post_delete")
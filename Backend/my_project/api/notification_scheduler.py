@@ -0,0 +1,139 @@
+"""In-process scheduler that turns upcoming LotEvents into closure alerts."""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from typing import List, Optional, Set, Tuple
+
+from django.db import close_old_connections
+
+from .closure_notifications import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_HISTORY_DAYS,
+    DEFAULT_MIN_VISITS,
+    ClosureDigest,
+    dispatch_closure_digests,
+    plan_closure_digests,
+)
+
+logger = logging.getLogger("notification_scheduler")
+
+DEFAULT_INTERVAL_SECONDS = 300
+DEFAULT_LEAD_HOURS = 24
+
+
+class ClosureNotificationScheduler:
+    """Evaluate LotEvent windows on a timer and feed a dispatch worker.
+
+    The timer thread only plans (a handful of indexed queries) and enqueues
+    digests; a single worker thread drains the queue in batches and sends
+    them. Delivered (user, event) pairs are deduplicated against
+    NotificationLog, and pairs still waiting in the queue are tracked in
+    memory so a slow dispatch never gets the same alert enqueued twice.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: int = DEFAULT_INTERVAL_SECONDS,
+        lead_hours: int = DEFAULT_LEAD_HOURS,
+        history_days: int = DEFAULT_HISTORY_DAYS,
+        min_visits: int = DEFAULT_MIN_VISITS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.interval_seconds = interval_seconds
+        self.lead_hours = lead_hours
+        self.history_days = history_days
+        self.min_visits = min_visits
+        self.batch_size = batch_size
+
+        self._queue: "queue.Queue[ClosureDigest]" = queue.Queue()
+        self._in_flight: Set[Tuple[int, int]] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+        self.sent = 0
+        self.failed = 0
+
+    @staticmethod
+    def _keys(digest: ClosureDigest) -> List[Tuple[int, int]]:
+        return [(digest.user_id, event.id) for event in digest.events]
+
+    def evaluate(self) -> int:
+        """Plan one window and enqueue new digests. Returns how many were queued."""
+        close_old_connections()
+        digests = plan_closure_digests(
+            hours_ahead=self.lead_hours,
+            history_days=self.history_days,
+            min_visits=self.min_visits,
+        )
+
+        queued = 0
+        with self._lock:
+            for digest in digests:
+                keys = self._keys(digest)
+                if any(key in self._in_flight for key in keys):
+                    continue
+                self._in_flight.update(keys)
+                self._queue.put(digest)
+                queued += 1
+
+        if queued:
+            logger.info("Queued %d closure digests", queued)
+        return queued
+
+    def _next_batch(self, block: bool) -> List[ClosureDigest]:
+        batch: List[ClosureDigest] = []
+        try:
+            batch.append(self._queue.get(block=block, timeout=1 if block else None))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def drain(self, block: bool = False) -> None:
+        """Dispatch everything currently queued, in batches."""
+        while True:
+            batch = self._next_batch(block)
+            if not batch:
+                return
+            block = False
+
+            close_old_connections()
+            try:
+                sent, failed = dispatch_closure_digests(batch, batch_size=self.batch_size)
+                self.sent += sent
+                self.failed += failed
+            except Exception:
+                logger.exception("Closure digest dispatch failed")
+            finally:
+                with self._lock:
+                    for digest in batch:
+                        self._in_flight.difference_update(self._keys(digest))
+
+    def _work(self) -> None:
+        while not self._stop.is_set() or not self._queue.empty():
+            self.drain(block=True)
+
+    def run_forever(self) -> None:
+        """Evaluate every `interval_seconds` until `stop()` is called."""
+        self._worker = threading.Thread(
+            target=self._work, name="closure-dispatch", daemon=True)
+        self._worker.start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.evaluate()
+                except Exception:
+                    logger.exception("Closure window evaluation failed")
+                self._stop.wait(self.interval_seconds)
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """Stop the timer and wait for queued digests to be dispatched."""
+        self._stop.set()
+        if self._worker and self._worker is not threading.current_thread():
+            self._worker.join()
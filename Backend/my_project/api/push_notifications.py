@@ -78,3 +78,50 @@ def send_push_message(token, message, extra=None):
                 'push_response': exc.push_response._asdict(),
             })
         raise
+
+
+def send_push_messages(messages, chunk_size=100):
+    """Publish many notifications with as few Expo round trips as possible.
+
+    `messages` is a list of (token, message, extra) tuples. Returns a list of
+    error strings aligned with `messages` (None where the push was accepted).
+    Tokens Expo reports as unregistered are cleared in a single update.
+    """
+    client = PushClient(session=session)
+    errors = []
+    dead_tokens = []
+
+    for start in range(0, len(messages), chunk_size):
+        chunk = messages[start:start + chunk_size]
+        try:
+            responses = client.publish_multiple([
+                PushMessage(to=token, body=message, data=extra)
+                for token, message, extra in chunk
+            ])
+        except (PushServerError, ConnectionError, HTTPError) as exc:
+            _report_exc(extra_data={'chunk_size': len(chunk)})
+            errors.extend([str(exc)] * len(chunk))
+            continue
+
+        for (token, message, extra), response in zip(chunk, responses):
+            try:
+                response.validate_response()
+                errors.append(None)
+            except DeviceNotRegisteredError:
+                dead_tokens.append(token)
+                errors.append("DeviceNotRegistered")
+            except PushTicketError as exc:
+                _report_exc(
+                    extra_data={
+                        'token': token,
+                        'message': message,
+                        'extra': extra,
+                        'push_response': exc.push_response._asdict(),
+                    })
+                errors.append(str(exc))
+
+    if dead_tokens:
+        from boiler_park_backend.models import User
+        User.objects.filter(notification_token__in=dead_tokens).update(notification_token=None)
+
+    return errors
@@ -0,0 +1,290 @@
+"""Batched, cached Google Distance Matrix lookups.
+
+Origins and destinations are rounded to DISTANCE_CACHE_PRECISION decimal
+places (4 is about 11 m) and results are cached in `TravelTimeEntry` per
+travel mode and campus time-of-day bucket, so a lookup only goes to Google
+when no entry for its bucket is younger than DISTANCE_CACHE_TTL_DAYS.
+Pairs Google has no route for are cached too (with their element status),
+so they aren't asked about again until they expire.
+
+Misses are packed into as few upstream requests as Google's limits allow
+(25 origins, 25 destinations and 100 elements per request) without
+billing much more than was asked for: Google bills every element of a
+request's origin x destination grid, so origins are only merged when the
+grid stays within MAX_ELEMENT_OVERHEAD of the pairs it answers. Every
+element of a grid is cached, not just the pairs that were asked for. The
+`precompute_travel_times` command fills the cache nightly for every
+lot -> campus building pair.
+"""
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import requests
+from decouple import config
+from django.db import DatabaseError
+from django.utils import timezone
+
+logger = logging.getLogger("travel_times")
+
+DISTANCE_MATRIX_URL = config(
+    "GOOGLE_DISTANCE_MATRIX_URL", default="https://maps.googleapis.com/maps/api/distancematrix/json")
+CACHE_PRECISION = config("DISTANCE_CACHE_PRECISION", default=4, cast=int)
+CACHE_TTL_DAYS = config("DISTANCE_CACHE_TTL_DAYS", default=7, cast=int)
+CAMPUS_TZ = ZoneInfo("America/Indiana/Indianapolis")
+
+MODES = ("driving", "walking", "bicycling", "transit")
+# Modes whose durations depend on departure time
+TIMED_MODES = {"driving", "transit"}
+# (name, first hour, last hour, hour precomputed for) in campus time
+BUCKETS = (
+    ("night", 0, 6, 3),
+    ("am_peak", 7, 9, 8),
+    ("midday", 10, 15, 12),
+    ("pm_peak", 16, 18, 17),
+    ("evening", 19, 23, 20),
+)
+MAX_ORIGINS = 25
+MAX_DESTINATIONS = 25
+MAX_ELEMENTS = 100
+# Billed grid elements allowed per requested pair when merging origins
+MAX_ELEMENT_OVERHEAD = 1.5
+
+Point = Tuple[float, float]
+
+
+class TravelTime(NamedTuple):
+    distance_meters: Optional[int]
+    duration_seconds: Optional[int]
+    source: str
+    # Google's element status; anything but OK means there is no route
+    status: str = "OK"
+
+
+class DistanceMatrixNotConfigured(Exception):
+    """GOOGLE_MAPS_API_KEY is not set and some pairs aren't cached."""
+
+
+class DistanceMatrixFailed(Exception):
+    """Google rejected a request (the status or error message is the message)."""
+
+
+class TooManyUncachedPairs(Exception):
+    """A lookup would need more upstream work than the caller allowed."""
+
+
+def round_point(lat: float, lng: float) -> Point:
+    return round(float(lat), CACHE_PRECISION), round(float(lng), CACHE_PRECISION)
+
+
+def time_bucket(when: Optional[datetime] = None) -> str:
+    """The time-of-day bucket `when` (default: now) falls in, in campus time."""
+    hour = (when or timezone.now()).astimezone(CAMPUS_TZ).hour
+    return next(name for name, first, last, _ in BUCKETS if first <= hour <= last)
+
+
+def bucket_departure(bucket: str, now: Optional[datetime] = None) -> int:
+    """Unix time of the next start of `bucket`'s representative hour."""
+    now = (now or timezone.now()).astimezone(CAMPUS_TZ)
+    hour = next(rep for name, _, _, rep in BUCKETS if name == bucket)
+    departure = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if departure <= now:
+        departure += timedelta(days=1)
+    return int(departure.timestamp())
+
+
+def cache_key(origin: Point, destination: Point, mode: str, bucket: str) -> str:
+    digits = CACHE_PRECISION
+    return (f"{mode}|{bucket}|{origin[0]:.{digits}f},{origin[1]:.{digits}f}"
+            f"|{destination[0]:.{digits}f},{destination[1]:.{digits}f}")
+
+
+def plan_requests(pairs: Iterable[Tuple[Point, Point]]) -> List[Tuple[List[Point], List[Point]]]:
+    """
+    Pack (origin, destination) pairs into upstream requests within Google's
+    limits. An origin joins the current request only while the request's
+    grid stays within MAX_ELEMENT_OVERHEAD of the pairs it answers, so
+    origins sharing destinations are merged and unrelated ones are not. An
+    origin with more destinations than fit is split across requests of its own.
+    """
+    by_origin: Dict[Point, set] = defaultdict(set)
+    for origin, destination in pairs:
+        by_origin[origin].add(destination)
+
+    per_request = min(MAX_DESTINATIONS, MAX_ELEMENTS)
+    plans = []
+    origins: List[Point] = []
+    destinations: set = set()
+    wanted_pairs = 0
+    # Grouping origins with the same destinations next to each other lets them merge
+    for origin, wanted in sorted(by_origin.items(), key=lambda item: (-len(item[1]), sorted(item[1]))):
+        if len(wanted) > per_request:
+            wanted = sorted(wanted)
+            for start in range(0, len(wanted), per_request):
+                plans.append(([origin], wanted[start:start + per_request]))
+            continue
+        merged = destinations | wanted
+        elements = (len(origins) + 1) * len(merged)
+        if origins and (len(origins) + 1 > MAX_ORIGINS or len(merged) > MAX_DESTINATIONS
+                        or elements > MAX_ELEMENTS
+                        or elements > MAX_ELEMENT_OVERHEAD * (wanted_pairs + len(wanted))):
+            plans.append((origins, sorted(destinations)))
+            origins, merged, wanted_pairs = [], set(wanted), 0
+        origins.append(origin)
+        destinations = merged
+        wanted_pairs += len(wanted)
+    if origins:
+        plans.append((origins, sorted(destinations)))
+    return plans
+
+
+def _format(points: Sequence[Point]) -> str:
+    return "|".join(f"{lat},{lng}" for lat, lng in points)
+
+
+def fetch(origins: Sequence[Point], destinations: Sequence[Point], mode: str,
+          departure_time=None) -> Dict[Tuple[Point, Point], TravelTime]:
+    """One Distance Matrix request; returns every element Google answered, routes or not."""
+    api_key = config('GOOGLE_MAPS_API_KEY', default='')
+    if not api_key:
+        raise DistanceMatrixNotConfigured()
+    params = {
+        "origins": _format(origins),
+        "destinations": _format(destinations),
+        "mode": mode,
+        "units": "imperial",
+        "key": api_key,
+    }
+    if departure_time is not None and mode in TIMED_MODES:
+        params["departure_time"] = departure_time
+    data = requests.get(DISTANCE_MATRIX_URL, params=params, timeout=5).json()
+    if data.get("status") != "OK":
+        raise DistanceMatrixFailed(data.get("error_message", data.get("status", "Google error")))
+
+    results = {}
+    for origin, row in zip(origins, data["rows"]):
+        for destination, element in zip(destinations, row["elements"]):
+            if element.get("status") != "OK":
+                results[(origin, destination)] = TravelTime(
+                    None, None, "google", element.get("status", "UNKNOWN"))
+                continue
+            duration = element.get("duration_in_traffic") or element["duration"]
+            results[(origin, destination)] = TravelTime(
+                element["distance"]["value"], duration["value"], "google")
+    return results
+
+
+def _cached(keys: Sequence[str]) -> Dict[str, TravelTime]:
+    from boiler_park_backend.models import TravelTimeEntry
+
+    try:
+        entries = TravelTimeEntry.objects.filter(
+            key__in=keys, fetched_at__gte=timezone.now() - timedelta(days=CACHE_TTL_DAYS),
+        ).values_list("key", "distance_meters", "duration_seconds", "status")
+        return {key: TravelTime(distance, duration, "cache", entry_status)
+                for key, distance, duration, entry_status in entries}
+    except DatabaseError:
+        logger.exception("Travel time cache read failed")
+        return {}
+
+
+def store(results: Dict[Tuple[Point, Point], TravelTime], mode: str, bucket: str,
+          precomputed: bool = False) -> None:
+    from boiler_park_backend.models import TravelTimeEntry
+
+    now = timezone.now()
+    entries = [
+        TravelTimeEntry(
+            key=cache_key(origin, destination, mode, bucket), mode=mode, bucket=bucket,
+            distance_meters=result.distance_meters, duration_seconds=result.duration_seconds,
+            status=result.status, fetched_at=now, precomputed=precomputed)
+        for (origin, destination), result in results.items()
+    ]
+    try:
+        TravelTimeEntry.objects.bulk_create(
+            entries, update_conflicts=True, unique_fields=["key"],
+            update_fields=["distance_meters", "duration_seconds", "status", "fetched_at", "precomputed"])
+    except DatabaseError:
+        logger.exception("Travel time cache write failed")
+
+
+def fetch_all(pairs: Iterable[Tuple[Point, Point]], mode: str, bucket: str,
+              departure_time=None, precomputed: bool = False,
+              max_requests: Optional[int] = None):
+    """
+    Fetch and cache `pairs` in as few requests as possible.
+    Returns (results by pair, number of upstream requests). Raises
+    TooManyUncachedPairs before calling Google if more than `max_requests`
+    requests would be needed.
+    """
+    results: Dict[Tuple[Point, Point], TravelTime] = {}
+    plans = plan_requests(pairs)
+    if max_requests is not None and len(plans) > max_requests:
+        raise TooManyUncachedPairs(
+            f"{len(plans)} upstream requests needed, at most {max_requests} allowed")
+    for origins, destinations in plans:
+        fetched = fetch(origins, destinations, mode, departure_time)
+        store(fetched, mode, bucket, precomputed)
+        results.update(fetched)
+    return results, len(plans)
+
+
+def travel_times(pairs: Sequence[Tuple[Point, Point]], mode: str = "driving",
+                 when: Optional[datetime] = None, max_uncached: Optional[int] = None,
+                 max_requests: Optional[int] = None):
+    """
+    Travel times for (origin, destination) pairs of (lat, lng), leaving `when`
+    (default: now). Returns (a TravelTime, or None where there is no route,
+    per pair; number of upstream requests). Raises DistanceMatrixNotConfigured or
+    DistanceMatrixFailed only if uncached pairs can't be fetched, and
+    TooManyUncachedPairs (without calling Google) if more than
+    `max_uncached` pairs or `max_requests` requests would be needed.
+    """
+    bucket = time_bucket(when)
+    rounded = [(round_point(*origin), round_point(*destination)) for origin, destination in pairs]
+    keys = [cache_key(origin, destination, mode, bucket) for origin, destination in rounded]
+    cached = _cached(list(set(keys)))
+
+    missing = {pair for pair, key in zip(rounded, keys) if key not in cached}
+    fetched, calls = {}, 0
+    if max_uncached is not None and len(missing) > max_uncached:
+        raise TooManyUncachedPairs(
+            f"{len(missing)} pairs are not cached, at most {max_uncached} can be fetched at once")
+    if missing:
+        departure = int(when.timestamp()) if when and when > timezone.now() else "now"
+        fetched, calls = fetch_all(missing, mode, bucket, departure, max_requests=max_requests)
+    results = [cached[key] if key in cached else fetched.get(pair)
+               for pair, key in zip(rounded, keys)]
+    return [result if result is not None and result.status == "OK" else None
+            for result in results], calls
+
+
+def precompute(origins: Sequence[Point], destinations: Sequence[Point],
+               modes: Sequence[str] = ("driving",), buckets: Optional[Sequence[str]] = None):
+    """
+    Refresh every origin -> destination entry for each mode and bucket.
+    Buckets only matter for timed modes; others are fetched once per bucket
+    key from the same answer. Returns (entries written, upstream requests).
+    """
+    buckets = list(buckets or [name for name, *_ in BUCKETS])
+    origins = sorted({round_point(*point) for point in origins})
+    destinations = sorted({round_point(*point) for point in destinations})
+    pairs = [(origin, destination) for origin in origins for destination in destinations]
+    written = calls = 0
+    for mode in modes:
+        if mode not in TIMED_MODES:
+            results, used = fetch_all(pairs, mode, buckets[0], precomputed=True)
+            for bucket in buckets[1:]:
+                store(results, mode, bucket, precomputed=True)
+            written += len(results) * len(buckets)
+            calls += used
+            continue
+        for bucket in buckets:
+            results, used = fetch_all(pairs, mode, bucket, bucket_departure(bucket), precomputed=True)
+            written += len(results)
+            calls += used
+    return written, calls
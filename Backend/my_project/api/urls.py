@@ -5,6 +5,7 @@ urlpatterns = [
     path('', views.get_data),
     path('api/signup/', views.sign_up),
     path('api/parking/availability/', views.get_parking_availability),
+    path('api/cameras/health/', views.get_camera_health),
     path('api/login/', views.log_in),
     path('api/apple/', views.apple_sign_in),
     path('api/notification_token/', views.accept_notification_token),
@@ -14,9 +15,12 @@ urlpatterns = [
     path('api/user/location/', views.get_location),
     path('api/user/get_user', views.get_user),
     path('api/geocode/', views.geocode_address),
+    path('api/geocode/stats/', views.geocode_stats),
     path("api/distance-matrix/", views.distance_matrix, name="distance-matrix"),
+    path("api/distance-matrix/batch/", views.distance_matrix_batch, name="distance-matrix-batch"),
     path('api/confirm_parking/', views.create_parking_log),
     path('api/nearest-garage/', views.nearest_garage_from_location),
+    path('api/garages/rank/', views.rank_garages),
     path('api/user/insights/', views.user_insights, name='user_insights'),
 
     # Lot events (User Story #10)
@@ -26,6 +30,7 @@ urlpatterns = [
     path('api/notify/sale/', views.notify_parking_pass_sale),
     path('api/notify/closures/', views.notify_upcoming_closures),
     path('api/notifications/history/', views.notification_history),
+    path('api/notifications/export/', views.notification_export),
     path('api/notifications/stats/', views.notification_stats),
     path('api/notifications/check/', views.check_user_notifications),
     path('api/closure-notifications/', views.closure_notifications_toggle),
@@ -1,9 +1,14 @@
+import base64
+import binascii
+import csv
+import json
 import logging
-import re
+import math
 from statistics import mean
-from typing import List, Dict, Any, Optional
+from typing import Any, Optional
 from django.db import connection
-from django.db.models import Count
+from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
 
 
 import bcrypt
@@ -13,9 +18,10 @@ import requests
 from decouple import config
 from rest_framework.response import Response
 from redis.exceptions import RedisError
-from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, throttle_classes
 from rest_framework import status, serializers
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.throttling import AnonRateThrottle
 from boiler_park_backend.models import Item, User, LotEvent, NotificationLog, CalendarEvent, ParkingLot, UserPark, GarageIssueReport
 from .serializers import (
     ItemSerializer,
@@ -27,8 +33,17 @@ from .serializers import (
     FavoriteLotAlertPreferenceSerializer,
 )
 from .services import verify_apple_identity, issue_session_token
+from .lot_registry import registry
+from .lot_index import lot_index
+from .geocoding import GeocodeFailed, GeocodingNotConfigured, geocode, stats as geocoding_stats
+from .travel_times import (
+    MODES as TRAVEL_MODES,
+    DistanceMatrixFailed,
+    DistanceMatrixNotConfigured,
+    TooManyUncachedPairs,
+    travel_times,
+)
 from django.utils.timezone import make_aware
-from math import radians, sin, cos, sqrt, atan2
 from rest_framework.permissions import AllowAny
 
 import jwt
@@ -42,65 +57,6 @@ from google.auth.transport import requests as google_requests
 logger = logging.getLogger(__name__)
 
 
-PARKING_LOTS: List[Dict[str, Any]] = [
-    {"id": 1, "code": "PGH", "name": "Harrison Street Parking Garage",
-        "redis_key": "PGH_availability"},
-    {"id": 2, "code": "PGG", "name": "Grant Street Parking Garage",
-        "redis_key": "PGG_availability"},
-    {"id": 3, "code": "PGU", "name": "University Street Parking Garage",
-        "redis_key": "PGU_availability"},
-    {"id": 4, "code": "PGNW", "name": "Northwestern Avenue Parking Garage",
-        "redis_key": "PGNW_availability"},
-    {"id": 5, "code": "PGMD", "name": "McCutcheon Drive Parking Garage",
-        "redis_key": "PGMD_availability"},
-    {"id": 6, "code": "PGW", "name": "Wood Street Parking Garage",
-        "redis_key": "PGW_availability"},
-    {"id": 7, "code": "PGGH", "name": "Graduate House Parking Garage",
-        "redis_key": "PGGH_availability"},
-    {"id": 8, "code": "PGM", "name": "Marsteller Street Parking Garage",
-        "redis_key": "PGM_availability"},
-    {"id": 9, "code": "LOT_R",
-        "name": "Lot R (North of Ross-Ade)", "redis_key": "LOT_R_availability"},
-    {"id": 10, "code": "LOT_H",
-        "name": "Lot H (North of Football Practice Field)", "redis_key": "LOT_H_availability"},
-    {"id": 11, "code": "LOT_FB",
-        "name": "Lot FB (East of Football Practice Field)", "redis_key": "LOT_FB_availability"},
-    {"id": 12, "code": "KFPC", "name": "Kozuch Football Performance Complex Lot",
-        "redis_key": "KFPC_availability"},
-    {"id": 13, "code": "LOT_A",
-        "name": "Lot A (North of Cary Quad)", "redis_key": "LOT_A_availability"},
-    {"id": 14, "code": "CREC", "name": "Co-Rec Parking Lots",
-        "redis_key": "CREC_availability"},
-    {"id": 15, "code": "LOT_O",
-        "name": "Lot O (East of Rankin Track)", "redis_key": "LOT_O_availability"},
-    {"id": 16, "code": "TARK_WILY", "name": "Tarkington Wiley Parking Lots",
-        "redis_key": "TARK_WILY_availability"},
-    {"id": 17, "code": "LOT_AA",
-        "name": "Lot AA (6th & Russell)", "redis_key": "LOT_AA_availability"},
-    {"id": 18, "code": "LOT_BB",
-        "name": "Lot BB (6th & Waldron)", "redis_key": "LOT_BB_availability"},
-    {"id": 19, "code": "WND_KRACH", "name": "Windsor & Krach Shared Parking Lot",
-        "redis_key": "WND_KRACH_availability"},
-    {"id": 20, "code": "SHRV_ERHT_MRDH", "name": "Shreve, Earhart & Meredith Shared Lot",
-        "redis_key": "SHRV_ERHT_MRDH_availability"},
-    {"id": 21, "code": "MCUT_HARR_HILL", "name": "McCutcheon, Harrison & Hillenbrand Shared Lot",
-        "redis_key": "MCUT_HARR_HILL_availability"},
-    {"id": 22, "code": "DUHM", "name": "Duhme Hall Parking Lot",
-        "redis_key": "DUHM_availability"},
-    {"id": 23, "code": "PIERCE_ST", "name": "Pierce Street Parking Lot",
-        "redis_key": "PIERCE_ST_availability"},
-    {"id": 24, "code": "SMTH_BCHM", "name": "Smith & Biochemistry Lot",
-        "redis_key": "SMTH_BCHM_availability"},
-    {"id": 25, "code": "DISC_A",
-        "name": "Discovery Lot (A Permit)", "redis_key": "DISC_A_availability"},
-    {"id": 26, "code": "DISC_AB",
-        "name": "Discovery Lot (AB Permit)", "redis_key": "DISC_AB_availability"},
-    {"id": 27, "code": "DISC_ABC",
-        "name": "Discovery Lot (ABC Permit)", "redis_key": "DISC_ABC_availability"},
-    {"id": 28, "code": "AIRPORT", "name": "Airport Parking Lots",
-        "redis_key": "AIRPORT_availability"},
-]
-
 DUMMY_GARAGE_DETAILS = {
     "address": "123 Grant St, West Lafayette, IN 47906",
     "coordinates": {"lat": 40.4240, "lng": -86.9138},
@@ -360,12 +316,13 @@ def get_postgres_parking_data(request):
         lot_code = lot_code.upper()
     if period not in ["day", "week", "month"]:
         return Response({"error": "Invalid period. Must be 'day', 'week', or 'month'."}, status=400)
-    lot_entry = next(
-        (lot for lot in PARKING_LOTS if lot["code"].lower() == lot_code.lower()), None)
+    lot_entry = registry.get(lot_code)
     if not lot_entry:
         return Response({"error": f"Lot '{lot_code}' not found."}, status=404)
+    if not lot_entry.has_history:
+        return Response({"error": f"No history is recorded for lot '{lot_code}'."}, status=404)
 
-    column_name = lot_entry["redis_key"]
+    column_name = lot_entry.redis_key
 
     # Connect to Postgres
     conn = psycopg2.connect(
@@ -447,12 +404,13 @@ def get_hourly_average_parking(request):
             return Response({"error": "Invalid 'weekday' parameter."}, status=400)
         weekday_index = weekdays_map[weekday_param]
 
-    lot_entry = next(
-        (lot for lot in PARKING_LOTS if lot["code"].lower() == lot_code.lower()), None)
+    lot_entry = registry.get(lot_code)
     if not lot_entry:
         return Response({"error": f"Lot '{lot_code}' not found."}, status=404)
+    if not lot_entry.has_history:
+        return Response({"error": f"No history is recorded for lot '{lot_code}'."}, status=404)
 
-    column_name = lot_entry["redis_key"]
+    column_name = lot_entry.redis_key
 
     # Connect to Postgres
     conn = psycopg2.connect(
@@ -507,12 +465,13 @@ def get_parking_availability(request):
     try:
         client = _redis_connection()
         lots_payload = []
-        for lot in PARKING_LOTS:
-            raw_value = client.get(lot["redis_key"])
+        lots = registry.all()
+        raw_values = client.mget([lot.redis_key for lot in lots])
+        for lot, raw_value in zip(lots, raw_values):
             lots_payload.append({
-                "id": lot["id"],
-                "code": lot.get("code"),
-                "name": lot["name"],
+                "id": lot.id,
+                "code": lot.code,
+                "name": lot.name,
                 "available": _parse_int(raw_value),
             })
         return Response({"lots": lots_payload})
@@ -531,6 +490,83 @@ def get_parking_availability(request):
         )
 
 
+# Counting cameras write one JSON record each into this hash (see
+# cv_model/health.py). A camera is stale once it hasn't counted a frame, or
+# reported at all, for CAMERA_STALE_SECONDS.
+CAMERA_HEALTH_KEY = "_camera_health"
+CAMERA_STALE_SECONDS = config("CAMERA_STALE_SECONDS", default=60, cast=int)
+
+
+def _seconds_since(timestamp, now):
+    if not isinstance(timestamp, (int, float)):
+        return None
+    return round(now - timestamp, 1)
+
+
+@api_view(['GET'])
+def get_camera_health(request):
+    """Latest health record of every counting camera, and which lots' availability is stale."""
+    try:
+        raw_records = _redis_connection().hgetall(CAMERA_HEALTH_KEY)
+    except RedisError:
+        logger.exception("Unable to fetch camera health from Redis")
+        return Response(
+            {"detail": "Unable to reach parking availability service."},
+            status=503,
+        )
+
+    now = datetime.now().timestamp()
+    cameras = []
+    for camera, raw_record in sorted(raw_records.items()):
+        try:
+            record = json.loads(raw_record)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict) or not isinstance(record.get("redis_key"), (str, type(None))):
+            logger.warning("Ignoring malformed health record for camera %s", camera)
+            continue
+        since_frame = _seconds_since(record.get("last_frame_at"), now)
+        since_update = _seconds_since(record.get("updated_at"), now)
+        record["camera"] = camera
+        record["seconds_since_frame"] = since_frame
+        record["seconds_since_update"] = since_update
+        record["stale"] = (
+            since_frame is None or since_frame > CAMERA_STALE_SECONDS
+            or since_update is None or since_update > CAMERA_STALE_SECONDS
+        )
+        cameras.append(record)
+
+    by_key = {}
+    for record in cameras:
+        by_key.setdefault(record.get("redis_key"), []).append(record)
+
+    lots = []
+    for lot in registry.all():
+        lot_cameras = by_key.pop(lot.redis_key, [])
+        healthy = [record["camera"] for record in lot_cameras if not record["stale"]]
+        if not lot_cameras:
+            lot_status = "no_camera"
+        else:
+            lot_status = "ok" if healthy else "stale"
+        lots.append({
+            "id": lot.id,
+            "code": lot.code,
+            "name": lot.name,
+            "status": lot_status,
+            "cameras": [record["camera"] for record in lot_cameras],
+            "healthy_cameras": healthy,
+        })
+
+    return Response({
+        "stale_after_seconds": CAMERA_STALE_SECONDS,
+        "cameras": cameras,
+        "lots": lots,
+        # Cameras publishing to a key no lot uses (e.g. replays)
+        "unassigned_cameras": sorted(
+            record["camera"] for records in by_key.values() for record in records),
+    })
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def apple_sign_in(request):
@@ -678,16 +714,6 @@ def get_user(request):
     return (Response(UserSerializer(user).data))
 
 
-LOT_CAPACITY_MAP = {
-    "pgh": 240, "pgg": 240, "pgu": 240, "pgnw": 240, "pgmd": 240, "pgw": 240,
-    "pggh": 240, "pgm": 240, "lot_r": 120, "lot_h": 80, "lot_fb": 100, "kfpc": 100,
-    "lot_a": 120, "crec": 150, "lot_o": 100, "tark_wily": 100, "lot_aa": 100,
-    "lot_bb": 80, "wnd_krach": 100, "shrv_erht_mrdh": 120, "mcut_harr_hill": 100,
-    "duhm": 60, "pierce_st": 100, "smth_bchm": 120, "disc_a": 100, "disc_ab": 100,
-    "disc_abc": 100, "airport": 80,
-}
-
-
 @api_view(['POST'])
 def create_parking_log(request):
     email = request.data.get("email")
@@ -778,11 +804,8 @@ def get_parking_comparison(request):
     invalid_lots = []
 
     for lot_code in lot_codes:
-        lot_entry = next(
-            (lot for lot in PARKING_LOTS if lot["code"].upper() == lot_code),
-            None
-        )
-        if not lot_entry:
+        lot_entry = registry.get(lot_code)
+        if not lot_entry or not lot_entry.has_history:
             invalid_lots.append(lot_code)
             continue
 
@@ -791,7 +814,7 @@ def get_parking_comparison(request):
             conn = get_postgres_connection()
             cursor = conn.cursor()
 
-            column_name = lot_entry["redis_key"]
+            column_name = lot_entry.redis_key
 
             # Determine time interval
             interval = "1 day" if period == "day" else "7 days"
@@ -812,15 +835,13 @@ def get_parking_comparison(request):
                 logger.warning(f"No data found for lot {lot_code}")
                 continue
 
-            # Get total capacity (you may need to add this to PARKING_LOTS or fetch from DB)
-            # Using default 240 for garages, adjust based on your actual data
-            total_capacity = LOT_CAPACITY_MAP.get(lot_code.lower(), 240)
+            total_capacity = lot_entry.capacity
 
             # Get current availability from Redis
             try:
                 redis_client = _redis_connection()
                 current_availability = _parse_int(
-                    redis_client.get(lot_entry["redis_key"])) or 0
+                    redis_client.get(lot_entry.redis_key)) or 0
             except RedisError:
                 # Fallback to latest Postgres value
                 current_availability = int(rows[-1][1]) if rows else 0
@@ -868,7 +889,7 @@ def get_parking_comparison(request):
 
             comparisons.append({
                 "lot_code": lot_code.lower(),
-                "lot_name": lot_entry["name"],
+                "lot_name": lot_entry.name,
                 "current_occupancy": total_capacity - current_occupancy,
                 "total_capacity": total_capacity,
                 "occupancy_percentage": occupancy_percentage,
@@ -1239,10 +1260,29 @@ def notify_parking_pass_sale(request):
 
 @api_view(['POST'])
 def notify_upcoming_closures(request):
-    """Stub endpoint for closure notifications (schedule integration later)."""
-    lot = request.data.get("lot") or "PGH"
-    date = request.data.get("date") or "tomorrow"
-    return Response({"queued": True, "lot": lot, "date": date})
+    """
+    Notify interested users about upcoming closures for one lot now.
+    Uses the same planner and deduplication as the closure scheduler, so
+    calling it repeatedly never double-notifies a user about an event.
+
+    Body:
+        lot: Lot code (default PGH)
+        hours: Look-ahead window in hours (default 24)
+    """
+    from .closure_notifications import dispatch_closure_digests, plan_closure_digests
+
+    lot = (request.data.get("lot") or "PGH").upper()
+    hours = _parse_int(request.data.get("hours")) or 24
+
+    digests = plan_closure_digests(hours_ahead=hours, lot_codes=[lot])
+    sent, failed = dispatch_closure_digests(digests)
+
+    return Response({
+        "lot": lot,
+        "hours": hours,
+        "sent": sent,
+        "failed": failed,
+    })
 
 
 @api_view(['POST'])
@@ -1292,39 +1332,137 @@ def update_specific_rating(request):
     return Response({"status": "Successfully saved"})
 
 
+def _encode_history_cursor(log) -> str:
+    raw = f"{log.sent_at.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_history_cursor(cursor: str):
+    """Return (sent_at, id) from an opaque cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        sent_at_str, log_id = raw.rsplit("|", 1)
+        sent_at = parse_datetime(sent_at_str)
+        if sent_at is None:
+            return None
+        return sent_at, int(log_id)
+    except (ValueError, UnicodeError, binascii.Error):
+        return None
+
+
+def _filter_notification_logs(params):
+    """Apply the shared notification log filters (email, prefix, type)."""
+    notifications = NotificationLog.objects.all()
+
+    # Resolve users through the indexed email column first so the log query
+    # can use the (user, sent_at) index instead of joining on every row.
+    user_email = params.get('user_email')
+    if user_email:
+        notifications = notifications.filter(
+            user_id__in=User.objects.filter(email=user_email).values('id'))
+
+    user_email_prefix = params.get('user_email_prefix')
+    if user_email_prefix:
+        notifications = notifications.filter(
+            user_id__in=User.objects.filter(
+                email__startswith=user_email_prefix).values('id'))
+
+    notification_type = params.get('notification_type')
+    if notification_type:
+        notifications = notifications.filter(
+            notification_type=notification_type)
+
+    return notifications
+
+
 @api_view(['GET'])
 def notification_history(request):
     """
     Get notification history with optional filtering.
     Used for debugging and monitoring User Story #2 and #11.
 
+    Results are newest first and paginated with a keyset cursor on
+    (sent_at, id), so older pages cost the same as the first one.
+
     Query params:
-        user_email: Filter by user email
+        user_email: Exact user email
+        user_email_prefix: Email prefix (e.g. "jdoe" or "jdoe@pur")
         notification_type: Filter by type (pass_sale, lot_closure, etc.)
         limit: Number of results (default 50, max 200)
+        cursor: `next_cursor` from a previous page
 
     Example:
         /api/notifications/history/?notification_type=pass_sale&limit=10
     """
-    # Start with all notifications
-    notifications = NotificationLog.objects.all()
+    try:
+        limit = min(int(request.query_params.get('limit', 50)), 200)
+    except (TypeError, ValueError):
+        return Response({"error": "limit must be an integer"}, status=400)
+    limit = max(limit, 1)
 
-    # Filter by user email if provided
-    user_email = request.query_params.get('user_email')
-    if user_email:
-        notifications = notifications.filter(user__email__icontains=user_email)
+    notifications = _filter_notification_logs(request.query_params)
 
-    # Filter by notification type if provided
-    notification_type = request.query_params.get('notification_type')
-    if notification_type:
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        position = _decode_history_cursor(cursor)
+        if position is None:
+            return Response({"error": "Invalid cursor"}, status=400)
+        sent_at, log_id = position
         notifications = notifications.filter(
-            notification_type=notification_type)
+            Q(sent_at__lt=sent_at) | Q(sent_at=sent_at, id__lt=log_id))
+
+    # Fetch one extra row to know whether another page exists
+    page = list(
+        notifications.select_related('user')
+        .order_by('-sent_at', '-id')[:limit + 1]
+    )
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    return Response({
+        "results": NotificationLogSerializer(page, many=True).data,
+        "next_cursor": _encode_history_cursor(page[-1]) if has_more else None,
+    })
 
-    # Limit results
-    limit = min(int(request.query_params.get('limit', 50)), 200)
-    notifications = notifications[:limit]
 
-    return Response(NotificationLogSerializer(notifications, many=True).data)
+class _Echo:
+    """File-like object whose write() hands the row back to the generator."""
+
+    def write(self, value):
+        return value
+
+
+@api_view(['GET'])
+def notification_export(request):
+    """
+    Stream the full notification log as CSV for audits.
+
+    Accepts the same filters as notification_history. Rows are read with a
+    server-side cursor and written as they arrive, so memory use does not
+    grow with the size of the log.
+
+    Example:
+        /api/notifications/export/?notification_type=lot_closure
+    """
+    rows = (
+        _filter_notification_logs(request.query_params)
+        .order_by('sent_at', 'id')
+        .values_list('id', 'sent_at', 'user_id', 'user__email',
+                     'notification_type', 'success', 'message', 'error_message')
+        .iterator(chunk_size=2000)
+    )
+    writer = csv.writer(_Echo())
+    header = ['id', 'sent_at', 'user_id', 'user_email',
+              'notification_type', 'success', 'message', 'error_message']
+
+    def _stream():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(_stream(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="notification_log.csv"'
+    return response
 
 
 @api_view(['GET'])
@@ -1394,7 +1532,8 @@ def check_user_notifications(request):
             user.notification_token and user.notification_token.strip())
 
         # Get recent notifications for this user
-        recent_notifications = NotificationLog.objects.filter(user=user)[:5]
+        recent_notifications = NotificationLog.objects.filter(
+            user=user).order_by('-sent_at', '-id')[:5]
 
         return Response({
             'email': user.email,
@@ -1534,8 +1673,7 @@ def get_garage_detail(request, garage_id: int):
     Path param: garage_id (int)
     Example response fields include totals, levels, features, and a short occupancy series.
     """
-    # Find the garage skeleton from PARKING_LOTS
-    garage = next((g for g in PARKING_LOTS if g["id"] == int(garage_id)), None)
+    garage = registry.by_id(garage_id)
     if not garage:
         return Response(
             {"detail": f"Garage with id {garage_id} not found"},
@@ -1547,7 +1685,7 @@ def get_garage_detail(request, garage_id: int):
     levels = [dict(l) for l in DUMMY_GARAGE_DETAILS["levels"]]
 
     # Light per-garage customization
-    name = garage["name"]
+    name = garage.name
     if "Harrison" in name:
         details["address"] = "504 Northwestern Ave, West Lafayette, IN 47906"
         details["features"]["covered"] = True
@@ -1577,9 +1715,9 @@ def get_garage_detail(request, garage_id: int):
     total, available, occupied, pct_available = _compute_totals(levels)
 
     payload = {
-        "id": garage["id"],
+        "id": garage.id,
         "name": name,
-        "redis_key": garage["redis_key"],
+        "redis_key": garage.redis_key,
         "address": details["address"],
         "coordinates": details["coordinates"],
         "hours": details["hours"],
@@ -1748,9 +1886,9 @@ def list_shade_cover_indicators(request):
     Useful for list and map screens.
     """
     results = []
-    for g in PARKING_LOTS:
+    for g in registry.all():
         # call the detail builder to keep the single source of truth
-        detail_resp = get_garage_detail(request, g["id"])
+        detail_resp = get_garage_detail(request, g.id)
         if detail_resp.status_code != status.HTTP_200_OK:
             continue
         data = detail_resp.data
@@ -1829,74 +1967,20 @@ def geocode_address(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Get API key from environment variables (kept secure on backend)
-    api_key = config('GOOGLE_MAPS_API_KEY', default='')
-    print(api_key)
-    if not api_key:
+    try:
+        result = geocode(address)
+    except GeocodingNotConfigured:
         logger.error(
             "GOOGLE_MAPS_API_KEY not configured in backend environment")
         return Response(
             {"error": "Geocoding service not configured"},
             status=status.HTTP_503_SERVICE_UNAVAILABLE
         )
-
-    try:
-        # Add West Lafayette context for Purdue-area addresses if needed
-        search_address = address
-        lower_address = address.lower()
-
-        # Check if address already has location context
-        has_city = ',' in address
-        has_state = bool(re.search(r'\b(in|indiana)\b', lower_address))
-        has_zip = bool(re.search(r'\b\d{5}\b', address))
-
-        # Add context for incomplete addresses
-        if not has_city and not has_state and not has_zip and 'lafayette' not in lower_address:
-            # For Purdue buildings/landmarks, add university context
-            purdue_keywords = [
-                'purdue', 'memorial union', 'lawson', 'krannert',
-                'stewart center', 'pmucorr', 'recwell', 'corec'
-            ]
-            if any(keyword in lower_address for keyword in purdue_keywords):
-                search_address = f"{address}, Purdue University, West Lafayette, IN"
-                logger.info(f"Geocoding Purdue landmark: {search_address}")
-            else:
-                search_address = f"{address}, West Lafayette, Indiana"
-                logger.info(f"Geocoding with added context: {search_address}")
-        else:
-            logger.info(f"Geocoding: {search_address}")
-
-        # Call Google Maps Geocoding API
-        geocode_url = "https://maps.googleapis.com/maps/api/geocode/json"
-        params = {
-            'address': search_address,
-            'key': api_key,
-            'bounds': '40.39286,-86.954622|40.466874,-86.871755',  # West Lafayette bounds
-            'region': 'us'
-        }
-
-        response = requests.get(geocode_url, params=params, timeout=5)
-        data = response.json()
-
-        if data['status'] == 'OK' and data.get('results'):
-            location = data['results'][0]['geometry']['location']
-            formatted_address = data['results'][0]['formatted_address']
-
-            logger.info(
-                f"✅ Geocoded '{address}' to ({location['lat']}, {location['lng']})")
-
-            return Response({
-                'latitude': location['lat'],
-                'longitude': location['lng'],
-                'formatted_address': formatted_address
-            }, status=status.HTTP_200_OK)
-        else:
-            error_msg = data.get('status', 'UNKNOWN')
-            logger.warning(f"Geocoding failed for '{address}': {error_msg}")
-            return Response({
-                'error': f"Could not geocode address: {error_msg}"
-            }, status=status.HTTP_404_NOT_FOUND)
-
+    except GeocodeFailed as e:
+        logger.warning(f"Geocoding failed for '{address}': {e}")
+        return Response({
+            'error': f"Could not geocode address: {e}"
+        }, status=status.HTTP_404_NOT_FOUND)
     except requests.Timeout:
         logger.error(f"Geocoding timeout for address: {address}")
         return Response(
@@ -1910,6 +1994,22 @@ def geocode_address(request):
             status=status.HTTP_503_SERVICE_UNAVAILABLE
         )
 
+    logger.info(
+        f"✅ Geocoded '{address}' to ({result.latitude}, {result.longitude}) from {result.source}")
+    return Response({
+        'latitude': result.latitude,
+        'longitude': result.longitude,
+        'formatted_address': result.formatted_address,
+        'source': result.source,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def geocode_stats(request):
+    """Where this worker's geocode lookups were answered, and its cache hit ratio."""
+    return Response(geocoding_stats(), status=status.HTTP_200_OK)
+
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -1951,68 +2051,125 @@ def nearest_garage_from_location(request):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        user_lat = float(lat)
-        user_lng = float(lng)
+        user_lat, user_lng = _coordinates(request.data)
 
     except (TypeError, ValueError):
         return Response(
-            {"detail": "latitude and longitude must be numeric"},
+            {"detail": "latitude and longitude must be numeric and in range"},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    # Haversine distance (meters)
-    def _distance_m(lat1, lon1, lat2, lon2):
-        R = 6371000.0  # Earth radius in meters
-        phi1 = radians(lat1)
-        phi2 = radians(lat2)
-        d_phi = radians(lat2 - lat1)
-        d_lambda = radians(lon2 - lon1)
-
-        a = (
-            sin(d_phi / 2) ** 2
-            + cos(phi1) * cos(phi2) * sin(d_lambda / 2) ** 2
-        )
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-        return R * c
+    matches = lot_index().nearest(user_lat, user_lng, k=1, radius_m=radius_m)
+    nearest = matches[0] if matches else None
 
-    garages = ParkingLot.objects.all()
+    if not nearest:
+        # No garage within radius
+        return Response({"found": False}, status=status.HTTP_200_OK)
 
-    nearest = None
-    nearest_dist = None
+    return Response(
+        {
+            "found": True,
+            "garage": {
+                "id": nearest.lot.id,
+                "code": nearest.lot.code,
+                "name": nearest.lot.name,
+                "distance_m": round(nearest.distance_m, 2),
+            },
+        },
+        status=status.HTTP_200_OK,
+    )
 
-    for lot in garages:
-        # Adjust these attribute names if your model is different
-        lot_lat = getattr(lot, "lat", None)
-        lot_lng = getattr(lot, "lon", None)
 
-        if lot_lat is None or lot_lng is None:
-            continue
+MAX_RANK_POINTS = 200
 
-        try:
-            lot_lat = float(lot_lat)
-            lot_lng = float(lot_lng)
-        except (TypeError, ValueError):
-            continue
 
-        d = _distance_m(user_lat, user_lng, lot_lat, lot_lng)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def rank_garages(request):
+    """
+    Rank the closest garages to each of many points in one request, e.g. the
+    buildings of a user's classes. Distances are straight-line meters.
 
-        if d <= radius_m and (nearest is None or d < nearest_dist):
-            nearest = lot
-            nearest_dist = d
+    Body (JSON):
+      {
+        "points": [
+          {"latitude": 40.4274, "longitude": -86.9169},
+          {"latitude": 40.4237, "longitude": -86.9212}
+        ],
+        "k": 3,                # optional, garages per point (default 3)
+        "radius_m": 1500,      # optional, ignore garages farther than this
+        "permits": ["A", "Paid"]  # optional, only lots accepting one of these
+      }
 
-    if not nearest:
-        # No garage within radius
-        return Response({"found": False}, status=status.HTTP_200_OK)
+    Response:
+      {
+        "results": [
+          {
+            "latitude": 40.4274,
+            "longitude": -86.9169,
+            "garages": [
+              {"id": 3, "code": "PGU", "name": "University Street Parking Garage",
+               "distance_m": 241.7},
+              ...
+            ]
+          },
+          ...
+        ]
+      }
+    """
+    points = request.data.get("points")
+    if not isinstance(points, list) or not points:
+        return Response(
+            {"detail": "points must be a non-empty list"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if len(points) > MAX_RANK_POINTS:
+        return Response(
+            {"detail": f"at most {MAX_RANK_POINTS} points per request"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
+    try:
+        coords = [_coordinates(p) for p in points]
+        k = int(request.data.get("k", 3))
+        radius_m = request.data.get("radius_m")
+        radius_m = float(radius_m) if radius_m is not None else None
+        if radius_m is not None and math.isnan(radius_m):
+            raise ValueError("radius_m is NaN")
+    except (KeyError, TypeError, ValueError):
+        return Response(
+            {"detail": "each point needs latitude and longitude in range; k and radius_m must be numeric"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    permits = request.data.get("permits") or []
+    if isinstance(permits, str):
+        permits = [permits]
+    if not isinstance(permits, list) or not all(isinstance(permit, str) for permit in permits):
+        return Response(
+            {"detail": "permits must be a string or a list of strings"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    ranked = lot_index().nearest_many(coords, k=max(k, 0), radius_m=radius_m, permits=permits)
     return Response(
         {
-            "found": True,
-            "garage": {
-                "id": nearest.id,
-                "code": getattr(nearest, "code", None),
-                "name": getattr(nearest, "name", None),
-                "distance_m": round(nearest_dist, 2),
-            },
+            "results": [
+                {
+                    "latitude": lat,
+                    "longitude": lng,
+                    "garages": [
+                        {
+                            "id": match.lot.id,
+                            "code": match.lot.code,
+                            "name": match.lot.name,
+                            "distance_m": round(match.distance_m, 2),
+                        }
+                        for match in matches
+                    ],
+                }
+                for (lat, lng), matches in zip(coords, ranked)
+            ]
         },
         status=status.HTTP_200_OK,
     )
@@ -2029,13 +2186,6 @@ def distance_matrix(request):
     "destination": { "latitude": 40.43, "longitude": -86.91 }
   }
   """
-  api_key = config('GOOGLE_MAPS_API_KEY', default='')
-  if not api_key:
-    return Response(
-      {"error": "Google Maps API key not configured"},
-      status=status.HTTP_503_SERVICE_UNAVAILABLE,
-    )
-
   try:
     origin = request.data.get("origin")
     destination = request.data.get("destination")
@@ -2043,39 +2193,134 @@ def distance_matrix(request):
     if not origin or not destination:
       return Response({"error": "origin and destination required"}, status=400)
 
-    origin_str = f"{origin['latitude']},{origin['longitude']}"
-    dest_str   = f"{destination['latitude']},{destination['longitude']}"
-
-    resp = requests.get(
-      "https://maps.googleapis.com/maps/api/distancematrix/json",
-      params={
-        "origins": origin_str,
-        "destinations": dest_str,
-        "mode": "driving",
-        "units": "imperial",
-        "key": api_key,
-      },
-      timeout=5,
-    )
-    data = resp.json()
-
-    if data.get("status") != "OK":
-      return Response({"error": data.get("error_message", "Google error")}, status=502)
-
-    row = data["rows"][0]["elements"][0]
-    if row.get("status") != "OK":
-      return Response({"error": row.get("status", "No route")}, status=502)
-
-    distance_meters = row["distance"]["value"]
-    duration_seconds = row["duration"]["value"]
+    pair = ((origin['latitude'], origin['longitude']),
+            (destination['latitude'], destination['longitude']))
+    (result,), _ = travel_times([pair])
+    if result is None:
+      return Response({"error": "No route"}, status=502)
 
     return Response(
       {
-        "distance_meters": distance_meters,
-        "duration_seconds": duration_seconds,
+        "distance_meters": result.distance_meters,
+        "duration_seconds": result.duration_seconds,
       }
     )
+  except DistanceMatrixNotConfigured:
+    return Response(
+      {"error": "Google Maps API key not configured"},
+      status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+  except DistanceMatrixFailed as e:
+    return Response({"error": str(e)}, status=502)
   except Exception as e:
     return Response({"error": str(e)}, status=500)
 
 
+MAX_DISTANCE_PAIRS = 100
+# Each request may send at most this many uncached pairs, in at most
+# MAX_DISTANCE_UPSTREAM_REQUESTS Google calls, so anonymous callers can't
+# run up the bill or hold a worker for long
+MAX_UNCACHED_DISTANCE_PAIRS = 25
+MAX_DISTANCE_UPSTREAM_REQUESTS = 3
+
+
+def _coordinates(point):
+  """(lat, lng) from a {"latitude", "longitude"} dict; ValueError if out of range or NaN."""
+  lat = float(point["latitude"])
+  lng = float(point["longitude"])
+  # NaN fails both comparisons, so it is rejected too
+  if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+    raise ValueError(f"invalid coordinates {lat}, {lng}")
+  return lat, lng
+
+
+class DistanceMatrixBatchThrottle(AnonRateThrottle):
+  scope = "distance_matrix_batch"
+  rate = config("DISTANCE_MATRIX_BATCH_RATE", default="20/hour")
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@throttle_classes([DistanceMatrixBatchThrottle])
+def distance_matrix_batch(request):
+  """
+  Travel times for many origin/destination pairs in one request. Cached
+  pairs (including the nightly lot -> building precompute) are answered
+  locally; the rest are packed into as few Google requests as possible.
+  Requests that would send more than MAX_UNCACHED_DISTANCE_PAIRS uncached
+  pairs to Google (or more than MAX_DISTANCE_UPSTREAM_REQUESTS calls) are
+  rejected with 400, and callers are rate limited.
+
+  Request body:
+  {
+    "pairs": [
+      {
+        "origin": { "latitude": 40.42, "longitude": -86.92 },
+        "destination": { "latitude": 40.43, "longitude": -86.91 }
+      },
+      ...
+    ],
+    "mode": "driving"   # optional: driving, walking, bicycling or transit
+  }
+
+  Response:
+  {
+    "results": [
+      { "distance_meters": 1530, "duration_seconds": 240, "cached": true },
+      null,   # no route for this pair
+      ...
+    ],
+    "upstream_requests": 1
+  }
+  """
+  pairs = request.data.get("pairs")
+  mode = request.data.get("mode", "driving")
+  if not isinstance(pairs, list) or not pairs:
+    return Response({"error": "pairs must be a non-empty list"}, status=400)
+  if len(pairs) > MAX_DISTANCE_PAIRS:
+    return Response({"error": f"at most {MAX_DISTANCE_PAIRS} pairs per request"}, status=400)
+  if mode not in TRAVEL_MODES:
+    return Response({"error": f"mode must be one of {', '.join(TRAVEL_MODES)}"}, status=400)
+
+  try:
+    points = [(_coordinates(p["origin"]), _coordinates(p["destination"])) for p in pairs]
+  except (KeyError, TypeError, ValueError):
+    return Response(
+      {"error": "every pair needs an origin and destination with latitude in [-90, 90] "
+                "and longitude in [-180, 180]"},
+      status=400,
+    )
+
+  try:
+    results, calls = travel_times(
+      points, mode=mode,
+      max_uncached=MAX_UNCACHED_DISTANCE_PAIRS,
+      max_requests=MAX_DISTANCE_UPSTREAM_REQUESTS,
+    )
+  except TooManyUncachedPairs as e:
+    return Response({"error": str(e)}, status=400)
+  except DistanceMatrixNotConfigured:
+    return Response(
+      {"error": "Google Maps API key not configured"},
+      status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+  except DistanceMatrixFailed as e:
+    return Response({"error": str(e)}, status=502)
+  except requests.RequestException as e:
+    return Response({"error": str(e)}, status=502)
+
+  return Response(
+    {
+      "results": [
+        None if result is None else {
+          "distance_meters": result.distance_meters,
+          "duration_seconds": result.duration_seconds,
+          "cached": result.source == "cache",
+        }
+        for result in results
+      ],
+      "upstream_requests": calls,
+    }
+  )
+
+
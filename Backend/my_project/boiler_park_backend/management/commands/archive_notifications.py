@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from boiler_park_backend.models import NotificationLog
+from datetime import timedelta
+from pathlib import Path
+import gzip
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = (
+    'id', 'user_id', 'user__email', 'notification_type',
+    'message', 'sent_at', 'success', 'error_message',
+)
+
+
+class Command(BaseCommand):
+    help = "Archive old notification logs into monthly gzip files and delete them in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help='Archive logs older than this many days (default: 90)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows archived and deleted per transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=0,
+            help='Stop after this many batches, 0 for no limit (default: 0)'
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=str(Path(settings.BASE_DIR) / 'notification_archive'),
+            help='Directory for notifications-YYYY-MM.jsonl.gz files'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many rows would be archived without touching anything'
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        batch_size = options['batch_size']
+        max_batches = options['max_batches']
+        archive_dir = Path(options['archive_dir'])
+
+        if days < 1:
+            raise CommandError("--days must be at least 1")
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        cutoff = timezone.now() - timedelta(days=days)
+        expired = NotificationLog.objects.filter(sent_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"[DRY RUN] {expired.count()} notification logs older than {cutoff:%Y-%m-%d} would be archived")
+            return
+
+        archive_dir.mkdir(parents=True, exist_ok=True)
+
+        archived = 0
+        batches = 0
+        while not max_batches or batches < max_batches:
+            # Oldest-first so each batch is a contiguous range of the
+            # (sent_at, id) index and monthly files are appended in order.
+            rows = list(
+                expired.order_by('sent_at', 'id').values(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+
+            self._append_to_archive(archive_dir, rows)
+
+            # Rows are only deleted after they are safely on disk; a crash in
+            # between archives a batch twice rather than losing it.
+            with transaction.atomic():
+                NotificationLog.objects.filter(
+                    id__in=[row['id'] for row in rows]).delete()
+
+            archived += len(rows)
+            batches += 1
+            self.stdout.write(f"  Archived batch {batches} ({len(rows)} rows)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✓ Archived {archived} notification logs older than {cutoff:%Y-%m-%d} into {archive_dir}"
+        ))
+
+    def _append_to_archive(self, archive_dir, rows):
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row['sent_at'].strftime('%Y-%m'), []).append(row)
+
+        for month, month_rows in by_month.items():
+            path = archive_dir / f"notifications-{month}.jsonl.gz"
+            # Appending writes a new gzip member; gzip readers treat the
+            # concatenated members as one stream.
+            with gzip.open(path, 'at', encoding='utf-8') as fh:
+                for row in month_rows:
+                    fh.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+            logger.info("Appended %d notification logs to %s", len(month_rows), path)
@@ -1,15 +1,19 @@
 from django.core.management.base import BaseCommand
-from boiler_park_backend.models import LotEvent, User, NotificationLog
-from api.push_notifications import send_push_message
-from datetime import timedelta
-from django.utils import timezone
+from api.closure_notifications import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_HISTORY_DAYS,
+    DEFAULT_MIN_VISITS,
+    dispatch_closure_digests,
+    plan_closure_digests,
+)
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
-    help = "Scan upcoming lot closures and send notifications to users"
+    help = "Scan upcoming lot closures and send each interested user one digest notification"
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -18,6 +22,29 @@ class Command(BaseCommand):
             default=24,
             help='Look ahead this many hours for closures (default: 24)'
         )
+        parser.add_argument(
+            '--history-days',
+            type=int,
+            default=DEFAULT_HISTORY_DAYS,
+            help=f'Parking history window used to infer lots a user cares about (default: {DEFAULT_HISTORY_DAYS})'
+        )
+        parser.add_argument(
+            '--min-visits',
+            type=int,
+            default=DEFAULT_MIN_VISITS,
+            help=f'Visits within the history window that make a lot relevant (default: {DEFAULT_MIN_VISITS})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Push messages per Expo request (default: {DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--resend',
+            action='store_true',
+            help='Include closures users were already notified about'
+        )
         parser.add_argument(
             '--dry-run',
             action='store_true',
@@ -27,105 +54,32 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         hours_ahead = options['hours']
         dry_run = options['dry_run']
-        
-        # Find events starting within the specified timeframe
-        now = timezone.now()
-        future_time = now + timedelta(hours=hours_ahead)
-        
-        upcoming_events = LotEvent.objects.filter(
-            start_time__gte=now,
-            start_time__lte=future_time
-        ).order_by('start_time')
-        
-        self.stdout.write(f"Found {upcoming_events.count()} upcoming events in next {hours_ahead} hours")
-        
-        if upcoming_events.count() == 0:
-            self.stdout.write(self.style.WARNING("No upcoming closures found. Exiting."))
-            return
-        
-        # Get users with:
-        # 1. notification_token (opted-in to push)
-        # 2. closure_notifications_enabled = True (opted-in to closure alerts)
-        users = User.objects.filter(
-            closure_notifications_enabled=True
-        ).exclude(
-            notification_token__isnull=True
-        ).exclude(
-            notification_token__exact=""
+        started = time.monotonic()
+
+        digests = plan_closure_digests(
+            hours_ahead=hours_ahead,
+            history_days=options['history_days'],
+            min_visits=options['min_visits'],
+            dedupe=not options['resend'],
         )
-        
-        self.stdout.write(f"Found {users.count()} users eligible for notifications")
-        
-        if users.count() == 0:
-            self.stdout.write(self.style.WARNING("No users opted-in for closure notifications. Exiting."))
+
+        if not digests:
+            self.stdout.write(self.style.WARNING(
+                f"No interested users for closures in the next {hours_ahead} hours. Exiting."))
             return
-        
-        sent = 0
-        failed = 0
-        
-        # Group events by lot to avoid duplicate notifications
-        lots_with_events = {}
-        for event in upcoming_events:
-            if event.lot_code not in lots_with_events:
-                lots_with_events[event.lot_code] = []
-            lots_with_events[event.lot_code].append(event)
-        
-        # Send one notification per lot (with all events for that lot)
-        for lot_code, events in lots_with_events.items():
-            # Format message based on number of events
-            if len(events) == 1:
-                event = events[0]
-                date_str = event.start_time.strftime('%b %d')
-                message = f"Heads up: {lot_code} will be closed on {date_str} - {event.title}"
-            else:
-                date_str = events[0].start_time.strftime('%b %d')
-                message = f"Heads up: {lot_code} has {len(events)} upcoming closures starting {date_str}"
-            
-            self.stdout.write(f"\nSending for {lot_code}: '{message}'")
-            
-            for user in users:
-                if dry_run:
-                    self.stdout.write(f"  [DRY RUN] Would send to {user.email}")
-                    sent += 1
-                    continue
-                
-                try:
-                    # Send push notification
-                    send_push_message(
-                        token=user.notification_token,
-                        message=message,
-                        extra={
-                            "type": "lot_closure",
-                            "lot_code": lot_code,
-                            "event_id": events[0].id
-                        }
-                    )
-                    
-                    # Log successful notification
-                    NotificationLog.objects.create(
-                        user=user,
-                        notification_type='lot_closure',
-                        message=message,
-                        success=True
-                    )
-                    sent += 1
-                    
-                except Exception as e:
-                    error_msg = str(e)
-                    logger.error(f"Failed to send notification to {user.email}: {error_msg}")
-                    
-                    # Log failed notification
-                    NotificationLog.objects.create(
-                        user=user,
-                        notification_type='lot_closure',
-                        message=message,
-                        success=False,
-                        error_message=error_msg
-                    )
-                    failed += 1
-        
-        self.stdout.write(self.style.SUCCESS(
-            f"\n✓ Sent {sent} notifications, {failed} failed"
-        ))
 
+        lot_codes = {lot_code for digest in digests for lot_code in digest.events_by_lot}
+        self.stdout.write(
+            f"Planned {len(digests)} digests covering {len(lot_codes)} lots in next {hours_ahead} hours")
 
+        if dry_run:
+            for digest in digests:
+                self.stdout.write(f"  [DRY RUN] Would send to {digest.email}: '{digest.message}'")
+            return
+
+        sent, failed = dispatch_closure_digests(
+            digests, batch_size=options['batch_size'], claim=not options['resend'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✓ Sent {sent} notifications, {failed} failed in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.geocoding import campus_buildings
+from api.lot_index import lot_index
+from api.travel_times import BUCKETS, MODES, DistanceMatrixFailed, DistanceMatrixNotConfigured, precompute
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Refresh cached travel times from every lot to every campus building (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modes',
+            nargs='+',
+            choices=MODES,
+            default=['driving', 'walking'],
+            help='Travel modes to precompute (default: driving walking)'
+        )
+        parser.add_argument(
+            '--buckets',
+            nargs='+',
+            choices=[name for name, *_ in BUCKETS],
+            help='Time-of-day buckets to precompute (default: all)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many pairs would be fetched without calling Google'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        lots = [(lot.lat, lot.lng) for lot in lot_index().lots]
+        buildings = [(building.latitude, building.longitude) for building in campus_buildings()]
+        if not lots or not buildings:
+            raise CommandError("Need lots with coordinates and a campus gazetteer to precompute")
+
+        buckets = options['buckets'] or [name for name, *_ in BUCKETS]
+        self.stdout.write(
+            f"{len(lots)} lots x {len(buildings)} buildings, "
+            f"modes {', '.join(options['modes'])}, buckets {', '.join(buckets)}")
+        if options['dry_run']:
+            return
+
+        try:
+            written, calls = precompute(lots, buildings, options['modes'], buckets)
+        except DistanceMatrixNotConfigured:
+            raise CommandError("GOOGLE_MAPS_API_KEY is not configured")
+        except DistanceMatrixFailed as e:
+            raise CommandError(f"Distance Matrix request failed: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✓ Cached {written} travel times with {calls} requests in {time.monotonic() - started:.1f}s"
+        ))
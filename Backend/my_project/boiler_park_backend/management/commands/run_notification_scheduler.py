@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+from api.closure_notifications import DEFAULT_BATCH_SIZE, DEFAULT_HISTORY_DAYS, DEFAULT_MIN_VISITS
+from api.notification_scheduler import (
+    DEFAULT_INTERVAL_SECONDS,
+    DEFAULT_LEAD_HOURS,
+    ClosureNotificationScheduler,
+)
+import logging
+import signal
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run the long-lived closure notification scheduler"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=DEFAULT_INTERVAL_SECONDS,
+            help=f'Seconds between LotEvent window evaluations (default: {DEFAULT_INTERVAL_SECONDS})'
+        )
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=DEFAULT_LEAD_HOURS,
+            help=f'Alert about closures starting within this many hours (default: {DEFAULT_LEAD_HOURS})'
+        )
+        parser.add_argument(
+            '--history-days',
+            type=int,
+            default=DEFAULT_HISTORY_DAYS,
+            help=f'Parking history window used to infer lots a user cares about (default: {DEFAULT_HISTORY_DAYS})'
+        )
+        parser.add_argument(
+            '--min-visits',
+            type=int,
+            default=DEFAULT_MIN_VISITS,
+            help=f'Visits within the history window that make a lot relevant (default: {DEFAULT_MIN_VISITS})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Push messages per Expo request (default: {DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Evaluate a single window, dispatch it and exit'
+        )
+
+    def handle(self, *args, **options):
+        scheduler = ClosureNotificationScheduler(
+            interval_seconds=options['interval'],
+            lead_hours=options['hours'],
+            history_days=options['history_days'],
+            min_visits=options['min_visits'],
+            batch_size=options['batch_size'],
+        )
+
+        if options['once']:
+            queued = scheduler.evaluate()
+            scheduler.drain()
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ Queued {queued} digests: {scheduler.sent} sent, {scheduler.failed} failed"))
+            return
+
+        def _shutdown(signum, frame):
+            self.stdout.write(self.style.WARNING("Stopping scheduler..."))
+            scheduler.stop()
+
+        signal.signal(signal.SIGTERM, _shutdown)
+        signal.signal(signal.SIGINT, _shutdown)
+
+        self.stdout.write(
+            f"Closure scheduler running every {options['interval']}s for the next {options['hours']}h of events")
+        scheduler.run_forever()
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✓ Scheduler stopped: {scheduler.sent} sent, {scheduler.failed} failed"))
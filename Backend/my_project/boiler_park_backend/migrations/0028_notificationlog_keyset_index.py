@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boiler_park_backend", "0027_user_favorite_lot_alerts"),
+    ]
+
+    operations = [
+        # db_index on a CharField also creates the varchar_pattern_ops index
+        # on PostgreSQL, so both exact and prefix email lookups are indexed.
+        migrations.AlterField(
+            model_name="user",
+            name="email",
+            field=models.EmailField(db_index=True, max_length=254),
+        ),
+        migrations.AddIndex(
+            model_name="notificationlog",
+            index=models.Index(
+                fields=["-sent_at", "-id"], name="notiflog_sent_at_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boiler_park_backend", "0028_notificationlog_keyset_index"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="notificationlog",
+            options={},
+        ),
+    ]
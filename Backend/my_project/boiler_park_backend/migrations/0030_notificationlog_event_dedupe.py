@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boiler_park_backend", "0029_alter_notificationlog_options"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationlog",
+            name="lot_code",
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name="notificationlog",
+            name="event",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="notifications",
+                to="boiler_park_backend.lotevent",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notificationlog",
+            index=models.Index(
+                fields=["user", "notification_type", "lot_code", "event"],
+                name="notiflog_dedupe_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="notificationlog",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("event__isnull", False), ("success", True)),
+                fields=("user", "notification_type", "lot_code", "event"),
+                name="notiflog_unique_event_delivery",
+            ),
+        ),
+    ]
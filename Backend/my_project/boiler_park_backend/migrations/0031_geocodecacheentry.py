@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boiler_park_backend", "0030_notificationlog_event_dedupe"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeocodeCacheEntry",
+            fields=[
+                ("key", models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("formatted_address", models.CharField(blank=True, max_length=255)),
+                ("fetched_at", models.DateTimeField()),
+                ("last_used_at", models.DateTimeField(db_index=True)),
+                ("hits", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boiler_park_backend", "0031_geocodecacheentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TravelTimeEntry",
+            fields=[
+                ("key", models.CharField(max_length=96, primary_key=True, serialize=False)),
+                ("mode", models.CharField(max_length=10)),
+                ("bucket", models.CharField(max_length=10)),
+                ("distance_meters", models.PositiveIntegerField(blank=True, null=True)),
+                ("duration_seconds", models.PositiveIntegerField(blank=True, null=True)),
+                ("status", models.CharField(default="OK", max_length=32)),
+                ("fetched_at", models.DateTimeField(db_index=True)),
+                ("precomputed", models.BooleanField(default=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boiler_park_backend", "0032_traveltimeentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationlog",
+            name="event_ids",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.IntegerField(), blank=True, default=list, size=None),
+        ),
+    ]
@@ -53,7 +53,7 @@ class User(models.Model):
 
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=45)
-    email = models.EmailField()
+    email = models.EmailField(db_index=True)
     password = models.CharField(max_length=100)
 
     parking_pass = models.CharField(
@@ -219,6 +219,8 @@ class NotificationLog(models.Model):
     - sent_at: When it was sent
     - success: Whether it sent successfully
     - error_message: Error details if failed
+    - lot_code / event: The lot and LotEvent an event-driven alert was about
+    - event_ids: Every LotEvent a closure digest covered (event is the first)
     """
     NOTIFICATION_TYPES = [
         ('pass_sale', 'Parking Pass Sale'),
@@ -236,19 +238,66 @@ class NotificationLog(models.Model):
     sent_at = models.DateTimeField(auto_now_add=True)
     success = models.BooleanField(default=True)
     error_message = models.TextField(blank=True, null=True)
+    # Set for event-driven notifications so reruns can be deduplicated
+    lot_code = models.CharField(max_length=32, blank=True, null=True)
+    event = models.ForeignKey(
+        LotEvent, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='notifications')
+    # A closure digest is one push (and one row) covering several events
+    event_ids = ArrayField(models.IntegerField(), blank=True, default=list)
 
     class Meta:
         indexes = [
             models.Index(fields=['user', 'sent_at']),
-            models.Index(fields=['notification_type', 'sent_at'])
+            models.Index(fields=['notification_type', 'sent_at']),
+            # Keyset pagination walks (sent_at, id) newest-first
+            models.Index(fields=['-sent_at', '-id'], name='notiflog_sent_at_id_idx'),
+            models.Index(
+                fields=['user', 'notification_type', 'lot_code', 'event'],
+                name='notiflog_dedupe_idx'),
         ]
-        ordering = ['-sent_at']  # Most recent first
+        constraints = [
+            # A user is told about a given event at most once; failed
+            # attempts don't count so they can be retried.
+            models.UniqueConstraint(
+                fields=['user', 'notification_type', 'lot_code', 'event'],
+                condition=models.Q(event__isnull=False, success=True),
+                name='notiflog_unique_event_delivery'),
+        ]
+        # No default ordering: callers order explicitly so counts, deletes and
+        # archival scans don't pay for a sort they don't need.
 
     def __str__(self):
         status = "✓" if self.success else "✗"
         return f"{status} {self.notification_type} to {self.user.email} at {self.sent_at}"
 
 
+class ClosureDelivery(models.Model):
+    """
+    Claims the push telling a user about one closure event. Dispatchers
+    insert claims before sending and only send the ones they won, so
+    overlapping runs can't both notify a user about the same event (see
+    api/closure_notifications.py). Claims for failed sends are deleted so
+    they can be retried.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='closure_deliveries')
+    event = models.ForeignKey(
+        LotEvent, on_delete=models.CASCADE, related_name='deliveries')
+    # Identifies the dispatch batch that holds the claim
+    claim = models.CharField(max_length=32, db_index=True)
+    claimed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'event'], name='closure_delivery_unique'),
+        ]
+
+    def __str__(self):
+        return f"closure {self.event_id} to user {self.user_id}"
+
+
 class GarageIssueReport(models.Model):
     """Stores user-submitted issue reports for parking garages."""
 
@@ -263,3 +312,44 @@ class GarageIssueReport(models.Model):
 
     def __str__(self) -> str:
         return f"{self.lot_code} report at {self.created_at:%Y-%m-%d %H:%M}" 
+
+
+class GeocodeCacheEntry(models.Model):
+    """
+    A Google geocoding result, keyed by the normalized address that was asked
+    for. Entries expire after GEOCODE_CACHE_TTL_DAYS and the least recently
+    used are trimmed past GEOCODE_CACHE_MAX_ENTRIES (see api/geocoding.py).
+    """
+    key = models.CharField(primary_key=True, max_length=255)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    formatted_address = models.CharField(max_length=255, blank=True)
+    fetched_at = models.DateTimeField()
+    last_used_at = models.DateTimeField(db_index=True)
+    hits = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.key} -> ({self.latitude}, {self.longitude})"
+
+
+class TravelTimeEntry(models.Model):
+    """
+    A Google Distance Matrix element between two rounded coordinates, for
+    one travel mode and time-of-day bucket (see api/travel_times.py).
+    Pairs without a route keep Google's element status and no distance.
+    Precomputed lot -> building entries are refreshed nightly by the
+    precompute_travel_times command.
+    """
+    key = models.CharField(primary_key=True, max_length=96)
+    mode = models.CharField(max_length=10)
+    bucket = models.CharField(max_length=10)
+    distance_meters = models.PositiveIntegerField(null=True, blank=True)
+    duration_seconds = models.PositiveIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=32, default="OK")
+    fetched_at = models.DateTimeField(db_index=True)
+    precomputed = models.BooleanField(default=False)
+
+    def __str__(self) -> str:
+        if self.status != "OK":
+            return f"{self.key}: {self.status}"
+        return f"{self.key}: {self.duration_seconds}s"
@@ -1,3 +1,260 @@
+import json
+import time
+from datetime import timedelta
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from api import geocoding
+from boiler_park_backend.models import ClosureDelivery, GeocodeCacheEntry, LotEvent, NotificationLog, User
+
+
+class _StubResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def _google_answer(lat=40.1, lng=-86.1, formatted_address="1 Stub St, West Lafayette, IN"):
+    return _StubResponse({
+        "status": "OK",
+        "results": [{
+            "geometry": {"location": {"lat": lat, "lng": lng}},
+            "formatted_address": formatted_address,
+        }],
+    })
+
+
+class GeocodeCacheTests(TestCase):
+    """api.geocoding against a stubbed Google endpoint (no network)."""
+
+    def setUp(self):
+        geocoding._memory.clear()
+        self.addCleanup(geocoding._memory.clear)
+        stats = mock.patch.dict(geocoding._stats, {key: 0 for key in geocoding._stats})
+        stats.start()
+        self.addCleanup(stats.stop)
+        patches = [
+            mock.patch.object(geocoding, "GEOCODE_URL", "http://stub.invalid/geocode"),
+            mock.patch.dict("os.environ", {"GOOGLE_MAPS_API_KEY": "test-key"}),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.get = mock.patch.object(geocoding.requests, "get", return_value=_google_answer())
+        self.google = self.get.start()
+        self.addCleanup(self.get.stop)
+
+    def test_gazetteer_answers_campus_buildings_without_network(self):
+        result = geocoding.geocode("Purdue Memorial Union")
+
+        self.assertEqual(result.source, "gazetteer")
+        self.assertEqual(geocoding.geocode("lwsn").source, "gazetteer")
+        self.google.assert_not_called()
+        self.assertFalse(GeocodeCacheEntry.objects.exists())
+
+    def test_one_google_call_then_memory_then_database_hits(self):
+        first = geocoding.geocode("201 Grant St")
+        self.assertEqual(first.source, "google")
+        self.assertEqual(self.google.call_count, 1)
+        self.assertEqual(self.google.call_args.args[0], "http://stub.invalid/geocode")
+
+        self.assertEqual(geocoding.geocode("201  grant st.").source, "memory")
+
+        geocoding._memory.clear()
+        from_db = geocoding.geocode("201 Grant St")
+        self.assertEqual(from_db.source, "database")
+        self.assertEqual((from_db.latitude, from_db.longitude), (first.latitude, first.longitude))
+        self.assertEqual(self.google.call_count, 1)
+        self.assertEqual(GeocodeCacheEntry.objects.get(key="201 grant st").hits, 1)
+
+    def test_expired_database_entry_goes_back_to_google(self):
+        geocoding.geocode("201 Grant St")
+        GeocodeCacheEntry.objects.update(
+            fetched_at=timezone.now() - timedelta(days=geocoding.CACHE_TTL_DAYS + 1))
+        geocoding._memory.clear()
+
+        self.assertEqual(geocoding.geocode("201 Grant St").source, "google")
+        self.assertEqual(self.google.call_count, 2)
+        entry = GeocodeCacheEntry.objects.get(key="201 grant st")
+        self.assertGreater(entry.fetched_at, timezone.now() - timedelta(minutes=1))
+
+    def test_store_trims_least_recently_used_entries(self):
+        result = geocoding.GeocodeResult(40.0, -86.0, "Somewhere", "google")
+        with mock.patch.object(geocoding, "CACHE_MAX_ENTRIES", 2):
+            geocoding._database_store("a st", result)
+            geocoding._database_store("b st", result)
+            GeocodeCacheEntry.objects.filter(key="a st").update(
+                last_used_at=timezone.now() + timedelta(minutes=1))
+            geocoding._database_store("c st", result)
+
+        self.assertEqual(set(GeocodeCacheEntry.objects.values_list("key", flat=True)),
+                         {"a st", "c st"})
+
+    def test_stats_endpoint_reports_hit_ratio(self):
+        from api.views import geocode_stats
+
+        geocoding.geocode("Memorial Union")    # gazetteer
+        geocoding.geocode("201 Grant St")      # google
+        geocoding.geocode("201 Grant St")      # memory
+        geocoding._memory.clear()
+        geocoding.geocode("201 Grant St")      # database
+
+        response = geocode_stats(APIRequestFactory().get("/api/geocode/stats/"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["lookups"], 4)
+        self.assertEqual(response.data["google"], 1)
+        self.assertEqual(response.data["hit_ratio"], 0.75)
+
+
+class CameraHealthTests(TestCase):
+    """get_camera_health against a stubbed Redis hash."""
+
+    def test_malformed_records_are_skipped(self):
+        from api import views
+
+        now = time.time()
+        records = {
+            "harrison-entry": json.dumps(
+                {"redis_key": "harrison", "last_frame_at": now, "updated_at": now}),
+            "garbage": "{not json",
+            "list": json.dumps([1, 2]),
+            "number": "42",
+            "bad-key": json.dumps({"redis_key": ["harrison"]}),
+        }
+        redis = mock.Mock(**{"hgetall.return_value": records})
+        with mock.patch.object(views, "_redis_connection", return_value=redis):
+            response = views.get_camera_health(APIRequestFactory().get("/api/camera-health/"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([record["camera"] for record in response.data["cameras"]],
+                         ["harrison-entry"])
+        self.assertFalse(response.data["cameras"][0]["stale"])
+
+
+class RankGaragesValidationTests(TestCase):
+    """rank_garages rejects inputs that would otherwise reach the index as NaN or non-strings."""
+
+    def rank(self, body):
+        from api.views import rank_garages
+
+        return rank_garages(APIRequestFactory().post("/api/garages/rank/", body, format="json"))
+
+    def test_valid_request(self):
+        response = self.rank({"points": [{"latitude": 40.4274, "longitude": -86.9169}],
+                              "permits": ["A"]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_non_finite_or_out_of_range_coordinates_are_rejected(self):
+        for latitude, longitude in (("NaN", -86.9), (40.4, "Infinity"), (91, -86.9), (40.4, -181)):
+            with self.subTest(latitude=latitude, longitude=longitude):
+                response = self.rank({"points": [{"latitude": latitude, "longitude": longitude}]})
+                self.assertEqual(response.status_code, 400)
+
+    def test_non_string_permits_are_rejected(self):
+        for permits in ([1], {"A": True}, ["A", None]):
+            with self.subTest(permits=permits):
+                response = self.rank({"points": [{"latitude": 40.4, "longitude": -86.9}],
+                                      "permits": permits})
+                self.assertEqual(response.status_code, 400)
+
+
+class LotRegistryTests(TestCase):
+    """Lots that only exist as ParkingLot rows."""
+
+    def setUp(self):
+        from api.lot_registry import registry
+
+        self.registry = registry
+        self.registry.invalidate()
+        self.addCleanup(self.registry.invalidate)
+
+    def add_lot(self, code):
+        from boiler_park_backend.models import ParkingLot
+
+        ParkingLot.objects.create(code=code, name=code, lat=40.4, lng=-86.9,
+                                  parking_passes=[], num_of_ratings=0)
+
+    def test_database_only_lots_get_ids_in_code_order(self):
+        for code in ("ZZZ", "MMM", "AAA"):
+            self.add_lot(code)
+        self.registry.invalidate()
+
+        ids = {code: self.registry.get(code).id for code in ("AAA", "MMM", "ZZZ")}
+        self.assertEqual(ids["MMM"], ids["AAA"] + 1)
+        self.assertEqual(ids["ZZZ"], ids["AAA"] + 2)
+
+    def test_history_is_not_found_for_lots_without_a_column(self):
+        from api.views import get_postgres_parking_data
+
+        self.add_lot("NEWLOT")
+        self.registry.invalidate()
+        self.assertFalse(self.registry.get("NEWLOT").has_history)
+        self.assertTrue(self.registry.get("PGH").has_history)
+
+        response = get_postgres_parking_data(
+            APIRequestFactory().get("/api/postgres-parking/", {"lot": "NEWLOT"}))
+        self.assertEqual(response.status_code, 404)
+
+
+class ClosureDispatchTests(TestCase):
+    """dispatch_closure_digests claims each (user, event) before pushing it."""
+
+    def setUp(self):
+        from api import closure_notifications
+
+        self.notifications = closure_notifications
+        self.user = User.objects.create(name="Pat", email="pat@purdue.edu", password="x",
+                                        notification_token="ExponentPushToken[pat]")
+        start = timezone.now() + timedelta(hours=2)
+        self.events = [
+            LotEvent.objects.create(lot_code=code, title="Game day", start_time=start,
+                                    end_time=start + timedelta(hours=4))
+            for code in ("PGH", "PGH", "PGG")
+        ]
+        push = mock.patch.object(closure_notifications, "send_push_messages",
+                                 side_effect=lambda messages: [None] * len(messages))
+        self.push = push.start()
+        self.addCleanup(push.stop)
+
+    def digest(self, events):
+        events_by_lot = {}
+        for event in events:
+            events_by_lot.setdefault(event.lot_code, []).append(event)
+        return self.notifications.ClosureDigest(
+            user_id=self.user.id, email=self.user.email,
+            token=self.user.notification_token, events_by_lot=events_by_lot)
+
+    def test_overlapping_runs_push_each_event_once(self):
+        first = self.notifications.dispatch_closure_digests([self.digest(self.events[:2])])
+        # A second run planned before the first one logged anything
+        second = self.notifications.dispatch_closure_digests([self.digest(self.events)])
+
+        self.assertEqual((first, second), ((1, 0), (1, 0)))
+        pushed = [messages[0][2]["event_ids"] for (messages,), _ in self.push.call_args_list]
+        self.assertEqual(pushed, [[self.events[0].id, self.events[1].id], [self.events[2].id]])
+        self.assertEqual(NotificationLog.objects.count(), 2)
+        self.assertEqual(ClosureDelivery.objects.count(), 3)
+
+    def test_failed_push_releases_its_claims(self):
+        self.push.side_effect = lambda messages: ["DeviceNotRegistered"] * len(messages)
+        self.assertEqual(self.notifications.dispatch_closure_digests([self.digest(self.events)]),
+                         (0, 1))
+        self.assertFalse(ClosureDelivery.objects.exists())
+
+        self.push.side_effect = lambda messages: [None] * len(messages)
+        self.assertEqual(self.notifications.dispatch_closure_digests([self.digest(self.events)]),
+                         (1, 0))
+        self.assertEqual(ClosureDelivery.objects.count(), 3)
 
-# Create your tests here.
+    def test_resend_skips_claims(self):
+        self.notifications.dispatch_closure_digests([self.digest(self.events)])
+        sent, _ = self.notifications.dispatch_closure_digests(
+            [self.digest(self.events)], claim=False)
+        self.assertEqual(sent, 1)
+        self.assertEqual(self.push.call_count, 2)
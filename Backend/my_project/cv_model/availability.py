@@ -0,0 +1,211 @@
+import logging
+import time
+
+import redis
+from decouple import config
+
+# Known-good availability for a key (e.g. from a manual count) is written to
+# "_reconcile:<key>"; counters pick it up on their next reconciliation.
+# The bridge ignores keys starting with "_".
+RECONCILE_PREFIX = "_reconcile:"
+RECONCILE_INTERVAL = config("CV_RECONCILE_INTERVAL", default=300, cast=int)
+# Seconds between reconnect attempts while Redis is down, doubling up to the max
+RETRY_INITIAL = config("CV_REDIS_RETRY_INITIAL", default=1.0, cast=float)
+RETRY_MAX = config("CV_REDIS_RETRY_MAX", default=60.0, cast=float)
+
+logger = logging.getLogger("availability")
+
+# Apply a delta to the availability counter, clamped to [0, capacity], in one
+# round trip. INCRBY (rather than SET) keeps concurrent writers from
+# overwriting each other and shows up as an incrby event on the bridge. A
+# missing key (never initialised, expired or flushed) counts as full and is
+# SET, since INCRBY would count from 0.
+APPLY_DELTA = """
+local capacity = tonumber(ARGV[2])
+local stored = redis.call('GET', KEYS[1])
+local current = tonumber(stored) or capacity
+local target = math.max(0, math.min(capacity, current + tonumber(ARGV[1])))
+if not stored then
+  redis.call('SET', KEYS[1], target)
+elseif target ~= current then
+  redis.call('INCRBY', KEYS[1], target - current)
+end
+return target
+"""
+
+# Replace the counter with a pending known-good value, if there is one
+RECONCILE = """
+local good = redis.call('GET', KEYS[2])
+if not good then
+  return tonumber(redis.call('GET', KEYS[1]))
+end
+redis.call('DEL', KEYS[2])
+local capacity = tonumber(ARGV[1])
+local target = math.max(0, math.min(capacity, tonumber(good)))
+redis.call('SET', KEYS[1], target)
+return target
+"""
+
+_client = None
+
+
+def get_redis():
+    """Shared client, created on first use so importing never needs Redis config."""
+    global _client
+    if _client is None:
+        _client = redis.Redis(
+            host=config("REDIS_HOST"),
+            port=config("REDIS_PORT"),
+            decode_responses=True,
+            username=config("REDIS_USERNAME"),
+            password=config("REDIS_PASSWORD"),
+        )
+    return _client
+
+
+class AvailabilityPublisher:
+    """
+    Publishes one camera's entries/exits to a garage availability key.
+
+    Counters send deltas instead of absolute values, so a restarted counter
+    doesn't reset the garage to empty and several entrances can share one
+    key. Deltas that fail to send are kept and retried with the next one.
+    While Redis is down, writes are only attempted every few seconds (backing
+    off to RETRY_MAX) and the outage is logged when it starts and when it ends.
+    """
+
+    def __init__(self, redis_key, capacity, reconcile_interval=RECONCILE_INTERVAL, client=None):
+        self.redis_key = redis_key
+        self.reconcile_key = RECONCILE_PREFIX + redis_key
+        self.capacity = capacity
+        self.reconcile_interval = reconcile_interval
+        self._client = client
+        self._apply_delta = None
+        self._reconcile = None
+        self._last_reconcile = time.monotonic()
+        self.pending = 0
+        self.value = None
+        self._down_since = None
+        self._retry_delay = RETRY_INITIAL
+        self._next_attempt = 0.0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_redis()
+        return self._client
+
+    def _scripts(self):
+        if self._apply_delta is None:
+            self._apply_delta = self.client.register_script(APPLY_DELTA)
+            self._reconcile = self.client.register_script(RECONCILE)
+
+    def _should_attempt(self):
+        """False while backing off from a failed write."""
+        return self._down_since is None or time.monotonic() >= self._next_attempt
+
+    def _failed(self, error):
+        now = time.monotonic()
+        if self._down_since is None:
+            self._down_since = now
+            self._retry_delay = RETRY_INITIAL
+            logger.warning("Redis unavailable for %s, retrying with backoff: %s", self.redis_key, error)
+        else:
+            self._retry_delay = min(self._retry_delay * 2, RETRY_MAX)
+        self._next_attempt = now + self._retry_delay
+
+    def _succeeded(self):
+        if self._down_since is not None:
+            logger.warning("Redis back for %s after %.0fs",
+                           self.redis_key, time.monotonic() - self._down_since)
+            self._down_since = None
+
+    def init(self):
+        """Start the key at full capacity unless some counter already set it."""
+        try:
+            self.client.set(self.redis_key, self.capacity, nx=True)
+            self.value = int(self.client.get(self.redis_key))
+            logger.info("%s starting at %s", self.redis_key, self.value)
+        except Exception as e:
+            self._failed(e)
+        return self.value
+
+    def set(self, value):
+        """
+        Store an absolute value, clamped to [0, capacity]. For counters that
+        see the whole lot at once (occupancy.py) rather than its entrances.
+        """
+        value = max(0, min(self.capacity, int(value)))
+        if not self._should_attempt():
+            return self.value
+        try:
+            self.client.set(self.redis_key, value)
+            self._succeeded()
+            if value != self.value:
+                logger.info("%s = %s", self.redis_key, value)
+            self.value = value
+        except Exception as e:
+            self._failed(e)
+        return self.value
+
+    def write_field(self, hash_key, field, value):
+        """
+        HSET one field (e.g. a health record) with the same outage handling
+        as availability writes: skipped while backing off, logged only when
+        an outage starts or ends. Returns whether it was written.
+        """
+        if not self._should_attempt():
+            return False
+        try:
+            self.client.hset(hash_key, field, value)
+        except Exception as e:
+            self._failed(e)
+            return False
+        self._succeeded()
+        return True
+
+    def publish(self, delta=0):
+        """Add delta (+ leaving, - entering) and reconcile if it's due. Returns the stored value."""
+        self.pending += delta
+        reconcile_due = time.monotonic() - self._last_reconcile >= self.reconcile_interval
+        if (not self.pending and not reconcile_due) or not self._should_attempt():
+            return self.value
+
+        try:
+            self._scripts()
+            if self.pending:
+                value = int(self._apply_delta(
+                    keys=[self.redis_key], args=[self.pending, self.capacity]))
+                self._succeeded()
+                logger.info("%s %+d -> %s", self.redis_key, self.pending, value)
+                self.value = value
+                self.pending = 0
+            if reconcile_due:
+                self._last_reconcile = time.monotonic()
+                value = self._reconcile(
+                    keys=[self.redis_key, self.reconcile_key], args=[self.capacity])
+                self._succeeded()
+                if value is not None and int(value) != self.value:
+                    logger.info("%s reconciled %s -> %s", self.redis_key, self.value, value)
+                    self.value = int(value)
+        except Exception as e:
+            self._failed(e)
+        return self.value
+
+
+class NullPublisher:
+    """Stands in for AvailabilityPublisher when a run must not touch Redis (benchmarks, replays)."""
+
+    value = None
+
+    def init(self):
+        return None
+
+    def set(self, value):
+        return None
+
+    def write_field(self, hash_key, field, value):
+        return False
+
+    def publish(self, delta=0):
+        return None
@@ -0,0 +1,254 @@
+"""
+Offline benchmark of the counting pipeline: replays recorded clips through
+read → motion gate/mask → YOLO → SORT → crossing logic with no display and
+no Redis, and reports per-stage speed, end-to-end latency, peak memory and
+count error against annotated ground truth.
+
+    python benchmark.py                               # clips listed in Videos/ground_truth.json
+    python benchmark.py Videos/clip.mov --garage GrantStreet
+    python benchmark.py Videos/clip.mov --save-detections cache/
+    python benchmark.py Videos/clip.mov --backend onnx  # exported model (see detector_backends.py)
+    python benchmark.py cache/clip                    # detections-cached: no YOLO
+
+Ground truth is a JSON object keyed by clip file name:
+
+    {"clip.mov": {"garage": "Harrison", "incoming": 12, "outgoing": 9}}
+
+("garage" picks the line/tracker setup from garages.json and defaults to
+--garage.) A clip can also be a detection store (see detection_store.py);
+tracker and crossing changes can be measured on it without re-running
+the detector.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import resource
+import time
+
+import numpy as np
+
+from availability import NullPublisher
+from counter_engine import CarCounter, load_config
+from detection_store import DetectionStore, is_store
+from detector_backends import BACKENDS, load_detector
+from detections import detect
+from replay import DEMO_GARAGE, _NamesOnly
+from sources import open_source
+
+DEFAULT_TRUTH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Videos", "ground_truth.json")
+STAGES = ("read", "gate", "detect", "track", "count")
+
+
+class _TimedTracker:
+    """Wraps the counter's tracker to time tracker.update() separately from counting."""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.seconds = 0.0
+
+    def update(self, detections):
+        started = time.perf_counter()
+        out = self.tracker.update(detections)
+        self.seconds += time.perf_counter() - started
+        return out
+
+    def __getattr__(self, name):
+        return getattr(self.tracker, name)
+
+
+class StageTimes:
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.calls = dict.fromkeys(STAGES, 0)
+        self.latencies = []
+
+    def add(self, stage, seconds):
+        self.seconds[stage] += seconds
+        self.calls[stage] += 1
+
+
+def _counter(garage, yolo_weights, video_path=None, **options):
+    return CarCounter(
+        garage, yolo_weights=yolo_weights,
+        source=open_source(video_path) if video_path is not None else None,
+        headless=True, publisher=NullPublisher(), **options)
+
+
+def run_video(counter, max_frames=None):
+    """Full pipeline on the counter's source; returns StageTimes."""
+    times = StageTimes()
+    timed = counter.tracker = _TimedTracker(counter.tracker)
+    while max_frames is None or len(times.latencies) < max_frames:
+        t0 = time.perf_counter()
+        success, frame = counter.read()
+        t1 = time.perf_counter()
+        if not success:
+            break
+        frame_region = counter.frame_region(frame)
+        inferred = counter.needs_inference(frame_region)
+        t2 = time.perf_counter()
+        if inferred:
+            detections = detect(counter.model, frame_region, counter.detection_class_ids,
+                                counter.detect_threshold, counter.roi)
+        else:
+            detections = np.empty((0, 5))
+        detections = counter.record(detections, inferred)
+        t3 = time.perf_counter()
+        tracked = timed.seconds
+        counter.update_counts(frame, detections)
+        t4 = time.perf_counter()
+
+        times.add("read", t1 - t0)
+        times.add("gate", t2 - t1)
+        if inferred:
+            times.add("detect", t3 - t2)
+        times.add("track", timed.seconds - tracked)
+        times.add("count", (t4 - t3) - (timed.seconds - tracked))
+        times.latencies.append(t4 - t0)
+    counter.close()
+    return times
+
+
+def run_cached(counter, store, max_frames=None):
+    """Tracking and counting only, over detections from a DetectionStore."""
+    times = StageTimes()
+    timed = counter.tracker = _TimedTracker(counter.tracker)
+    for i, detections in enumerate(store.frames(counter.conf_threshold)):
+        if max_frames is not None and i >= max_frames:
+            break
+        started = time.perf_counter()
+        tracked = timed.seconds
+        counter.update_counts(None, detections)
+        elapsed = time.perf_counter() - started
+        times.add("track", timed.seconds - tracked)
+        times.add("count", elapsed - (timed.seconds - tracked))
+        times.latencies.append(elapsed)
+    return times
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process so far (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def benchmark_clip(clip, garages, yolo_weights, garage_name, truth=None,
+                   max_frames=None, save_dir=None, model=None, **options):
+    truth = truth or {}
+    cached = is_store(clip)
+    store = DetectionStore(clip) if cached else None
+    name = store.meta.get("clip", os.path.basename(clip)) if cached else os.path.basename(clip)
+    expected = truth.get(name, {})
+    garage_name = expected.get("garage") or (store.meta.get("garage") if cached else None) or garage_name
+    garage = dataclasses.replace(garages[garage_name], source=None)
+
+    if cached:
+        counter = _counter(garage, yolo_weights, model=_NamesOnly(), **options)
+        started = time.perf_counter()
+        times = run_cached(counter, store, max_frames)
+    else:
+        detections_path = os.path.join(save_dir, os.path.splitext(name)[0]) if save_dir else None
+        counter = _counter(garage, yolo_weights, clip, model=model,
+                           detections_path=detections_path, **options)
+        if counter.recorder is not None:
+            counter.recorder.meta["clip"] = name
+        started = time.perf_counter()
+        times = run_video(counter, max_frames)
+    elapsed = time.perf_counter() - started
+
+    frames = len(times.latencies)
+    latencies = np.array(times.latencies) * 1000 if frames else np.zeros(1)
+    result = {
+        "clip": name,
+        "garage": garage_name,
+        "mode": "cached" if cached else getattr(counter.model, "backend", "video"),
+        "frames": frames,
+        "fps": frames / max(elapsed, 1e-9),
+        "stages": {
+            stage: {
+                "calls": times.calls[stage],
+                "ms_per_call": 1000 * times.seconds[stage] / times.calls[stage],
+                "fps": frames / max(times.seconds[stage], 1e-9),
+            }
+            for stage in STAGES if times.calls[stage]
+        },
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "max": float(latencies.max()),
+        },
+        "peak_memory_mb": peak_memory_mb(),
+        "incoming": counter.incoming_count,
+        "outgoing": counter.outgoing_count,
+    }
+    if "incoming" in expected and "outgoing" in expected:
+        result["incoming_error"] = counter.incoming_count - expected["incoming"]
+        result["outgoing_error"] = counter.outgoing_count - expected["outgoing"]
+    return result
+
+
+def print_result(result):
+    print(f"\n{result['clip']} ({result['garage']}, {result['mode']}): "
+          f"{result['frames']} frames at {result['fps']:.1f} fps end to end")
+    for stage, s in result["stages"].items():
+        print(f"  {stage:>7}: {s['ms_per_call']:8.3f} ms/call  {s['fps']:10.1f} fps  ({s['calls']} calls)")
+    lat = result["latency_ms"]
+    print(f"  latency: p50 {lat['p50']:.2f} ms, p95 {lat['p95']:.2f} ms, max {lat['max']:.2f} ms")
+    print(f"  peak memory: {result['peak_memory_mb']:.0f} MB")
+    line = f"  counted: in={result['incoming']} out={result['outgoing']}"
+    if "incoming_error" in result:
+        line += f"  error: in {result['incoming_error']:+d}, out {result['outgoing_error']:+d}"
+    print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the counting pipeline on recorded clips.")
+    parser.add_argument("clips", nargs="*",
+                        help="videos or detection stores (default: clips in the ground truth file)")
+    parser.add_argument("--garage", default=DEMO_GARAGE, help="garage setup for clips without one")
+    parser.add_argument("--truth", default=DEFAULT_TRUTH, help="ground truth JSON")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--backend", choices=BACKENDS,
+                        help="detector backend (default: CV_DETECTOR_BACKEND)")
+    parser.add_argument("--save-detections", metavar="DIR",
+                        help="also write each video's detections to DIR/<clip>")
+    parser.add_argument("--motion-gate", action=argparse.BooleanOptionalAction,
+                        help="skip idle frames (default: CV_MOTION_GATE)")
+    parser.add_argument("--roi", dest="roi_inference", action=argparse.BooleanOptionalAction,
+                        help="detect on the crop around the line (default: CV_ROI_INFERENCE)")
+    parser.add_argument("--json", metavar="PATH", help="write the results as JSON too")
+    args = parser.parse_args(argv)
+
+    truth = {}
+    if os.path.exists(args.truth):
+        with open(args.truth) as f:
+            truth = json.load(f)
+    clips = args.clips or [os.path.join(os.path.dirname(args.truth), name) for name in truth]
+    if not clips:
+        parser.error(f"no clips given and no ground truth at {args.truth}")
+
+    yolo_weights, garages = load_config()
+    options = {key: getattr(args, key) for key in ("motion_gate", "roi_inference")
+               if getattr(args, key) is not None}
+    # One model for every video clip (cached clips don't need one)
+    model = None
+    if not all(is_store(clip) for clip in clips):
+        model = load_detector(yolo_weights, args.backend)
+    results = []
+    for clip in clips:
+        result = benchmark_clip(clip, garages, yolo_weights, args.garage, truth,
+                                args.max_frames, args.save_detections, model, **options)
+        print_result(result)
+        results.append(result)
+
+    scored = [r for r in results if "incoming_error" in r]
+    if scored:
+        total = sum(abs(r["incoming_error"]) + abs(r["outgoing_error"]) for r in scored)
+        print(f"\nTotal absolute count error over {len(scored)} annotated clip(s): {total}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,501 @@
+"""
+Car counting engine shared by every garage camera.
+
+A garage is described by an entry in garages.json (or a YAML file, if
+PyYAML is installed): where its frames come from, where the counting line
+is, how crossings are detected and which Redis key it publishes to.
+
+    python counter_engine.py                   # every enabled garage
+    python counter_engine.py Harrison          # just one
+    python counter_engine.py --config my.json GrantStreet Harrison --headless
+
+Several garages run in one process and share one YOLO model: each round
+reads a frame from every camera and runs the ones that need detection
+through the model as one batch.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field, fields
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from availability import AvailabilityPublisher
+from crossing import NEG_TO_POS, POS_TO_NEG, make_crossing
+from detection_store import DetectionWriter
+from detector_backends import BACKENDS, load_detector
+from detections import class_ids_for, detect, detect_batch
+from fast_sort import FastSort
+from health import CounterHealth
+from motion_gate import MOTION_GATE, MotionGate
+from rendering import HEADLESS, FrameDumper, draw_counter, load_graphics, prepare_mask
+from roi import ROI_INFERENCE, ROI_PAD, LineRoi
+from sources import open_source
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "garages.json")
+YOLO_WEIGHTS = "Yolo-Weights/yolov8n.pt"
+FRAME_TIMEOUT = 5.0      # seconds to wait for a live frame before reporting a stall
+LIVE_POLL = 0.05         # same, per camera per round when running several garages
+STATS_INTERVAL = 60.0    # seconds between frame grabber stats lines
+# Recorded detections go down to this confidence, so conf_threshold can be tuned later
+RECORD_CONF_THRESHOLD = 0.1
+
+ENTERING_COLOR = (0, 0, 255)   # Red → car entering
+LEAVING_COLOR = (0, 100, 0)    # Green → car leaving
+IDLE_LINE_COLOR = (255, 0, 0)
+
+ENTERING = {"neg_to_pos": NEG_TO_POS, "pos_to_neg": POS_TO_NEG}
+
+
+@dataclass
+class GarageConfig:
+    """One camera's counting setup. See garages.json for examples."""
+    name: str
+    redis_key: str
+    capacity: int = 150
+    # Path, RTSP URL or {"type": ..., "path": ...}; see sources.open_source
+    source: Optional[object] = None
+    line: List[int] = field(default_factory=lambda: [150, 1200, 653, 1050])
+    # "sign_change" or "deque" (see crossing.py)
+    crossing: str = "sign_change"
+    crossing_history: int = 5
+    # Which way over the line is a car entering: "neg_to_pos" or "pos_to_neg"
+    entering: str = "neg_to_pos"
+    detection_classes: List[str] = field(
+        default_factory=lambda: ['car', 'truck', 'bus', 'motorbike'])
+    conf_threshold: float = 0.3
+    tracker: dict = field(default_factory=lambda: {
+        "max_age": 20, "min_hits": 3, "iou_threshold": 0.3})
+    mask: Optional[str] = None
+    graphics: Optional[str] = None
+    graphics_scale: float = 2.0
+    # None falls back to CV_MOTION_GATE / CV_ROI_INFERENCE / CV_ROI_PAD
+    motion_gate: Optional[bool] = None
+    roi_inference: Optional[bool] = None
+    roi_pad: Optional[int] = None
+    enabled: bool = True
+
+    @classmethod
+    def from_dict(cls, data, base_dir=""):
+        """Build from a config entry; relative file paths are taken from base_dir."""
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(
+                f"Unknown setting(s) for garage {data.get('name')!r}: {', '.join(sorted(unknown))}")
+        if data.get("entering", "neg_to_pos") not in ENTERING:
+            raise ValueError(
+                f"entering must be one of {', '.join(ENTERING)}, got {data['entering']!r}")
+
+        data = dict(data)
+        for key in ("mask", "graphics"):
+            if data.get(key):
+                data[key] = resolve_path(data[key], base_dir)
+        data["source"] = resolve_source(data.get("source"), base_dir)
+        return cls(**data)
+
+
+def resolve_path(path, base_dir):
+    path = os.path.expandvars(path)
+    return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+
+def resolve_source(source, base_dir):
+    """
+    Resolve a config entry's file/directory source against base_dir. URLs
+    (after expanding environment variables) are left alone.
+    """
+    if isinstance(source, str):
+        source = os.path.expandvars(source)
+        return source if "://" in source else resolve_path(source, base_dir)
+    if isinstance(source, dict) and source.get("path") and source.get("type") != "rtsp":
+        path = os.path.expandvars(source["path"])
+        if "://" not in path:
+            return dict(source, path=resolve_path(path, base_dir))
+    return source
+
+
+def read_config_file(path):
+    """Parse a JSON or YAML (with PyYAML installed) config file."""
+    with open(path) as f:
+        if path.endswith((".yml", ".yaml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is needed for YAML configs (pip install pyyaml)")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def load_config(path=DEFAULT_CONFIG):
+    """Return (yolo_weights, {name: GarageConfig}) from a JSON or YAML file."""
+    data = read_config_file(path)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    garages = {}
+    for entry in data["garages"]:
+        garage = GarageConfig.from_dict(entry, base_dir)
+        garages[garage.name] = garage
+    return data.get("yolo_weights", YOLO_WEIGHTS), garages
+
+
+class CarCounter:
+    def __init__(self, garage, model=None, yolo_weights=YOLO_WEIGHTS, source=None,
+                 headless=None, motion_gate=None, roi_inference=None, publisher=None,
+                 detections_path=None):
+        self.garage = garage
+        self.name = garage.name
+
+        # Frames come from the garage's source unless one is passed in. With
+        # no source at all, frames and detections are fed in through
+        # process_detections (see inference_server.py), and a shared model
+        # can be passed in instead of loading another copy.
+        if source is None and garage.source is not None:
+            source = open_source(garage.source)
+        self.cap = source
+        self.model = model if model is not None else load_detector(yolo_weights)
+
+        # Rendering. Headless counters only draw the frames they dump.
+        self.headless = HEADLESS if headless is None else headless
+        self.dumper = FrameDumper(prefix=garage.redis_key)
+        self.frame_index = 0
+
+        # Mask and graphics, prepared once (the mask is resized to the
+        # frame size on the first frame)
+        self.mask = cv2.imread(garage.mask) if garage.mask else None
+        self.graphics = load_graphics(garage.graphics, scale=garage.graphics_scale)
+
+        # Tracker
+        self.tracker = FastSort(**garage.tracker)
+
+        # Counting
+        # Per-track state only covers tracks SORT still has (see
+        # _forget_dead_tracks); totals are plain integers.
+        self.line_limits = list(garage.line)
+        self.crossing = make_crossing(garage.crossing, self.line_limits, garage.crossing_history)
+        self.entering = ENTERING[garage.entering]
+        self.incoming = set()
+        self.outgoing = set()
+        self.obj_colors = {}
+        self.incoming_count = 0
+        self.outgoing_count = 0
+        self.conf_threshold = garage.conf_threshold
+        self.emptyCapacity = garage.capacity
+        self.capacity = garage.capacity
+        self.redis_key = garage.redis_key
+        self.detection_classes = list(garage.detection_classes)
+        self.detection_class_ids = class_ids_for(
+            self.model.names, self.detection_classes)
+
+        # The motion gate and ROI are tuned around the current line, so
+        # recordings are made without them: a sweep that moves the line
+        # would otherwise only see detections near the old one.
+        use_gate = _first_set(motion_gate, garage.motion_gate, MOTION_GATE) and not detections_path
+        self.motion_gate = MotionGate(self.line_limits) if use_gate else None
+        use_roi = _first_set(roi_inference, garage.roi_inference, ROI_INFERENCE) and not detections_path
+        self.roi = LineRoi(self.line_limits, _first_set(garage.roi_pad, ROI_PAD)) if use_roi else None
+
+        # Optionally keep every frame's detections for offline tuning (see
+        # detection_store.py and tune.py). While recording, the detector runs
+        # at RECORD_CONF_THRESHOLD and record() filters to conf_threshold.
+        self.recorder = None
+        self.detect_threshold = self.conf_threshold
+        if detections_path:
+            self.detect_threshold = min(self.conf_threshold, RECORD_CONF_THRESHOLD)
+            self.recorder = DetectionWriter(
+                detections_path, garage=self.name, clip=_clip_name(garage.source),
+                conf_threshold=self.detect_threshold,
+                detection_classes=self.detection_classes,
+                motion_gate=bool(use_gate), roi_inference=bool(use_roi))
+
+        # Availability is published as deltas; the key is only initialised
+        # to full capacity if no other counter (or earlier run) has set it.
+        # Offline runs pass availability.NullPublisher() instead.
+        self.publisher = publisher if publisher is not None else AvailabilityPublisher(
+            self.redis_key, self.emptyCapacity)
+        self.published_net = 0
+        value = self.publisher.init()
+        self.capacity = value if value is not None else self.emptyCapacity
+
+        # FPS, stage timings and stream state, published on a timer (see health.py)
+        self.health = CounterHealth(self.name, self.redis_key, self.publisher)
+
+    def update_redis(self):
+        """Send this camera's entries/exits since the last update to Redis"""
+        net = self.outgoing_count - self.incoming_count
+        value = self.publisher.publish(net - self.published_net)
+        self.published_net = net
+        # Show the shared garage value; fall back to this camera's own count
+        self.capacity = value if value is not None else self.emptyCapacity + net
+
+    @property
+    def live(self):
+        return getattr(self.cap, "live", False)
+
+    def read(self, timeout=FRAME_TIMEOUT):
+        return self.cap.read(timeout=timeout)
+
+    def frame_region(self, frame):
+        """The part of the frame the detector sees (the frame itself without a mask)."""
+        if self.mask is None:
+            return frame
+        if self.mask.shape[:2] != frame.shape[:2]:
+            self.mask = prepare_mask(self.mask, frame.shape)
+        # bitwise_and writes a new image, so the original stays clean for drawing
+        return cv2.bitwise_and(frame, self.mask)
+
+    def needs_inference(self, frame_region):
+        return self.motion_gate is None or self.motion_gate.should_infer(
+            frame_region, len(self.tracker.trackers) > 0)
+
+    def process_frame(self, timeout=FRAME_TIMEOUT):
+        started = time.perf_counter()
+        success, frame = self.read(timeout)
+        if not success:
+            if self.live:
+                print(f"❌ No frame from {self.name} camera, waiting for reconnect")
+                self.report_health()
+            return None, 0, False
+        self.health.stage("read", time.perf_counter() - started)
+
+        frame_region = self.frame_region(frame)
+        inferred = self.needs_inference(frame_region)
+        if inferred:
+            started = time.perf_counter()
+            detections = detect(self.model, frame_region, self.detection_class_ids,
+                                self.detect_threshold, self.roi)
+            self.health.stage("detect", time.perf_counter() - started)
+        else:
+            # Nothing moving near the line; SORT still needs its update
+            detections = np.empty((0, 5))
+
+        return self.update_counts(frame, self.record(detections, inferred))
+
+    def record(self, detections, inferred=True):
+        """Save the frame's detections if recording; returns the ones to track."""
+        if self.recorder is None:
+            return detections
+        self.recorder.add(detections, inferred)
+        return detections[detections[:, 4] > self.conf_threshold]
+
+    def process_detections(self, frame, detections):
+        """Count a frame whose detections were computed elsewhere."""
+        return self.update_counts(frame, detections)
+
+    def update_counts(self, frame, detections):
+        started = time.perf_counter()
+        tracker_results = self.tracker.update(detections)
+        tracked = time.perf_counter()
+        self.health.stage("track", tracked - started)
+        crossed_ids = set()
+        line_color = IDLE_LINE_COLOR
+        tracks = []
+
+        for res in tracker_results:
+            x1, y1, x2, y2, obj_id = map(int, res)
+            w, h = x2 - x1, y2 - y1
+            cx, cy = x1 + w // 2, y1 + h // 2
+            tracks.append((x1, y1, x2, y2, obj_id))
+
+            direction = self.crossing.update(obj_id, cx, cy)
+            if not direction:
+                continue
+            if direction == self.entering:
+                if obj_id not in self.incoming:
+                    self.incoming.add(obj_id)
+                    self.incoming_count += 1
+                self.obj_colors[obj_id] = ENTERING_COLOR
+            else:
+                if obj_id not in self.outgoing:
+                    self.outgoing.add(obj_id)
+                    self.outgoing_count += 1
+                self.obj_colors[obj_id] = LEAVING_COLOR
+            crossed_ids.add(obj_id)
+
+        if crossed_ids:
+            if any(obj_id in self.incoming for obj_id in crossed_ids):
+                line_color = ENTERING_COLOR
+            if any(obj_id in self.outgoing for obj_id in crossed_ids):
+                line_color = LEAVING_COLOR
+
+        # Publish this frame's crossings (if any) and reconcile when due
+        self.update_redis()
+
+        self._forget_dead_tracks()
+
+        self.frame_index += 1
+        dump = self.dumper.due(self.frame_index)
+        if not self.headless or dump:
+            draw_counter(frame, tracks, self.obj_colors, self.line_limits,
+                         line_color, self.capacity, self.graphics)
+        if dump:
+            self.dumper.dump(frame, self.frame_index)
+
+        self.health.stage("count", time.perf_counter() - tracked)
+        self.health.frame()
+        self.report_health()
+        return frame, self.capacity, True
+
+    def report_health(self):
+        self.health.publish_if_due(
+            tracks=len(self.tracker.trackers),
+            source_stats=self.cap.stats() if hasattr(self.cap, "stats") else None,
+            incoming=self.incoming_count,
+            outgoing=self.outgoing_count,
+        )
+
+    def _forget_dead_tracks(self):
+        """Drop state for track IDs SORT has deleted so it can't grow without bound."""
+        live = self.tracker.live_ids()
+        if len(self.crossing) <= len(live):
+            return
+        self.crossing.forget(live)
+        for obj_id in self.obj_colors.keys() - live:
+            del self.obj_colors[obj_id]
+        self.incoming &= live
+        self.outgoing &= live
+
+    def print_stats(self):
+        if hasattr(self.cap, "stats"):
+            print(f"{self.redis_key} stream stats: {self.cap.stats()}")
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+        if self.recorder is not None:
+            print(f"Saved {len(self.recorder)} frames of detections to {self.recorder.close()}")
+            self.recorder = None
+
+    def run(self):
+        last_stats = time.monotonic()
+        try:
+            while True:
+                frame, count, success = self.process_frame()
+                if time.monotonic() - last_stats >= STATS_INTERVAL:
+                    self.print_stats()
+                    last_stats = time.monotonic()
+                if not success and not self.live:
+                    break
+                if self.headless:
+                    continue
+                # A live source keeps reconnecting; keep waiting for frames
+                # instead of exiting on a network glitch.
+                if success:
+                    cv2.imshow(f"Parking Counter - {self.name}", frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        finally:
+            self.close()
+            if not self.headless:
+                cv2.destroyAllWindows()
+
+
+def _clip_name(source):
+    if isinstance(source, dict):
+        source = source.get("path") or source.get("url")
+    return os.path.basename(source) if isinstance(source, str) and "://" not in source else None
+
+
+def _first_set(*values):
+    return next(value for value in values if value is not None)
+
+
+def run_garages(counters, model):
+    """
+    Run several counters in one process until every recorded source ends
+    (live cameras run until 'q' or Ctrl+C). All counters must use `model`.
+    """
+    active = list(counters)
+    showing = any(not counter.headless for counter in counters)
+    last_stats = time.monotonic()
+    try:
+        while active:
+            requests, pending = [], []
+            for counter in list(active):
+                started = time.perf_counter()
+                success, frame = counter.read(timeout=LIVE_POLL)
+                if not success:
+                    if counter.live:
+                        counter.report_health()
+                    else:
+                        active.remove(counter)
+                        counter.close()
+                    continue
+                counter.health.stage("read", time.perf_counter() - started)
+                frame_region = counter.frame_region(frame)
+                if counter.needs_inference(frame_region):
+                    requests.append((frame_region, counter.detection_class_ids,
+                                     counter.detect_threshold, counter.roi))
+                    pending.append((counter, frame))
+                else:
+                    detections = counter.record(np.empty((0, 5)), inferred=False)
+                    _show(counter, counter.update_counts(frame, detections)[0])
+
+            if requests:
+                started = time.perf_counter()
+                batch = detect_batch(model, requests)
+                # One batched call; each camera is charged its share
+                share = (time.perf_counter() - started) / len(requests)
+                for (counter, frame), detections in zip(pending, batch):
+                    counter.health.stage("detect", share)
+                    _show(counter, counter.update_counts(frame, counter.record(detections))[0])
+
+            if time.monotonic() - last_stats >= STATS_INTERVAL:
+                for counter in active:
+                    counter.print_stats()
+                last_stats = time.monotonic()
+            if showing and cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        for counter in active:
+            counter.close()
+        if showing:
+            cv2.destroyAllWindows()
+
+
+def _show(counter, frame):
+    if not counter.headless:
+        cv2.imshow(f"Parking Counter - {counter.name}", frame)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count cars entering and leaving garages.")
+    parser.add_argument("garages", nargs="*",
+                        help="garages to run (default: every enabled garage in the config)")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="garage config (.json, .yaml)")
+    parser.add_argument("--weights", help="YOLO weights (overrides the config)")
+    parser.add_argument("--backend", choices=BACKENDS,
+                        help="detector backend (default: CV_DETECTOR_BACKEND, see detector_backends.py)")
+    parser.add_argument("--headless", action="store_true", default=None,
+                        help="no windows (default: CV_HEADLESS)")
+    parser.add_argument("--record-detections", metavar="DIR",
+                        help="save each garage's detections to DIR/<garage> for tune.py")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    yolo_weights, garages = load_config(args.config)
+    names = args.garages or [name for name, garage in garages.items() if garage.enabled]
+    unknown = [name for name in names if name not in garages]
+    if unknown:
+        parser.error(f"unknown garage(s): {', '.join(unknown)} "
+                     f"(configured: {', '.join(garages)})")
+
+    model = load_detector(args.weights or yolo_weights, args.backend)
+    counters = [
+        CarCounter(garages[name], model=model, headless=args.headless,
+                   detections_path=os.path.join(args.record_detections, name)
+                   if args.record_detections else None)
+        for name in names
+    ]
+    for counter in counters:
+        counter.update_redis()
+    run_garages(counters, model)
+    for counter in counters:
+        counter.update_redis()
+
+
+if __name__ == "__main__":
+    main()
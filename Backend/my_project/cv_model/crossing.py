@@ -0,0 +1,94 @@
+from collections import deque
+
+# Direction of a crossing, by which side of the line the centroid moved to
+POS_TO_NEG = 1
+NEG_TO_POS = -1
+
+
+def line_side(line_limits, cx, cy):
+    """Signed side of the point relative to the line (0 = on the line)."""
+    x1l, y1l, x2l, y2l = line_limits
+    return (x2l - x1l) * (cy - y1l) - (y2l - y1l) * (cx - x1l)
+
+
+def crossing_direction(side_prev, side_curr):
+    if side_prev > 0 and side_curr < 0:
+        return POS_TO_NEG
+    if side_prev < 0 and side_curr > 0:
+        return NEG_TO_POS
+    return 0
+
+
+class SignChangeCrossing:
+    """
+    A track crosses when its centroid is on the other side of the line than
+    it was in the previous frame it was seen in.
+
+    Only the previous y is kept; the side is worked out with the current x
+    (as the original counters did), so sideways drift alone never counts.
+    """
+
+    def __init__(self, line_limits):
+        self.line_limits = line_limits
+        self.positions = {}
+
+    def update(self, obj_id, cx, cy):
+        """Record the track's centroid and return POS_TO_NEG, NEG_TO_POS or 0."""
+        direction = 0
+        prev_cy = self.positions.get(obj_id)
+        if prev_cy is not None:
+            direction = crossing_direction(
+                line_side(self.line_limits, cx, prev_cy),
+                line_side(self.line_limits, cx, cy))
+        self.positions[obj_id] = cy
+        return direction
+
+    def forget(self, live_ids):
+        """Drop history for tracks that are no longer live."""
+        for obj_id in self.positions.keys() - live_ids:
+            del self.positions[obj_id]
+
+    def __len__(self):
+        return len(self.positions)
+
+
+class DequeCrossing(SignChangeCrossing):
+    """
+    Like SignChangeCrossing, but the current side is compared with each of
+    the last `history` positions, so a track that jitters on the line or
+    misses a frame right at it is still counted.
+    """
+
+    def __init__(self, line_limits, history=5):
+        super().__init__(line_limits)
+        self.history = history
+
+    def update(self, obj_id, cx, cy):
+        previous = self.positions.get(obj_id)
+        if previous is None:
+            previous = self.positions[obj_id] = deque(maxlen=self.history)
+
+        direction = 0
+        side_curr = line_side(self.line_limits, cx, cy)
+        for prev_cy in previous:
+            direction = crossing_direction(
+                line_side(self.line_limits, cx, prev_cy), side_curr)
+            if direction:
+                break
+        previous.append(cy)
+        return direction
+
+
+STRATEGIES = {
+    "sign_change": SignChangeCrossing,
+    "deque": DequeCrossing,
+}
+
+
+def make_crossing(name, line_limits, history=5):
+    if name not in STRATEGIES:
+        raise ValueError(
+            f"Unknown crossing strategy {name!r} (expected one of {', '.join(STRATEGIES)})")
+    if name == "deque":
+        return DequeCrossing(line_limits, history)
+    return STRATEGIES[name](line_limits)
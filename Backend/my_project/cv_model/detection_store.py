@@ -0,0 +1,97 @@
+"""
+Per-frame detections saved to disk, so tracking and counting can be
+replayed (and tuned, see tune.py) without running YOLO again.
+
+The layout is columnar: every detection of every frame is one row of
+`boxes` ([x1, y1, x2, y2, conf], float32 holds YOLO's values exactly), and
+frame i's rows are boxes[offsets[i]:offsets[i + 1]]. `inferred[i]` says
+whether the detector ran on frame i at all (the motion gate may skip it).
+
+A path ending in .npz is written as one file; any other path is a
+directory of .npy files, which DetectionStore memory-maps so several
+processes can read the same store without each loading a copy.
+"""
+import json
+import os
+
+import numpy as np
+
+
+def is_store(path):
+    """True for a .npz store or a store directory (as opposed to a video or image folder)."""
+    return path.endswith(".npz") or os.path.isfile(os.path.join(path, "meta.json"))
+
+
+class DetectionWriter:
+    """Collects detections frame by frame and writes them on close()."""
+
+    def __init__(self, path, **meta):
+        self.path = path
+        self.meta = meta
+        self._boxes = []
+        self._counts = []
+        self._inferred = []
+
+    def add(self, detections, inferred=True):
+        self._boxes.append(np.asarray(detections, dtype=np.float32).reshape(-1, 5))
+        self._counts.append(len(self._boxes[-1]))
+        self._inferred.append(inferred)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def close(self):
+        offsets = np.zeros(len(self._counts) + 1, dtype=np.int64)
+        np.cumsum(self._counts, out=offsets[1:])
+        columns = {
+            "boxes": np.concatenate(self._boxes) if self._boxes else np.empty((0, 5), np.float32),
+            "offsets": offsets,
+            "inferred": np.array(self._inferred, dtype=bool),
+        }
+        meta = dict(self.meta, frames=len(self))
+        if self.path.endswith(".npz"):
+            np.savez(self.path, meta=np.array(json.dumps(meta)), **columns)
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            for name, column in columns.items():
+                np.save(os.path.join(self.path, name + ".npy"), column)
+            with open(os.path.join(self.path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+        return self.path
+
+
+class DetectionStore:
+    """Read side: store[i] is frame i's (N, 5) float64 detections, ready for SORT."""
+
+    def __init__(self, path):
+        self.path = path
+        if path.endswith(".npz"):
+            with np.load(path) as data:
+                self.boxes = data["boxes"]
+                self.offsets = data["offsets"]
+                self.inferred = data["inferred"]
+                self.meta = json.loads(str(data["meta"]))
+        else:
+            self.boxes = np.load(os.path.join(path, "boxes.npy"), mmap_mode="r")
+            self.offsets = np.load(os.path.join(path, "offsets.npy"))
+            self.inferred = np.load(os.path.join(path, "inferred.npy"))
+            with open(os.path.join(path, "meta.json")) as f:
+                self.meta = json.load(f)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, frame_index):
+        start, end = self.offsets[frame_index], self.offsets[frame_index + 1]
+        return self.boxes[start:end].astype(np.float64)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def frames(self, conf_threshold=None):
+        """Iterate frames, keeping only detections above conf_threshold (if given)."""
+        for detections in self:
+            if conf_threshold is not None:
+                detections = detections[detections[:, 4] > conf_threshold]
+            yield detections
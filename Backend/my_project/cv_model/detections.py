@@ -0,0 +1,77 @@
+import numpy as np
+
+def class_ids_for(model_names, class_names):
+    """Map class names (e.g. ['car', 'truck']) to the model's class ids."""
+    wanted = set(class_names)
+    return np.array(sorted(i for i, name in model_names.items() if name in wanted))
+
+
+def extract_detections(results, class_ids, conf_threshold):
+    """
+    Turn YOLO results into an (N, 5) array of [x1, y1, x2, y2, conf] for SORT.
+
+    Each result's boxes come off the device in one `.cpu().numpy()` call and
+    are filtered with a class-id mask and a confidence mask, instead of
+    reading every box (and syncing with the device) in a Python loop.
+    Coordinates are truncated to whole pixels like `int()` did before.
+    """
+    batches = []
+    for r in results:
+        if r.boxes is None or len(r.boxes) == 0:
+            continue
+        # Columns: x1, y1, x2, y2, conf, cls
+        data = r.boxes.data.cpu().numpy().astype(np.float64)
+        keep = (data[:, 4] > conf_threshold) & np.isin(data[:, 5], class_ids)
+        if keep.any():
+            kept = data[keep, :5]
+            kept[:, :4] = np.trunc(kept[:, :4])
+            batches.append(kept)
+
+    if not batches:
+        return np.empty((0, 5))
+    return batches[0] if len(batches) == 1 else np.concatenate(batches)
+
+
+def detect(model, frame, class_ids, conf_threshold, roi=None):
+    """
+    Run the model on a frame and return SORT detections in frame coordinates.
+    With a `roi.LineRoi`, only the crop around the counting line is detected,
+    at a proportionally smaller inference size. The model gets the threshold
+    too, since ultralytics otherwise drops boxes under its own 0.25 default.
+    """
+    if roi is None:
+        results = model(frame, stream=True, conf=conf_threshold)
+        return extract_detections(results, class_ids, conf_threshold)
+
+    crop, imgsz = roi.crop(frame)
+    results = model(crop, stream=True, imgsz=imgsz, conf=conf_threshold)
+    return roi.restore(extract_detections(results, class_ids, conf_threshold))
+
+
+def detect_batch(model, requests):
+    """
+    Run several frames through the model in as few calls as possible.
+
+    `requests` is a list of (frame, class_ids, conf_threshold, roi) tuples,
+    one per camera; returns their detections in the same order. Frames that
+    share an inference size (full frames, or line crops of the same size)
+    go through the model together as one batch.
+    """
+    groups = {}
+    for i, (frame, _, _, roi) in enumerate(requests):
+        image, imgsz = (frame, None) if roi is None else roi.crop(frame)
+        groups.setdefault(imgsz, []).append((i, image))
+
+    out = [None] * len(requests)
+    for imgsz, members in groups.items():
+        # The lowest threshold in the batch; extraction applies each camera's own
+        conf = min(requests[i][2] for i, _ in members)
+        options = {"verbose": False, "conf": conf}
+        if imgsz is not None:
+            options["imgsz"] = imgsz
+        results = model([image for _, image in members], **options)
+        for (i, _), result in zip(members, results):
+            _, class_ids, conf_threshold, roi = requests[i]
+            detections = extract_detections([result], class_ids, conf_threshold)
+            out[i] = detections if roi is None else roi.restore(detections)
+    return out
@@ -0,0 +1,197 @@
+"""
+Detector backends for the counters: PyTorch (the .pt weights as-is), or
+the same weights exported once to ONNX Runtime or OpenVINO, which run
+considerably faster on CPU-only edge boxes. Exported models have a fixed
+input size, and ONNX/OpenVINO models can optionally be int8-quantized.
+
+    python detector_backends.py export --backend onnx
+    python detector_backends.py export --backend openvino --int8
+    python detector_backends.py parity --backend onnx Videos/clip.mov
+
+Counters pick the backend from CV_DETECTOR_BACKEND (torch, onnx or
+openvino; CV_DETECTOR_INT8 and CV_DETECTOR_IMGSZ go with it) or from
+counter_engine.py's --backend flag. Run `export` first; `parity` then
+checks that the exported model finds the same boxes as PyTorch.
+"""
+import argparse
+import os
+
+import numpy as np
+from decouple import config
+
+BACKENDS = ("torch", "onnx", "openvino")
+DETECTOR_BACKEND = config("CV_DETECTOR_BACKEND", default="torch")
+DETECTOR_INT8 = config("CV_DETECTOR_INT8", default=False, cast=bool)
+DETECTOR_IMGSZ = config("CV_DETECTOR_IMGSZ", default=640, cast=int)
+
+
+def exported_path(weights, backend, int8=False):
+    """Where `export` puts the model (ultralytics' naming, next to the weights)."""
+    stem = os.path.splitext(weights)[0]
+    if backend == "onnx":
+        return f"{stem}-int8.onnx" if int8 else f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+    return weights
+
+
+def export(weights, backend, imgsz=DETECTOR_IMGSZ, int8=False, data=None):
+    """Export .pt weights to a fixed-size model for `backend`; returns its path."""
+    if backend not in BACKENDS or backend == "torch":
+        raise ValueError(f"Can only export to {', '.join(BACKENDS[1:])}, not {backend!r}")
+    from ultralytics import YOLO
+
+    model = YOLO(weights)
+    if backend == "openvino":
+        options = {"int8": int8}
+        if int8 and data:
+            options["data"] = data   # calibration images (ultralytics defaults to coco8)
+        return model.export(format="openvino", imgsz=imgsz, dynamic=False, **options)
+
+    path = model.export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True)
+    if not int8:
+        return path
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantized = exported_path(weights, "onnx", int8=True)
+    quantize_dynamic(path, quantized, weight_type=QuantType.QUInt8)
+    return quantized
+
+
+class Detector:
+    """
+    A YOLO model on one backend, called like the ultralytics model.
+
+    Exported models only take their export size and one image per call,
+    so `imgsz` is pinned for them (line crops are letterboxed up to it) and
+    lists of frames are run one at a time.
+    """
+
+    def __init__(self, weights, backend=DETECTOR_BACKEND, imgsz=DETECTOR_IMGSZ, int8=DETECTOR_INT8):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown detector backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+        self.backend = backend
+        self.path = exported_path(weights, backend, int8)
+        if backend != "torch" and not os.path.exists(self.path):
+            raise FileNotFoundError(
+                f"No {backend} model at {self.path}; run "
+                f"`python detector_backends.py export --backend {backend}{' --int8' if int8 else ''}` first")
+        # ultralytics pulls in torch; import it only when a model is loaded,
+        # so replaying cached detections starts quickly
+        from ultralytics import YOLO
+
+        self.model = YOLO(self.path, task="detect")
+        self.fixed_imgsz = None if backend == "torch" else imgsz
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def __call__(self, source, **options):
+        if self.fixed_imgsz is None:
+            return self.model(source, **options)
+        options["imgsz"] = self.fixed_imgsz
+        if not isinstance(source, list):
+            return self.model(source, **options)
+        options.pop("stream", None)
+        return [result for image in source for result in self.model(image, **options)]
+
+
+def load_detector(weights, backend=None):
+    """The counters' model: a Detector for CV_DETECTOR_BACKEND unless `backend` is given."""
+    return Detector(weights, backend or DETECTOR_BACKEND)
+
+
+def match_detections(reference, candidate, iou_threshold=0.9):
+    """
+    Greedily pair boxes of two (N, 5) detection arrays by IOU.
+    Returns (pairs, unmatched_reference, unmatched_candidate) as index arrays.
+    """
+    from fast_sort import iou_batch
+
+    if not len(reference) or not len(candidate):
+        return np.empty((0, 2), dtype=int), np.arange(len(reference)), np.arange(len(candidate))
+    iou = iou_batch(reference[:, :4], candidate[:, :4])
+    pairs = []
+    while iou.size and iou.max() >= iou_threshold:
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        pairs.append((i, j))
+        iou[i, :] = -1
+        iou[:, j] = -1
+    pairs = np.array(pairs, dtype=int).reshape(-1, 2)
+    return (pairs,
+            np.setdiff1d(np.arange(len(reference)), pairs[:, 0]),
+            np.setdiff1d(np.arange(len(candidate)), pairs[:, 1]))
+
+
+def parity(weights, backend, video_path, frames=100, imgsz=DETECTOR_IMGSZ, int8=False,
+           classes=('car', 'truck', 'bus', 'motorbike'), conf_threshold=0.3,
+           iou_threshold=0.9, conf_tolerance=0.05, min_matched=0.98):
+    """
+    Run PyTorch and `backend` on the same frames and compare detections.
+    Passes when at least `min_matched` of all boxes pair up at IOU >=
+    `iou_threshold` with confidences within `conf_tolerance`.
+    """
+    import cv2
+    from detections import class_ids_for, detect
+
+    reference = Detector(weights, "torch")
+    candidate = Detector(weights, backend, imgsz, int8)
+    # Same input size for both, so only the backend differs
+    reference.fixed_imgsz = candidate.fixed_imgsz
+    class_ids = class_ids_for(reference.names, classes)
+
+    cap = cv2.VideoCapture(video_path)
+    total = matched = within_conf = 0
+    conf_diffs = []
+    for _ in range(frames):
+        success, frame = cap.read()
+        if not success:
+            break
+        ref = detect(reference, frame, class_ids, conf_threshold)
+        cand = detect(candidate, frame, class_ids, conf_threshold)
+        pairs, missing, extra = match_detections(ref, cand, iou_threshold)
+        total += len(pairs) + len(missing) + len(extra)
+        matched += len(pairs)
+        if len(pairs):
+            diffs = np.abs(ref[pairs[:, 0], 4] - cand[pairs[:, 1], 4])
+            within_conf += int((diffs <= conf_tolerance).sum())
+            conf_diffs.extend(diffs.tolist())
+    cap.release()
+
+    ratio = within_conf / total if total else 1.0
+    print(f"{backend} vs torch: {matched}/{total} boxes matched at IOU >= {iou_threshold}, "
+          f"{within_conf} within conf ±{conf_tolerance} "
+          f"(max conf difference {max(conf_diffs, default=0):.3f})")
+    ok = ratio >= min_matched
+    print("✓ Detections match" if ok else f"❌ Only {ratio:.1%} of boxes match")
+    return ok
+
+
+def main(argv=None):
+    from counter_engine import load_config
+
+    parser = argparse.ArgumentParser(description="Export and check detector backends.")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("video", nargs="?", help="clip for parity (default: the demo garage's video)")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="onnx")
+    parser.add_argument("--weights", help="YOLO .pt weights (default: from garages.json)")
+    parser.add_argument("--imgsz", type=int, default=DETECTOR_IMGSZ)
+    parser.add_argument("--int8", action="store_true", help="int8-quantize the exported model")
+    parser.add_argument("--data", help="calibration dataset YAML for OpenVINO int8")
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    yolo_weights, garages = load_config()
+    weights = args.weights or yolo_weights
+    if args.command == "export":
+        print(f"Exported to {export(weights, args.backend, args.imgsz, args.int8, args.data)}")
+        return True
+
+    video = args.video or next(iter(garages.values())).source
+    return parity(weights, args.backend, video, args.frames, args.imgsz, args.int8)
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(0 if main() else 1)
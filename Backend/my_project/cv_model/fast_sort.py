@@ -0,0 +1,289 @@
+"""
+Structure-of-arrays SORT tracker.
+
+Same algorithm and numbers as `sort.Sort` (constant-velocity Kalman filter
+on [x, y, s, r], IOU + Hungarian association), but every track lives in a
+row of a few NumPy arrays, so predict and update run as batched matrix
+operations over all tracks instead of one filterpy KalmanFilter per track.
+Importing it pulls in no plotting or image libraries.
+
+Run `python fast_sort.py [det.txt]` to check that its output matches
+`sort.Sort` on recorded (MOT-format) or synthetic detections and to
+compare tracks/sec.
+"""
+import numpy as np
+
+DIM_X = 7
+DIM_Z = 4
+
+# Constant velocity model, as set up by sort.KalmanBoxTracker
+F = np.eye(DIM_X)
+F[0, 4] = F[1, 5] = F[2, 6] = 1.
+R = np.diag([1., 1., 10., 10.])
+Q = np.diag([1., 1., 1., 1., .01, .01, .0001])
+P0 = np.diag([10., 10., 10., 10., 10000., 10000., 10000.])
+I_X = np.eye(DIM_X)
+
+
+def linear_assignment(cost_matrix):
+    try:
+        import lap
+        _, x, y = lap.lapjv(cost_matrix, extend_cost=True)
+        return np.array([[y[i], i] for i in x if i >= 0])
+    except ImportError:
+        from scipy.optimize import linear_sum_assignment
+        x, y = linear_sum_assignment(cost_matrix)
+        return np.array(list(zip(x, y)))
+
+
+def iou_batch(bb_test, bb_gt):
+    """IOU between every box in bb_test and every box in bb_gt ([x1,y1,x2,y2])."""
+    bb_gt = np.expand_dims(bb_gt, 0)
+    bb_test = np.expand_dims(bb_test, 1)
+
+    xx1 = np.maximum(bb_test[..., 0], bb_gt[..., 0])
+    yy1 = np.maximum(bb_test[..., 1], bb_gt[..., 1])
+    xx2 = np.minimum(bb_test[..., 2], bb_gt[..., 2])
+    yy2 = np.minimum(bb_test[..., 3], bb_gt[..., 3])
+    w = np.maximum(0., xx2 - xx1)
+    h = np.maximum(0., yy2 - yy1)
+    wh = w * h
+    return wh / ((bb_test[..., 2] - bb_test[..., 0]) * (bb_test[..., 3] - bb_test[..., 1])
+                 + (bb_gt[..., 2] - bb_gt[..., 0]) * (bb_gt[..., 3] - bb_gt[..., 1]) - wh)
+
+
+def bbox_to_z(bboxes):
+    """(N, 4+) [x1,y1,x2,y2] -> (N, 4) [x, y, s, r] (centre, area, aspect ratio)."""
+    w = bboxes[:, 2] - bboxes[:, 0]
+    h = bboxes[:, 3] - bboxes[:, 1]
+    return np.stack([bboxes[:, 0] + w / 2., bboxes[:, 1] + h / 2., w * h, w / h], axis=1)
+
+
+def x_to_bbox(x):
+    """(N, 7+) states -> (N, 4) [x1,y1,x2,y2]."""
+    w = np.sqrt(x[:, 2] * x[:, 3])
+    h = x[:, 2] / w
+    return np.stack([x[:, 0] - w / 2., x[:, 1] - h / 2., x[:, 0] + w / 2., x[:, 1] + h / 2.], axis=1)
+
+
+def associate_detections_to_trackers(detections, trackers, iou_threshold=0.3):
+    """
+    Match detections to predicted track boxes.
+
+    Returns (matches, unmatched_detections, unmatched_trackers) in the same
+    order as sort.associate_detections_to_trackers, which decides the order
+    new track IDs are handed out in.
+    """
+    if len(trackers) == 0:
+        return np.empty((0, 2), dtype=int), np.arange(len(detections)), np.empty((0,), dtype=int)
+
+    iou_matrix = iou_batch(detections, trackers)
+
+    if min(iou_matrix.shape) > 0:
+        a = (iou_matrix > iou_threshold).astype(np.int32)
+        if a.sum(1).max() == 1 and a.sum(0).max() == 1:
+            matched_indices = np.stack(np.where(a), axis=1)
+        else:
+            matched_indices = linear_assignment(-iou_matrix)
+    else:
+        matched_indices = np.empty(shape=(0, 2), dtype=int)
+    matched_indices = matched_indices.astype(int).reshape(-1, 2)
+
+    unmatched_detections = np.flatnonzero(
+        ~np.isin(np.arange(len(detections)), matched_indices[:, 0]))
+    unmatched_trackers = np.flatnonzero(
+        ~np.isin(np.arange(len(trackers)), matched_indices[:, 1]))
+
+    # Matches below the threshold go to the back of both unmatched lists
+    low = iou_matrix[matched_indices[:, 0], matched_indices[:, 1]] < iou_threshold
+    return (
+        matched_indices[~low],
+        np.concatenate([unmatched_detections, matched_indices[low, 0]]),
+        np.concatenate([unmatched_trackers, matched_indices[low, 1]]),
+    )
+
+
+class FastSort:
+    def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3):
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+        self.frame_count = 0
+        # Per instance, so several cameras in one process each number from 1
+        self.next_id = 0
+
+        self.x = np.empty((0, DIM_X))
+        self.P = np.empty((0, DIM_X, DIM_X))
+        self.ids = np.empty((0,), dtype=np.int64)
+        self.time_since_update = np.empty((0,), dtype=np.int64)
+        self.hits = np.empty((0,), dtype=np.int64)
+        self.hit_streak = np.empty((0,), dtype=np.int64)
+        self.age = np.empty((0,), dtype=np.int64)
+
+    @property
+    def trackers(self):
+        """IDs of the live tracks, as reported by update() (len() matches Sort.trackers)."""
+        return self.ids + 1
+
+    def live_ids(self):
+        """Set of IDs SORT still tracks; state for any other ID can be dropped."""
+        return set((self.ids + 1).tolist())
+
+    def _keep(self, mask):
+        self.x = self.x[mask]
+        self.P = self.P[mask]
+        self.ids = self.ids[mask]
+        self.time_since_update = self.time_since_update[mask]
+        self.hits = self.hits[mask]
+        self.hit_streak = self.hit_streak[mask]
+        self.age = self.age[mask]
+
+    def _predict(self):
+        # Don't let the area go negative
+        self.x[self.x[:, 6] + self.x[:, 2] <= 0, 6] *= 0.0
+        self.x = self.x @ F.T
+        self.P = F @ self.P @ F.T + Q
+        self.age += 1
+        self.hit_streak[self.time_since_update > 0] = 0
+        self.time_since_update += 1
+        return x_to_bbox(self.x)
+
+    def _update(self, rows, z):
+        """Joseph-form Kalman update of tracks `rows` with measurements z (M, 4)."""
+        x = self.x[rows]
+        P = self.P[rows]
+
+        y = z - x[:, :DIM_Z]
+        PHT = P[:, :, :DIM_Z]
+        S = PHT[:, :DIM_Z, :] + R
+        K = PHT @ np.linalg.inv(S)
+        x = x + (K @ y[:, :, None])[:, :, 0]
+
+        KH = np.zeros_like(P)
+        KH[:, :, :DIM_Z] = K
+        I_KH = I_X - KH
+        P = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ R @ K.transpose(0, 2, 1)
+
+        self.x[rows] = x
+        self.P[rows] = P
+        self.time_since_update[rows] = 0
+        self.hits[rows] += 1
+        self.hit_streak[rows] += 1
+
+    def _add(self, dets):
+        n = len(dets)
+        x = np.zeros((n, DIM_X))
+        x[:, :DIM_Z] = bbox_to_z(dets)
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, np.broadcast_to(P0, (n, DIM_X, DIM_X))])
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n)])
+        self.next_id += n
+        zeros = np.zeros(n, dtype=np.int64)
+        self.time_since_update = np.concatenate([self.time_since_update, zeros])
+        self.hits = np.concatenate([self.hits, zeros])
+        self.hit_streak = np.concatenate([self.hit_streak, zeros])
+        self.age = np.concatenate([self.age, zeros])
+
+    def update(self, dets=np.empty((0, 5))):
+        """
+        Same contract as sort.Sort.update: call once per frame (with an empty
+        (0, 5) array when there are no detections); returns [x1,y1,x2,y2,id]
+        rows for confirmed tracks.
+        """
+        self.frame_count += 1
+
+        predicted = self._predict()
+        valid = ~np.any(np.isnan(predicted), axis=1)
+        if not valid.all():
+            self._keep(valid)
+            predicted = predicted[valid]
+
+        matched, unmatched_dets, _ = associate_detections_to_trackers(
+            dets, predicted, self.iou_threshold)
+
+        if len(matched):
+            self._update(matched[:, 1], bbox_to_z(dets[matched[:, 0]]))
+        if len(unmatched_dets):
+            self._add(dets[unmatched_dets.astype(int)])
+
+        # sort.Sort reports tracks newest-first
+        order = np.arange(len(self.ids))[::-1]
+        report = (self.time_since_update[order] < 1) & (
+            (self.hit_streak[order] >= self.min_hits) | (self.frame_count <= self.min_hits))
+        rows = order[report]
+        ret = np.concatenate(
+            [x_to_bbox(self.x[rows]), (self.ids[rows] + 1)[:, None]], axis=1)
+
+        alive = self.time_since_update <= self.max_age
+        if not alive.all():
+            self._keep(alive)
+
+        return ret if len(ret) else np.empty((0, 5))
+
+
+def synthetic_detections(frames=2000, cars=12, seed=0):
+    """Cars driving across a 1280x720 frame with jitter and missed detections."""
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform(0, frames, cars * frames // 200)
+    sequence = []
+    for frame in range(frames):
+        boxes = []
+        for i, start in enumerate(starts):
+            t = frame - start
+            if not 0 <= t < 200 or rng.random() < 0.1:
+                continue
+            cx = 40 + t * 6 + (i % 7) * 3
+            cy = 100 + (i * 53) % 500 + rng.normal(0, 2)
+            w, h = 120 + (i % 5) * 10, 70 + (i % 3) * 8
+            boxes.append([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2, rng.uniform(0.4, 0.95)])
+        sequence.append(np.array(boxes) if boxes else np.empty((0, 5)))
+    return sequence
+
+
+def load_mot_detections(path):
+    """Per-frame [x1,y1,x2,y2,score] arrays from a MOT det.txt file."""
+    seq_dets = np.loadtxt(path, delimiter=',')
+    sequence = []
+    for frame in range(1, int(seq_dets[:, 0].max()) + 1):
+        dets = seq_dets[seq_dets[:, 0] == frame, 2:7]
+        dets[:, 2:4] += dets[:, 0:2]
+        sequence.append(dets)
+    return sequence
+
+
+def benchmark(sequence, max_age=20, min_hits=3, iou_threshold=0.3):
+    import time
+    from sort import Sort, KalmanBoxTracker
+
+    def run(tracker):
+        outputs = []
+        track_updates = 0
+        started = time.perf_counter()
+        for dets in sequence:
+            out = tracker.update(dets)
+            outputs.append(out)
+            track_updates += len(tracker.trackers)
+        return outputs, track_updates / (time.perf_counter() - started)
+
+    KalmanBoxTracker.count = 0
+    reference, ref_rate = run(Sort(max_age=max_age, min_hits=min_hits, iou_threshold=iou_threshold))
+    fast, fast_rate = run(FastSort(max_age=max_age, min_hits=min_hits, iou_threshold=iou_threshold))
+
+    ids_match = all(
+        np.array_equal(a[:, 4], b[:, 4]) for a, b in zip(reference, fast))
+    max_box_diff = max(
+        (np.abs(a[:, :4] - b[:, :4]).max() for a, b in zip(reference, fast) if len(a) and len(a) == len(b)),
+        default=0.0)
+
+    print(f"Frames: {len(sequence)}")
+    print(f"sort.Sort:     {ref_rate:,.0f} tracks/s")
+    print(f"FastSort:      {fast_rate:,.0f} tracks/s ({fast_rate / ref_rate:.1f}x)")
+    print(f"IDs match: {ids_match}, max box difference: {max_box_diff:.2e}px")
+    return ids_match
+
+
+if __name__ == '__main__':
+    import sys
+
+    seq = load_mot_detections(sys.argv[1]) if len(sys.argv) > 1 else synthetic_detections()
+    sys.exit(0 if benchmark(seq) else 1)
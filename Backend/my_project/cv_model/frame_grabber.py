@@ -0,0 +1,128 @@
+import threading
+import time
+
+import cv2
+
+
+class LatestFrameGrabber:
+    """
+    Reads a live stream on its own thread and keeps only the newest frame.
+
+    The camera is drained as fast as it produces frames, so RTSP buffers
+    never build up behind a slow consumer; frames the consumer didn't get to
+    are counted as dropped. If the stream stops delivering frames it is
+    reopened with exponential backoff instead of giving up. The backoff only
+    resets once a frame is read, so a camera that accepts connections but
+    sends nothing isn't reopened in a tight loop.
+    """
+
+    def __init__(self, source, reconnect_delay=1.0, max_reconnect_delay=30.0,
+                 read_failures_before_reconnect=30):
+        self.source = source
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.read_failures_before_reconnect = read_failures_before_reconnect
+
+        self._cap = None
+        self._frame = None
+        self._frame_id = 0
+        self._consumed_id = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._delay = reconnect_delay
+
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+        self.connected = False
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="frame-grabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        # Ask the backend to buffer as little as possible; not every backend honours it
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _backoff(self, reason):
+        print(f"❌ {reason}, retrying in {self._delay:.0f}s")
+        self._stop.wait(self._delay)
+        self._delay = min(self._delay * 2, self.max_reconnect_delay)
+
+    def _connect(self):
+        while not self._stop.is_set():
+            self._cap = self._open()
+            if self._cap.isOpened():
+                self.connected = True
+                print(f"✅ Connected to stream: {self.source}")
+                return True
+            self._cap.release()
+            self._backoff("Failed to open stream")
+        return False
+
+    def _run(self):
+        if not self._connect():
+            return
+        failures = 0
+        while not self._stop.is_set():
+            success, frame = self._cap.read()
+            if not success:
+                failures += 1
+                if failures < self.read_failures_before_reconnect:
+                    time.sleep(0.01)
+                    continue
+                self.connected = False
+                self._cap.release()
+                self.reconnects += 1
+                failures = 0
+                self._backoff("Stream stopped delivering frames")
+                if not self._connect():
+                    break
+                continue
+
+            failures = 0
+            self._delay = self.reconnect_delay
+            with self._cond:
+                if self._frame_id > self._consumed_id:
+                    self.frames_dropped += 1
+                self._frame = frame
+                self._frame_id += 1
+                self.frames_read += 1
+                self._cond.notify_all()
+
+        if self._cap is not None:
+            self._cap.release()
+
+    def read(self, timeout=5.0):
+        """Return (success, frame) with the newest frame not yet returned."""
+        with self._cond:
+            if not self._cond.wait_for(
+                    lambda: self._frame_id > self._consumed_id or self._stop.is_set(),
+                    timeout=timeout):
+                return False, None
+            if self._frame_id <= self._consumed_id:
+                return False, None
+            self._consumed_id = self._frame_id
+            return True, self._frame
+
+    def stats(self):
+        return {
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+            "reconnects": self.reconnects,
+            "connected": self.connected,
+        }
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    release = stop
@@ -0,0 +1,80 @@
+import json
+import time
+
+from decouple import config
+
+# Every counter writes one JSON record into this hash (field = camera name)
+# every CV_HEALTH_INTERVAL seconds; /api/cameras/health reads it back. The
+# bridge ignores keys starting with "_".
+HEALTH_KEY = "_camera_health"
+HEALTH_INTERVAL = config("CV_HEALTH_INTERVAL", default=10, cast=float)
+
+
+class CounterHealth:
+    """
+    Per-camera throughput and stage timings, published to Redis on a timer.
+
+    Counters call frame() for every frame they count and stage() for each
+    timed step; publish_if_due() sends averages over the last interval.
+    It is also called while a live camera is stalled, so a stale
+    last_frame_at shows up even when no frames arrive.
+    """
+
+    def __init__(self, name, redis_key, publisher, interval=HEALTH_INTERVAL):
+        self.name = name
+        self.redis_key = redis_key
+        self.publisher = publisher
+        self.interval = interval
+        self.started_at = time.time()
+        self.last_frame_at = None
+        self.frames = 0
+        self._window_started = time.monotonic()
+        self._window_frames = 0
+        self._stage_seconds = {}
+        self._stage_calls = {}
+
+    def frame(self):
+        self.frames += 1
+        self._window_frames += 1
+        self.last_frame_at = time.time()
+
+    def stage(self, name, seconds):
+        self._stage_seconds[name] = self._stage_seconds.get(name, 0.0) + seconds
+        self._stage_calls[name] = self._stage_calls.get(name, 0) + 1
+
+    def record(self, tracks=0, source_stats=None, incoming=0, outgoing=0):
+        elapsed = max(time.monotonic() - self._window_started, 1e-6)
+        record = {
+            "camera": self.name,
+            "redis_key": self.redis_key,
+            "fps": round(self._window_frames / elapsed, 2),
+            "stage_ms": {
+                stage: round(1000 * seconds / self._stage_calls[stage], 2)
+                for stage, seconds in self._stage_seconds.items()
+            },
+            "frames": self.frames,
+            "last_frame_at": self.last_frame_at,
+            "tracks": tracks,
+            "incoming": incoming,
+            "outgoing": outgoing,
+            "started_at": self.started_at,
+            "updated_at": time.time(),
+        }
+        for key in ("reconnects", "frames_dropped", "connected"):
+            if source_stats and key in source_stats:
+                record[key] = source_stats[key]
+        return record
+
+    def publish_if_due(self, **details):
+        """Write the record if the interval has passed; returns it (or None)."""
+        if time.monotonic() - self._window_started < self.interval:
+            return None
+        record = self.record(**details)
+        self._window_started = time.monotonic()
+        self._window_frames = 0
+        self._stage_seconds.clear()
+        self._stage_calls.clear()
+        # Goes through the publisher so a Redis outage is logged and backed
+        # off once for both availability and health; NullPublisher drops it
+        self.publisher.write_field(HEALTH_KEY, self.name, json.dumps(record))
+        return record
@@ -0,0 +1,198 @@
+import dataclasses
+import queue
+import threading
+import time
+
+import cv2
+
+from counter_engine import DEFAULT_CONFIG, CarCounter, load_config
+from detections import class_ids_for, detect_batch
+from detector_backends import load_detector
+from rendering import HEADLESS
+from sources import open_source
+
+# Marks the end of a stream on both the frame queue and its output queue
+END_OF_STREAM = None
+
+
+class CameraReader(threading.Thread):
+    """Reads one frame source (see sources.py) and feeds frames to the shared queue."""
+
+    def __init__(self, stream_id, source, frames, stop_event):
+        super().__init__(name=f"reader-{stream_id}", daemon=True)
+        self.stream_id = stream_id
+        self.source = source
+        self.frames = frames
+        self.stop_event = stop_event
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                success, frame = self.source.read(timeout=0.5)
+                if not success:
+                    # A live camera reconnects on its own; a recording has ended
+                    if self.source.live:
+                        continue
+                    break
+                # Blocks when the inference worker is behind, so a video file
+                # is never read faster than it can be detected.
+                self.frames.put((self.stream_id, frame))
+        finally:
+            self.source.release()
+            self.frames.put((self.stream_id, END_OF_STREAM))
+
+
+class InferenceServer:
+    """
+    One YOLO model shared by every camera.
+
+    Camera readers push (stream_id, frame) onto one bounded queue. A single
+    worker thread pulls up to `batch_size` frames at a time (waiting at most
+    `max_wait` seconds to fill a batch), runs them through the model in one
+    call and puts (frame, detections) on that stream's output queue.
+    """
+
+    def __init__(self, yolo_weights, batch_size=8, max_wait=0.02, model=None):
+        self.model = model if model is not None else load_detector(yolo_weights)
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+
+        self.frames = queue.Queue(maxsize=batch_size * 2)
+        self.outputs = {}
+        self.readers = []
+        self._filters = {}
+        self._stop = threading.Event()
+        self._worker = None
+
+        self.batches = 0
+        self.frames_processed = 0
+
+    def add_stream(self, stream_id, source, detection_classes, conf_threshold=0.3,
+                   roi=None, region=None):
+        """
+        Register an opened frame source and return the queue its results
+        arrive on. `region` (e.g. CarCounter.frame_region) picks the part of
+        each frame the model sees; `roi` crops it to the counting line.
+        """
+        self._filters[stream_id] = (
+            class_ids_for(self.model.names, detection_classes), conf_threshold,
+            roi, region)
+        self.outputs[stream_id] = queue.Queue(maxsize=self.batch_size * 2)
+        self.readers.append(
+            CameraReader(stream_id, source, self.frames, self._stop))
+        return self.outputs[stream_id]
+
+    def start(self):
+        self._worker = threading.Thread(
+            target=self._work, name="inference", daemon=True)
+        self._worker.start()
+        for reader in self.readers:
+            reader.start()
+
+    def stop(self):
+        self._stop.set()
+        # Unblock readers waiting on a full queue
+        while True:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                break
+
+    def _next_batch(self):
+        """Collect up to batch_size frames; end-of-stream markers end a batch early."""
+        batch = []
+        try:
+            item = self.frames.get(timeout=0.5)
+        except queue.Empty:
+            return batch, None
+        if item[1] is END_OF_STREAM:
+            return batch, item[0]
+        batch.append(item)
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.frames.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item[1] is END_OF_STREAM:
+                return batch, item[0]
+            batch.append(item)
+        return batch, None
+
+    def _work(self):
+        open_streams = set(self.outputs)
+        while open_streams and not self._stop.is_set():
+            batch, ended = self._next_batch()
+
+            if batch:
+                requests = []
+                for stream_id, frame in batch:
+                    class_ids, conf_threshold, roi, region = self._filters[stream_id]
+                    image = region(frame) if region is not None else frame
+                    requests.append((image, class_ids, conf_threshold, roi))
+                for (stream_id, frame), detections in zip(batch, detect_batch(self.model, requests)):
+                    self.outputs[stream_id].put((frame, detections))
+                self.batches += 1
+                self.frames_processed += len(batch)
+
+            # Sent after the batch so a stream's last frames arrive first
+            if ended is not None:
+                self.outputs[ended].put(END_OF_STREAM)
+                open_streams.discard(ended)
+
+
+def run_all_garages(show=not HEADLESS, config_path=DEFAULT_CONFIG):
+    """Run every enabled garage in the config, one reader thread per camera."""
+    yolo_weights, garages = load_config(config_path)
+    server = InferenceServer(yolo_weights)
+    counters = {}
+    for name, garage in garages.items():
+        if not garage.enabled:
+            continue
+        # The server reads the frames; the counter only tracks and counts
+        counter = CarCounter(dataclasses.replace(garage, source=None),
+                             model=server.model, headless=not show)
+        server.add_stream(name, open_source(garage.source), counter.detection_classes,
+                          counter.conf_threshold, counter.roi, counter.frame_region)
+        counters[name] = counter
+
+    server.start()
+    started = time.monotonic()
+    active = set(counters)
+    try:
+        while active:
+            for name in list(active):
+                try:
+                    item = server.outputs[name].get(timeout=0.01)
+                except queue.Empty:
+                    continue
+                if item is END_OF_STREAM:
+                    active.discard(name)
+                    continue
+
+                frame, detections = item
+                frame, count, _ = counters[name].process_detections(
+                    frame, detections)
+                if show:
+                    cv2.imshow(f"Parking Counter - {name}", frame)
+
+            if show and cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        server.stop()
+        if show:
+            cv2.destroyAllWindows()
+
+    elapsed = time.monotonic() - started
+    print(f"Processed {server.frames_processed} frames in {server.batches} batches "
+          f"({server.frames_processed / max(elapsed, 1e-6):.1f} frames/s across {len(counters)} streams)")
+    for counter in counters.values():
+        counter.update_redis()
+
+
+if __name__ == "__main__":
+    run_all_garages()
@@ -0,0 +1,308 @@
+"""
+Occupancy counting for surface lots without a single entrance to watch.
+
+Instead of following cars over a line, a lot camera is sampled every few
+seconds (a still, or every Nth frame of a recording). Each sample runs
+through the detector once, every vehicle is placed by its ground point
+(bottom centre of its box) into one of the lot's zone polygons, and each
+zone's count is smoothed over the last few samples so a car driving
+through doesn't flicker the numbers. Zones are single stalls (stalls: 1)
+or whole rows. The lot's free spaces are published to the same
+*_availability key the app already reads.
+
+    python occupancy.py                  # every enabled lot in lots.json
+    python occupancy.py LOT_R --once     # one sample, print it and exit
+"""
+import argparse
+import logging
+import os
+import time
+from dataclasses import dataclass, field, fields
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from availability import AvailabilityPublisher
+from counter_engine import YOLO_WEIGHTS, read_config_file, resolve_path, resolve_source
+from detections import class_ids_for, detect
+from detector_backends import BACKENDS, load_detector
+from health import CounterHealth
+from rendering import HEADLESS, FrameDumper, draw_zones, prepare_mask
+from sources import open_source
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lots.json")
+ANCHORS = ("bottom", "center")
+
+
+@dataclass
+class Zone:
+    name: str
+    polygon: List[List[float]]
+    stalls: int = 1
+
+
+@dataclass
+class LotConfig:
+    """One lot camera. See lots.json for examples."""
+    name: str
+    redis_key: str
+    zones: List[Zone]
+    # Defaults to the zones' total stalls
+    capacity: Optional[int] = None
+    source: Optional[object] = None
+    # Seconds between samples of a live camera
+    interval: float = 30.0
+    # Frames skipped between samples of a recording or image folder
+    frame_stride: int = 30
+    # Samples each zone's count is smoothed (median) over
+    smoothing: int = 5
+    # Which point of a box decides its zone: "bottom" (ground contact) or "center"
+    anchor: str = "bottom"
+    detection_classes: List[str] = field(
+        default_factory=lambda: ['car', 'truck', 'bus', 'motorbike'])
+    conf_threshold: float = 0.3
+    mask: Optional[str] = None
+    enabled: bool = True
+
+    def __post_init__(self):
+        self.zones = [zone if isinstance(zone, Zone) else Zone(**zone) for zone in self.zones]
+        if self.capacity is None:
+            self.capacity = sum(zone.stalls for zone in self.zones)
+        if self.anchor not in ANCHORS:
+            raise ValueError(f"anchor must be one of {', '.join(ANCHORS)}, got {self.anchor!r}")
+
+    @classmethod
+    def from_dict(cls, data, base_dir=""):
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(
+                f"Unknown setting(s) for lot {data.get('name')!r}: {', '.join(sorted(unknown))}")
+        data = dict(data)
+        if data.get("mask"):
+            data["mask"] = resolve_path(data["mask"], base_dir)
+        data["source"] = resolve_source(data.get("source"), base_dir)
+        return cls(**data)
+
+
+def load_config(path=DEFAULT_CONFIG):
+    """Return (yolo_weights, {name: LotConfig}) from a JSON or YAML file."""
+    data = read_config_file(path)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    lots = {}
+    for entry in data["lots"]:
+        lot = LotConfig.from_dict(entry, base_dir)
+        lots[lot.name] = lot
+    return data.get("yolo_weights", YOLO_WEIGHTS), lots
+
+
+class ZoneIndex:
+    """
+    Point-in-polygon for many points against many polygons at once.
+
+    Every polygon edge is stored as one row, with a matrix mapping edges to
+    their polygon. A ray cast from each point crosses some edges; the
+    (points x edges) crossing matrix times the (edges x polygons) matrix
+    gives crossings per polygon, and an odd count means inside.
+    """
+
+    def __init__(self, polygons):
+        starts, ends, owner = [], [], []
+        for i, polygon in enumerate(polygons):
+            vertices = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+            starts.append(vertices)
+            ends.append(np.roll(vertices, -1, axis=0))
+            owner.append(np.full(len(vertices), i))
+        self.start = np.concatenate(starts)
+        self.end = np.concatenate(ends)
+        owner = np.concatenate(owner)
+        self.membership = np.zeros((len(owner), len(polygons)), dtype=np.int32)
+        self.membership[np.arange(len(owner)), owner] = 1
+
+    def contains(self, points):
+        """(N, 2) points -> (N, P) bool, True where point n is inside polygon p."""
+        if not len(points):
+            return np.zeros((0, self.membership.shape[1]), dtype=bool)
+        px = points[:, 0:1]
+        py = points[:, 1:2]
+        x1, y1 = self.start[:, 0], self.start[:, 1]
+        x2, y2 = self.end[:, 0], self.end[:, 1]
+        straddles = (y1 > py) != (y2 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        crossings = straddles & (px < x_cross)
+        return (crossings.astype(np.int32) @ self.membership) % 2 == 1
+
+    def assign(self, points):
+        """Zone index of each point (the first polygon containing it), -1 for none."""
+        inside = self.contains(points)
+        if not inside.size:
+            return np.full(len(points), -1)
+        return np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+
+
+def anchor_points(detections, anchor="bottom"):
+    """(N, 5) detections -> (N, 2) points that decide which zone a vehicle is in."""
+    cx = (detections[:, 0] + detections[:, 2]) / 2
+    y = detections[:, 3] if anchor == "bottom" else (detections[:, 1] + detections[:, 3]) / 2
+    return np.stack([cx, y], axis=1)
+
+
+class OccupancyCounter:
+    def __init__(self, lot, model=None, yolo_weights=YOLO_WEIGHTS, source=None,
+                 headless=None, publisher=None):
+        self.lot = lot
+        self.name = lot.name
+        if source is None and lot.source is not None:
+            source = open_source(lot.source)
+        self.cap = source
+        self.model = model if model is not None else load_detector(yolo_weights)
+        self.detection_class_ids = class_ids_for(self.model.names, lot.detection_classes)
+        self.mask = cv2.imread(lot.mask) if lot.mask else None
+
+        self.headless = HEADLESS if headless is None else headless
+        self.dumper = FrameDumper(prefix=lot.redis_key)
+
+        self.zones = ZoneIndex([zone.polygon for zone in lot.zones])
+        self.stalls = np.array([zone.stalls for zone in lot.zones])
+        # Ring buffer of the last `smoothing` samples' per-zone counts
+        self._history = np.zeros((max(lot.smoothing, 1), len(lot.zones)), dtype=np.int32)
+        self._samples = 0
+        self.occupied = np.zeros(len(lot.zones), dtype=np.int32)
+
+        self.capacity = lot.capacity
+        self.available = lot.capacity
+        self.publisher = publisher if publisher is not None else AvailabilityPublisher(
+            lot.redis_key, lot.capacity)
+        self.health = CounterHealth(self.name, lot.redis_key, self.publisher, interval=0)
+        self.next_sample_at = 0.0
+
+    @property
+    def live(self):
+        return getattr(self.cap, "live", False)
+
+    def count(self, detections):
+        """Vehicles per zone in one sample, capped at each zone's stalls."""
+        zone_of = self.zones.assign(anchor_points(detections, self.lot.anchor))
+        counts = np.bincount(zone_of[zone_of >= 0], minlength=len(self.stalls))
+        return np.minimum(counts, self.stalls)
+
+    def add_sample(self, counts):
+        """Smooth per-zone counts (median over recent samples) and return free spaces."""
+        self._history[self._samples % len(self._history)] = counts
+        self._samples += 1
+        recent = self._history[:min(self._samples, len(self._history))]
+        self.occupied = np.round(np.median(recent, axis=0)).astype(np.int32)
+        self.available = max(0, self.capacity - int(self.occupied.sum()))
+        return self.available
+
+    def sample(self, frame):
+        """Detect one frame, update the smoothed occupancy and publish it."""
+        region = frame
+        if self.mask is not None:
+            if self.mask.shape[:2] != frame.shape[:2]:
+                self.mask = prepare_mask(self.mask, frame.shape)
+            region = cv2.bitwise_and(frame, self.mask)
+
+        started = time.perf_counter()
+        detections = detect(self.model, region, self.detection_class_ids, self.lot.conf_threshold)
+        detected = time.perf_counter()
+        self.add_sample(self.count(detections))
+        self.publisher.set(self.available)
+        self.health.stage("detect", detected - started)
+        self.health.stage("count", time.perf_counter() - detected)
+        self.health.frame()
+        self.health.publish_if_due(tracks=len(detections))
+
+        if not self.headless or self.dumper.due(self._samples):
+            draw_zones(frame, [zone.polygon for zone in self.lot.zones],
+                       self.occupied, self.stalls, self.available)
+            if self.dumper.due(self._samples):
+                self.dumper.dump(frame, self._samples)
+        return frame
+
+    def step(self):
+        """
+        Take the next sample. Live cameras give their newest frame; recordings
+        skip ahead frame_stride frames first. Returns (frame, ok); ok is False
+        once a recording has ended.
+        """
+        if not self.live and self._samples and hasattr(self.cap, "skip"):
+            if not self.cap.skip(self.lot.frame_stride - 1):
+                return None, False
+        success, frame = self.cap.read(timeout=5.0)
+        if not success:
+            if self.live:
+                self.health.publish_if_due()
+                return None, True
+            return None, False
+        return self.sample(frame), True
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+def run_lots(counters, once=False):
+    """Sample every lot on its own schedule until every recording ends (or once)."""
+    active = list(counters)
+    showing = any(not counter.headless for counter in counters)
+    try:
+        while active:
+            now = time.monotonic()
+            for counter in list(active):
+                if counter.live and now < counter.next_sample_at:
+                    continue
+                counter.next_sample_at = now + counter.lot.interval
+                frame, ok = counter.step()
+                if not ok or once:
+                    active.remove(counter)
+                    counter.close()
+                if frame is not None:
+                    print(f"{counter.name}: {counter.available}/{counter.capacity} free "
+                          f"({dict(zip((z.name for z in counter.lot.zones), counter.occupied.tolist()))})")
+                    if not counter.headless:
+                        cv2.imshow(f"Occupancy - {counter.name}", frame)
+
+            if showing:
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+            if active and all(counter.live for counter in active):
+                wait = min(counter.next_sample_at for counter in active) - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+    finally:
+        for counter in active:
+            counter.close()
+        if showing:
+            cv2.destroyAllWindows()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count occupied spaces in surface lots.")
+    parser.add_argument("lots", nargs="*", help="lots to run (default: every enabled lot)")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="lot config (.json, .yaml)")
+    parser.add_argument("--weights", help="YOLO weights (overrides the config)")
+    parser.add_argument("--backend", choices=BACKENDS,
+                        help="detector backend (default: CV_DETECTOR_BACKEND)")
+    parser.add_argument("--headless", action="store_true", default=None,
+                        help="no windows (default: CV_HEADLESS)")
+    parser.add_argument("--once", action="store_true", help="take one sample per lot and exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    yolo_weights, lots = load_config(args.config)
+    names = args.lots or [name for name, lot in lots.items() if lot.enabled]
+    unknown = [name for name in names if name not in lots]
+    if unknown:
+        parser.error(f"unknown lot(s): {', '.join(unknown)} (configured: {', '.join(lots)})")
+
+    model = load_detector(args.weights or yolo_weights, args.backend)
+    counters = [OccupancyCounter(lots[name], model=model, headless=args.headless)
+                for name in names]
+    run_lots(counters, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
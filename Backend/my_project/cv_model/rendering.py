@@ -0,0 +1,102 @@
+import os
+import time
+
+import cv2
+import numpy as np
+from decouple import config
+
+# Production counters run with CV_HEADLESS=True: no drawing, no window.
+HEADLESS = config("CV_HEADLESS", default=False, cast=bool)
+# Optional debug dumps: every CV_DEBUG_DUMP_EVERY frames, write an annotated
+# frame into CV_DEBUG_DUMP_DIR (works in headless mode too).
+DEBUG_DUMP_DIR = config("CV_DEBUG_DUMP_DIR", default="")
+DEBUG_DUMP_EVERY = config("CV_DEBUG_DUMP_EVERY", default=0, cast=int)
+
+DEFAULT_BOX_COLOR = (255, 0, 255)
+
+
+def load_graphics(graphics_path, scale=1.0):
+    """Read the PNG overlay once and resize it for the counter's layout."""
+    if not graphics_path:
+        return None
+    graphics = cv2.imread(graphics_path, cv2.IMREAD_UNCHANGED)
+    if graphics is None:
+        return None
+    h, w = graphics.shape[:2]
+    return cv2.resize(graphics, (int(w * scale), int(h * scale)))
+
+
+def prepare_mask(mask, frame_shape):
+    """Resize a mask to the frame and make it 3-channel so it can be ANDed directly."""
+    if mask is None:
+        return None
+    mask = cv2.resize(mask, (frame_shape[1], frame_shape[0]))
+    if len(mask.shape) == 2:
+        mask = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
+    return mask
+
+
+def draw_counter(frame, tracks, obj_colors, line_limits, line_color, capacity, graphics=None):
+    """Draw tracked boxes, the counting line and the availability text onto frame."""
+    # Only needed when drawing, so headless counters never import it
+    import cvzone
+
+    if graphics is not None:
+        cvzone.overlayPNG(frame, graphics, (0, 0))
+
+    for x1, y1, x2, y2, obj_id in tracks:
+        w, h = x2 - x1, y2 - y1
+        cx, cy = x1 + w // 2, y1 + h // 2
+        box_color = obj_colors.get(obj_id, DEFAULT_BOX_COLOR)
+        cvzone.cornerRect(frame, (x1, y1, w, h), l=9, rt=2, colorR=box_color)
+        cvzone.putTextRect(frame, f'ID {obj_id}', (x1, max(35, y1)),
+                           scale=2, thickness=3, offset=10)
+        cv2.circle(frame, (cx, cy), 5, DEFAULT_BOX_COLOR, cv2.FILLED)
+
+    cv2.line(frame, (line_limits[0], line_limits[1]),
+             (line_limits[2], line_limits[3]), line_color, 5)
+
+    y0, dy = 120, 80  # starting y position, line spacing
+    cv2.putText(frame, "Availability:", (420, y0),
+                cv2.FONT_HERSHEY_PLAIN, 3.5, (0, 0, 255), 5)
+    cv2.putText(frame, f"{capacity}", (420, y0 + dy),
+                cv2.FONT_HERSHEY_PLAIN, 3.5, (0, 0, 255), 5)
+    return frame
+
+
+def draw_zones(frame, polygons, occupied, stalls, available):
+    """Outline each occupancy zone (red when full) with its count, plus the lot's availability."""
+    for polygon, taken, total in zip(polygons, occupied, stalls):
+        points = np.asarray(polygon, dtype=np.int32).reshape(-1, 1, 2)
+        color = (0, 0, 255) if taken >= total else (0, 100, 0)
+        cv2.polylines(frame, [points], True, color, 3)
+        x, y = points[:, 0].min(axis=0)
+        cv2.putText(frame, f"{taken}/{total}", (int(x), int(y) - 8),
+                    cv2.FONT_HERSHEY_PLAIN, 2, color, 2)
+    cv2.putText(frame, f"Availability: {available}", (40, 60),
+                cv2.FONT_HERSHEY_PLAIN, 3.5, (0, 0, 255), 5)
+    return frame
+
+
+class FrameDumper:
+    """Writes every `every`-th frame to `directory`; disabled when either is unset."""
+
+    def __init__(self, directory=DEBUG_DUMP_DIR, every=DEBUG_DUMP_EVERY, prefix="frame"):
+        self.directory = directory
+        self.every = every
+        self.prefix = prefix
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return bool(self.directory) and self.every > 0
+
+    def due(self, frame_index):
+        return self.enabled and frame_index % self.every == 0
+
+    def dump(self, frame, frame_index):
+        path = os.path.join(
+            self.directory, f"{self.prefix}-{int(time.time())}-{frame_index:08d}.jpg")
+        cv2.imwrite(path, frame)
+        return path
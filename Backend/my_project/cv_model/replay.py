@@ -0,0 +1,108 @@
+import dataclasses
+import time
+import tracemalloc
+
+from availability import NullPublisher
+from counter_engine import CarCounter, load_config
+from sources import open_source
+
+REPLAY_KEY = "REPLAY_availability"
+DEMO_GARAGE = "Harrison"
+
+
+def replay_counter(garage=DEMO_GARAGE, video_path=None, **counter_options):
+    """
+    A headless CarCounter with `garage`'s counting setup, reading
+    `video_path` (or the garage's own source) instead. It publishes nothing
+    unless a `publisher` is passed, so replays never touch live Redis keys.
+    """
+    yolo_weights, garages = load_config()
+    config = dataclasses.replace(garages[garage], redis_key=REPLAY_KEY)
+    source = open_source(video_path) if video_path is not None else None
+    counter_options.setdefault("headless", True)
+    counter_options.setdefault("publisher", NullPublisher())
+    return CarCounter(config, yolo_weights=yolo_weights, source=source, **counter_options)
+
+
+def replay(video_path=None, max_frames=None, garage=DEMO_GARAGE, **counter_options):
+    """Run a headless CarCounter over a recorded video and return its counts."""
+    counter = replay_counter(garage, video_path, **counter_options)
+    started = time.monotonic()
+    frames = 0
+    while max_frames is None or frames < max_frames:
+        _, _, success = counter.process_frame()
+        if not success:
+            break
+        frames += 1
+    elapsed = time.monotonic() - started
+    counter.close()
+
+    gate = counter.motion_gate
+    return {
+        "incoming": counter.incoming_count,
+        "outgoing": counter.outgoing_count,
+        "frames": frames,
+        "fps": frames / max(elapsed, 1e-6),
+        "skipped": gate.skip_ratio if gate is not None else 0.0,
+    }
+
+
+def compare_variants(video_path, variants, max_frames=None, garage=DEMO_GARAGE):
+    """
+    Replay the same video once per variant (name -> CarCounter options),
+    print counts and speed side by side, and return True if every variant
+    counted the same cars in and out as the first one.
+    """
+    outcomes = {name: replay(video_path, max_frames, garage, **options)
+                for name, options in variants.items()}
+
+    for name, outcome in outcomes.items():
+        print(f"{name:>12}: in={outcome['incoming']} out={outcome['outgoing']} "
+              f"fps={outcome['fps']:.1f} skipped={outcome['skipped']:.0%}")
+
+    baseline = next(iter(outcomes.values()))
+    match = all(
+        outcome["incoming"] == baseline["incoming"] and outcome["outgoing"] == baseline["outgoing"]
+        for outcome in outcomes.values()
+    )
+    print("✓ Counts match" if match else "❌ Counts differ between variants")
+    return match
+
+
+class _NamesOnly:
+    """Stands in for the YOLO model when detections are fed in directly."""
+    names = {2: "car", 3: "motorbike", 5: "bus", 7: "truck"}
+
+
+def soak(frames=1_000_000, report_every=100_000):
+    """
+    Push a long synthetic stream of cars through a headless counter's
+    tracking and counting (no video, no model) and print how much per-track
+    state and traced memory it holds over time. Both should stay flat.
+    At 15 fps, 1M frames is roughly 18 hours of one camera.
+    """
+    from fast_sort import synthetic_detections
+
+    _, garages = load_config()
+    config = dataclasses.replace(garages[DEMO_GARAGE], redis_key=REPLAY_KEY, source=None)
+    counter = CarCounter(config, model=_NamesOnly(), headless=True, publisher=NullPublisher())
+    # Cars drive across the counting line of the demo layout
+    clip = synthetic_detections(frames=2000, cars=12)
+    for dets in clip:
+        dets[:, [1, 3]] += 900
+
+    tracemalloc.start()
+    for frame in range(1, frames + 1):
+        counter.update_counts(None, clip[frame % len(clip)])
+        if frame % report_every == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            print(f"frame {frame:>9}: tracked={len(counter.crossing):>3} "
+                  f"in={counter.incoming_count} out={counter.outgoing_count} "
+                  f"memory={current / 1024:.0f} KiB (peak {peak / 1024:.0f} KiB)")
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    import sys
+
+    soak(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
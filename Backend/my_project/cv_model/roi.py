@@ -0,0 +1,80 @@
+from decouple import config
+
+# Run the detector on a crop around the counting line instead of the whole
+# frame. Opt-in (CV_ROI_INFERENCE=True or a garage's "roi_inference") until
+# compare_variants has matched full-frame counts on that camera's footage.
+# CV_ROI_PAD is how far (in pixels) the crop extends past the line.
+ROI_INFERENCE = config("CV_ROI_INFERENCE", default=False, cast=bool)
+ROI_PAD = config("CV_ROI_PAD", default=200, cast=int)
+
+
+def line_roi(line_limits, frame_shape, pad=120):
+    """
+    Return (x1, y1, x2, y2) of a box around the counting line, padded by
+    `pad` pixels on every side and clipped to the frame.
+    """
+    lx1, ly1, lx2, ly2 = line_limits
+    height, width = frame_shape[:2]
+    x1 = max(min(lx1, lx2) - pad, 0)
+    y1 = max(min(ly1, ly2) - pad, 0)
+    x2 = min(max(lx1, lx2) + pad, width)
+    y2 = min(max(ly1, ly2) + pad, height)
+    return x1, y1, x2, y2
+
+
+def roi_imgsz(roi, frame_shape, full_imgsz=640, stride=32):
+    """
+    Inference size for a crop that keeps the same pixels-per-object as
+    running the full frame at `full_imgsz`, rounded up to the model stride.
+    """
+    x1, y1, x2, y2 = roi
+    scale = full_imgsz / max(frame_shape[:2])
+    longest = max(x2 - x1, y2 - y1) * scale
+    return int(min(max(-(-longest // stride) * stride, stride), full_imgsz))
+
+
+def offset_detections(detections, roi):
+    """Shift crop-relative [x1, y1, x2, y2, conf] rows back into frame coordinates."""
+    if len(detections):
+        detections[:, [0, 2]] += roi[0]
+        detections[:, [1, 3]] += roi[1]
+    return detections
+
+
+class LineRoi:
+    """Padded crop around a counting line, computed once for the stream's frame size."""
+
+    def __init__(self, line_limits, pad=ROI_PAD, full_imgsz=640):
+        self.line_limits = line_limits
+        self.pad = pad
+        self.full_imgsz = full_imgsz
+        self.box = None
+        self.imgsz = None
+        self._frame_shape = None
+
+    def crop(self, frame):
+        """Return (crop, imgsz) for the detector."""
+        if frame.shape[:2] != self._frame_shape:
+            self._frame_shape = frame.shape[:2]
+            self.box = line_roi(self.line_limits, frame.shape, self.pad)
+            self.imgsz = roi_imgsz(self.box, frame.shape, self.full_imgsz)
+        x1, y1, x2, y2 = self.box
+        return frame[y1:y2, x1:x2], self.imgsz
+
+    def restore(self, detections):
+        return offset_detections(detections, self.box)
+
+
+if __name__ == "__main__":
+    import sys
+    from replay import compare_variants
+
+    # Same clip, full frame vs. the crop around the line (gate off for both)
+    matched = compare_variants(
+        sys.argv[1] if len(sys.argv) > 1 else None,
+        {
+            "full frame": {"roi_inference": False, "motion_gate": False},
+            "line ROI": {"roi_inference": True, "motion_gate": False},
+        },
+    )
+    sys.exit(0 if matched else 1)
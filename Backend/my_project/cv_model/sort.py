@@ -19,18 +19,10 @@ from __future__ import print_function
 
 import os
 import numpy as np
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from skimage import io
-
-import glob
-import time
-import argparse
 from filterpy.kalman import KalmanFilter
 
-np.random.seed(0)
+# The demo's plotting, image and CLI imports live under __main__, so
+# importing the tracker needs no display and loads no plotting libraries.
 
 
 def linear_assignment(cost_matrix):
@@ -254,6 +246,7 @@ class Sort(object):
 
 def parse_args():
     """Parse input arguments."""
+    import argparse
     parser = argparse.ArgumentParser(description='SORT demo')
     parser.add_argument('--display', dest='display', help='Display online tracker output (slow) [False]',action='store_true')
     parser.add_argument("--seq_path", help="Path to detections.", type=str, default='data')
@@ -269,6 +262,10 @@ def parse_args():
     return args
 
 if __name__ == '__main__':
+  import glob
+  import time
+
+  np.random.seed(0)
   # all train
   args = parse_args()
   display = args.display
@@ -280,6 +277,11 @@ if __name__ == '__main__':
     if not os.path.exists('mot_benchmark'):
       print('\n\tERROR: mot_benchmark link not found!\n\n    Create a symbolic link to the MOT benchmark\n    (https://motchallenge.net/data/2D_MOT_2015/#download). E.g.:\n\n    $ ln -s /path/to/MOT2015_challenge/2DMOT2015 mot_benchmark\n\n')
       exit()
+    import matplotlib
+    matplotlib.use('TkAgg')
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+    from skimage import io
     plt.ion()
     fig = plt.figure()
     ax1 = fig.add_subplot(111, aspect='equal')
@@ -0,0 +1,105 @@
+import glob
+import os
+
+import cv2
+
+from frame_grabber import LatestFrameGrabber
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class VideoFileSource:
+    """A recorded video, read frame by frame. Ends when the file does."""
+
+    live = False
+
+    def __init__(self, path):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+
+    def read(self, timeout=None):
+        return self.cap.read()
+
+    def skip(self, frames):
+        """Advance without decoding; False once the file has ended."""
+        return all(self.cap.grab() for _ in range(frames))
+
+    def release(self):
+        self.cap.release()
+
+
+class RtspSource(LatestFrameGrabber):
+    """
+    A live camera. Frames come from a LatestFrameGrabber, so a slow counter
+    only ever sees the newest frame; a failed read means "nothing new yet",
+    not the end of the stream.
+    """
+
+    live = True
+
+    def __init__(self, url, **grabber_options):
+        super().__init__(url, **grabber_options)
+        self.start()
+
+
+class ImageDirSource:
+    """Every image in a directory, in file name order (e.g. exported frames)."""
+
+    live = False
+
+    def __init__(self, path):
+        self.path = path
+        self.files = sorted(
+            f for f in glob.glob(os.path.join(path, "*"))
+            if f.lower().endswith(IMAGE_EXTENSIONS))
+        self._next = 0
+
+    def read(self, timeout=None):
+        while self._next < len(self.files):
+            frame = cv2.imread(self.files[self._next])
+            self._next += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def skip(self, frames):
+        self._next += frames
+        return self._next < len(self.files)
+
+    def release(self):
+        self._next = len(self.files)
+
+
+SOURCES = {
+    "file": VideoFileSource,
+    "rtsp": RtspSource,
+    "images": ImageDirSource,
+}
+
+
+def source_type(location):
+    """Guess the source type of a bare path or URL."""
+    if "://" in location:
+        return "rtsp"
+    if os.path.isdir(location):
+        return "images"
+    return "file"
+
+
+def open_source(spec):
+    """
+    Open a frame source from a garage config entry: either a path/URL
+    string, or {"type": "file" | "rtsp" | "images", "path": ...} with any
+    extra keys passed to the source (e.g. reconnect_delay for RTSP).
+    Environment variables in the location are expanded, so camera
+    credentials can stay out of the config file.
+    """
+    if isinstance(spec, str):
+        spec = {"path": spec}
+    spec = dict(spec)
+    location = os.path.expandvars(spec.pop("path", None) or spec.pop("url", ""))
+    kind = spec.pop("type", None) or source_type(location)
+    if kind not in SOURCES:
+        raise ValueError(
+            f"Unknown source type {kind!r} (expected one of {', '.join(SOURCES)})")
+    return SOURCES[kind](location, **spec)
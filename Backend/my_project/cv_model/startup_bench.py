@@ -0,0 +1,77 @@
+"""
+Measures how long each CV module takes to import in a fresh interpreter,
+and checks that importing it doesn't drag in heavy optional dependencies
+(torch/ultralytics, plotting, cvzone) or open a Redis connection. Those
+should only load when a model, a window or Redis is actually used.
+
+    python startup_bench.py            # best of 5 runs per module
+    python startup_bench.py --runs 10 counter_engine tune
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MODULES = [
+    "fast_sort", "sort", "crossing", "detections", "sources", "rendering",
+    "availability", "detection_store", "detector_backends", "counter_engine",
+    "replay", "benchmark", "tune", "occupancy",
+]
+HEAVY = ["torch", "ultralytics", "matplotlib", "skimage", "cvzone"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+availability = sys.modules.get("availability")
+print(json.dumps({{
+    "seconds": elapsed,
+    "heavy": [name for name in {heavy!r} if name in sys.modules],
+    "redis_connected": bool(availability and availability._client is not None),
+}}))
+"""
+
+
+def probe(module, runs=5):
+    """Best-of-`runs` import time of `module` plus what the import loaded."""
+    env = dict(os.environ)
+    env.pop("DISPLAY", None)   # imports must work on a box without a display
+    best = None
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+            cwd=HERE, env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            return {"module": module, "error": out.stderr.strip().splitlines()[-1]}
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return dict(best, module=module)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import time of the CV modules.")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    ok = True
+    for module in args.modules:
+        result = probe(module, args.runs)
+        if "error" in result:
+            ok = False
+            print(f"{module:>18}: ❌ import failed: {result['error']}")
+            continue
+        problems = result["heavy"] + (["redis connection"] if result["redis_connected"] else [])
+        ok = ok and not problems
+        note = f"  ❌ loads {', '.join(problems)}" if problems else ""
+        print(f"{module:>18}: {result['seconds'] * 1000:8.1f} ms{note}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,105 @@
+"""
+AvailabilityPublisher against an in-memory Redis (fakeredis, with Lua).
+
+    python -m pytest test_availability.py
+"""
+import unittest
+from unittest import mock
+
+from availability import AvailabilityPublisher
+from health import HEALTH_KEY, CounterHealth
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+KEY = "test_availability"
+CAPACITY = 240
+
+
+@unittest.skipUnless(fakeredis, "fakeredis[lua] is not installed")
+class ApplyDeltaTest(unittest.TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis(decode_responses=True)
+        self.publisher = AvailabilityPublisher(KEY, CAPACITY, client=self.redis)
+
+    def stored(self):
+        return int(self.redis.get(KEY))
+
+    def test_missing_key_starts_from_capacity(self):
+        self.assertEqual(self.publisher.publish(-1), CAPACITY - 1)
+        self.assertEqual(self.stored(), CAPACITY - 1)
+
+    def test_key_flushed_while_running_starts_from_capacity(self):
+        self.publisher.init()
+        self.publisher.publish(-5)
+        self.redis.delete(KEY)
+
+        self.assertEqual(self.publisher.publish(-2), CAPACITY - 2)
+        self.assertEqual(self.stored(), CAPACITY - 2)
+
+    def test_missing_key_clamps_at_capacity(self):
+        self.assertEqual(self.publisher.publish(3), CAPACITY)
+        self.assertEqual(self.stored(), CAPACITY)
+
+    def test_clamps_at_zero(self):
+        self.redis.set(KEY, 2)
+        self.assertEqual(self.publisher.publish(-5), 0)
+        self.assertEqual(self.stored(), 0)
+
+    def test_clamps_at_capacity(self):
+        self.redis.set(KEY, CAPACITY - 1)
+        self.assertEqual(self.publisher.publish(4), CAPACITY)
+        self.assertEqual(self.stored(), CAPACITY)
+
+    def test_delta_applies_to_existing_value(self):
+        self.redis.set(KEY, 100)
+        self.assertEqual(self.publisher.publish(-3), 97)
+        self.assertEqual(self.stored(), 97)
+
+
+class OutageTest(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.hset.side_effect = ConnectionError("refused")
+        self.script = mock.Mock(side_effect=ConnectionError("refused"))
+        self.client.register_script.return_value = self.script
+        self.publisher = AvailabilityPublisher(KEY, CAPACITY, client=self.client)
+
+    def test_outage_is_logged_once_and_backed_off(self):
+        health = CounterHealth("camera", KEY, self.publisher, interval=0)
+        with self.assertLogs("availability", "WARNING") as logs:
+            for _ in range(100):
+                self.publisher.publish(-1)
+                health.publish_if_due()
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(self.script.call_count, 1)
+        self.client.hset.assert_not_called()
+        self.assertEqual(self.publisher.pending, -100)
+
+    def test_recovery_is_logged_and_pending_delta_sent(self):
+        self.publisher.publish(-3)
+        self.publisher._next_attempt = 0
+        self.script.side_effect = None
+        self.script.return_value = CAPACITY - 4
+
+        with self.assertLogs("availability", "WARNING") as logs:
+            self.assertEqual(self.publisher.publish(-1), CAPACITY - 4)
+        self.assertIn("back", logs.output[0])
+        self.assertEqual(self.publisher.pending, 0)
+
+
+@unittest.skipUnless(fakeredis, "fakeredis[lua] is not installed")
+class HealthRecordTest(unittest.TestCase):
+    def test_health_record_goes_through_publisher(self):
+        redis = fakeredis.FakeStrictRedis(decode_responses=True)
+        publisher = AvailabilityPublisher(KEY, CAPACITY, client=redis)
+        CounterHealth("camera", KEY, publisher, interval=0).publish_if_due(tracks=2)
+
+        self.assertIn('"tracks": 2', redis.hget(HEALTH_KEY, "camera"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Sweep tracker, confidence and counting-line settings over recorded
+detections, in parallel, and rank them against ground truth.
+
+Record detections once (YOLO runs here, nowhere else):
+
+    python counter_engine.py Harrison --headless --record-detections cache/
+    python benchmark.py Videos/clip.mov --save-detections cache/
+
+Recording turns the motion gate and ROI inference off, since both only
+look near the configured line; stores recorded with either on are refused.
+
+then sweep (every combination of the listed values; anything not listed
+keeps the garage's setting from garages.json):
+
+    python tune.py cache/Harrison --max-age 10 20 50 --min-hits 1 3 \\
+        --iou 0.2 0.3 --conf 0.3 0.4 --line-offset -40 0 40 --crossing sign_change deque
+
+Ground truth uses benchmark.py's format. Without it the counts for each
+setting are printed unranked.
+"""
+import argparse
+import dataclasses
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from availability import NullPublisher
+from benchmark import DEFAULT_TRUTH
+from counter_engine import CarCounter, load_config
+from detection_store import DetectionStore
+from replay import DEMO_GARAGE, _NamesOnly
+
+# Filled in each worker by _init_worker: [(name, GarageConfig, DetectionStore)]
+_clips = []
+
+
+def _init_worker(clips):
+    # Directory stores are memory-mapped, so workers share the page cache
+    # instead of each holding a copy of the detections.
+    _clips[:] = [(name, garage, DetectionStore(path)) for name, garage, path in clips]
+
+
+def variant(garage, params):
+    """The garage with one sweep setting applied (None keeps its own value)."""
+    tracker = dict(garage.tracker)
+    for key in ("max_age", "min_hits", "iou_threshold"):
+        if params.get(key) is not None:
+            tracker[key] = params[key]
+    x1, y1, x2, y2 = garage.line
+    dy = params.get("line_offset") or 0
+    return dataclasses.replace(
+        garage,
+        source=None,
+        tracker=tracker,
+        line=[x1, y1 + dy, x2, y2 + dy],
+        crossing=params.get("crossing") or garage.crossing,
+        conf_threshold=params.get("conf_threshold") or garage.conf_threshold,
+        motion_gate=False,
+        roi_inference=False,
+    )
+
+
+def count(garage, store):
+    """Run tracking and counting over a store; returns (incoming, outgoing)."""
+    counter = CarCounter(garage, model=_NamesOnly(), headless=True, publisher=NullPublisher())
+    for detections in store.frames(counter.conf_threshold):
+        counter.update_counts(None, detections)
+    return counter.incoming_count, counter.outgoing_count
+
+
+def evaluate(params):
+    counts = {name: count(variant(garage, params), store) for name, garage, store in _clips}
+    return params, counts
+
+
+def score(counts, truth):
+    """Total absolute in+out error over the annotated clips (None if none are)."""
+    errors = [abs(incoming - truth[name]["incoming"]) + abs(outgoing - truth[name]["outgoing"])
+              for name, (incoming, outgoing) in counts.items() if name in truth]
+    return sum(errors) if errors else None
+
+
+def grid(args):
+    axes = {
+        "max_age": args.max_age,
+        "min_hits": args.min_hits,
+        "iou_threshold": args.iou,
+        "conf_threshold": args.conf,
+        "line_offset": args.line_offset,
+        "crossing": args.crossing,
+    }
+    keys = list(axes)
+    for values in itertools.product(*(axes[key] or [None] for key in keys)):
+        yield dict(zip(keys, values))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep counter settings over recorded detections.")
+    parser.add_argument("stores", nargs="+", help="detection stores (see detection_store.py)")
+    parser.add_argument("--garage", default=DEMO_GARAGE, help="garage setup for stores without one")
+    parser.add_argument("--truth", default=DEFAULT_TRUTH, help="ground truth JSON")
+    parser.add_argument("--max-age", type=int, nargs="+")
+    parser.add_argument("--min-hits", type=int, nargs="+")
+    parser.add_argument("--iou", type=float, nargs="+")
+    parser.add_argument("--conf", type=float, nargs="+")
+    parser.add_argument("--line-offset", type=int, nargs="+",
+                        help="move the counting line down (+) or up (-) by this many pixels")
+    parser.add_argument("--crossing", nargs="+", choices=["sign_change", "deque"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    truth = {}
+    if os.path.exists(args.truth):
+        with open(args.truth) as f:
+            truth = json.load(f)
+
+    _, garages = load_config()
+    clips = []
+    for path in args.stores:
+        store = DetectionStore(path)
+        name = store.meta.get("clip") or os.path.basename(path.rstrip("/"))
+        garage = truth.get(name, {}).get("garage") or store.meta.get("garage") or args.garage
+        if store.meta.get("motion_gate", True) or store.meta.get("roi_inference", True):
+            parser.error(f"{path} was recorded with the motion gate or ROI inference on "
+                         f"(or before recordings noted them); record it again")
+        recorded_conf = store.meta.get("conf_threshold", 0)
+        if any(conf < recorded_conf for conf in args.conf or []):
+            print(f"⚠️ {path} only has detections above conf {recorded_conf}")
+        clips.append((name, garages[garage], path))
+
+    settings = list(grid(args))
+    print(f"Sweeping {len(settings)} settings over {len(clips)} clip(s) with {args.workers} workers")
+    started = time.monotonic()
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(clips,)) as pool:
+        results = list(pool.map(evaluate, settings,
+                                chunksize=max(1, len(settings) // (4 * (args.workers or 1)))))
+    print(f"Done in {time.monotonic() - started:.1f}s")
+
+    ranked = sorted(results, key=lambda r: (score(r[1], truth) is None, score(r[1], truth) or 0))
+    for params, counts in ranked[:args.top]:
+        error = score(counts, truth)
+        shown = {key: value for key, value in params.items() if value is not None}
+        totals = ", ".join(f"{name}: in={i} out={o}" for name, (i, o) in counts.items())
+        print(f"{'' if error is None else f'error={error:<4}'} {shown}  {totals}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,41 +3,20 @@ Save Redis availability counters to Postgres preserving column ordering.
 """
 
 from datetime import datetime
+from pathlib import Path
+import sys
 import psycopg2
 import redis
 from decouple import config
 
+DJANGO_PROJECT_DIR = Path(__file__).resolve().parent.parent / "my_project"
+if str(DJANGO_PROJECT_DIR) not in sys.path:
+    sys.path.insert(0, str(DJANGO_PROJECT_DIR))
+
+from api.lot_registry import STATIC_LOTS
+
 TABLE_NAME = 'parking_availability_data'
-PARKING_LOTS = [
-    'PGMD_availability',
-    'PGU_availability',
-    'PGNW_availability',
-    'PGG_availability',
-    'PGW_availability',
-    'PGGH_availability',
-    'PGH_availability',
-    'LOT_R_availability',
-    'LOT_H_availability',
-    'LOT_FB_availability',
-    'KFPC_availability',
-    'LOT_A_availability',
-    'CREC_availability',
-    'LOT_O_availability',
-    'TARK_WILY_availability',
-    'LOT_AA_availability',
-    'LOT_BB_availability',
-    'WND_KRACH_availability',
-    'SHRV_ERHT_MRDH_availability',
-    'MCUT_HARR_HILL_availability',
-    'DUHM_availability',
-    'PIERCE_ST_availability',
-    'PGM_availability',
-    'SMTH_BCHM_availability',
-    'DISC_A_availability',
-    'DISC_AB_availability',
-    'DISC_ABC_availability',
-    'AIRPORT_availability',
-]
+PARKING_LOTS = [lot.redis_key for lot in STATIC_LOTS]
 
 def get_redis_connection():
     return redis.Redis(
@@ -60,8 +39,7 @@ def get_postgres_connection():
 def fetch_redis_values(r):
     """Return a dict mapping redis_keys to their counter value"""
     values = {}
-    for k in PARKING_LOTS:
-        v = r.get(k)
+    for k, v in zip(PARKING_LOTS, r.mget(PARKING_LOTS)):
         values[k] = int(v)
     print(values)
     return values